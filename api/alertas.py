@@ -0,0 +1,226 @@
+import bisect
+import datetime
+import heapq
+import logging
+import os
+import threading
+
+from cache import criar_geracao
+
+logger = logging.getLogger(__name__)
+
+# --- ALERTAS DE ESTOQUE BAIXO E VALIDADE PRÓXIMA ---
+# O painel não varre a tabela de produtos: o conjunto de produtos abaixo do limiar e
+# a lista ordenada por validade são montados por worker e mantidos a cada
+# movimentação, venda e edição. Só os candidatos ficam em memória (estoque <= limiar
+# ou validade dentro da janela), lidos com uma consulta pelos índices de estoque e
+# validade. Como no índice de busca, a geração compartilhada (Redis ou tb_versao, ver
+# cache.py) avisa os outros workers, que releem só os candidatos; a janela de
+# validade vai até o dobro dos dias de alerta e é relida na virada do dia.
+ESTOQUE_MINIMO = int(os.getenv("ESTOQUE_MINIMO", 10))
+VALIDADE_DIAS = int(os.getenv("VALIDADE_ALERTA_DIAS", 30))
+COLUNAS_ALERTAS = "id_produto, nome, estoque, validade, ativo"
+
+
+def _data(validade):
+    # Supabase devolve 'AAAA-MM-DD' (ou com horário); a comparação é feita no texto ISO
+    return str(validade)[:10] if validade else None
+
+
+class _Dados:
+    def __init__(self, limiar, dia=None, ate=None):
+        self.limiar = limiar
+        self.dia = dia           # dia da carga
+        self.ate = ate           # fim da janela de validade carregada (ISO)
+        self.produtos = {}       # id -> (nome, estoque, validade), só candidatos ativos
+        self.baixo = set()       # ids com estoque <= limiar
+        self.validades = []      # (validade, id) ordenado
+
+    def candidato(self, estoque, validade):
+        return estoque <= self.limiar or bool(validade and self.ate and validade <= self.ate)
+
+    def incluir(self, id_produto, nome, estoque, validade):
+        self.produtos[id_produto] = (nome, estoque, validade)
+        if estoque <= self.limiar:
+            self.baixo.add(id_produto)
+        if validade:
+            bisect.insort(self.validades, (validade, id_produto))
+
+    def excluir(self, id_produto):
+        atual = self.produtos.pop(id_produto, None)
+        if atual is None:
+            return None
+        self.baixo.discard(id_produto)
+        if atual[2]:
+            posicao = bisect.bisect_left(self.validades, (atual[2], id_produto))
+            if posicao < len(self.validades) and self.validades[posicao] == (atual[2], id_produto):
+                del self.validades[posicao]
+        return atual
+
+    def substituir(self, alteracoes):
+        # Troca vários produtos de uma vez ({id: (nome, estoque, validade) ou None para tirar});
+        # a lista de validades é refeita com um sort só, em vez de um insort por produto
+        for id_produto, valores in alteracoes.items():
+            self.produtos.pop(id_produto, None)
+            self.baixo.discard(id_produto)
+            if valores is not None:
+                self.produtos[id_produto] = valores
+                if valores[1] <= self.limiar:
+                    self.baixo.add(id_produto)
+        self.validades = sorted([item for item in self.validades if item[1] not in alteracoes]
+                                + [(valores[2], id_produto) for id_produto, valores in alteracoes.items()
+                                   if valores is not None and valores[2]])
+
+
+class AlertasEstoque:
+    def __init__(self, carregar, buscar, limiar=ESTOQUE_MINIMO, dias=VALIDADE_DIAS, versoes=None):
+        # carregar(limiar, ate): produtos ativos com estoque <= limiar ou validade <= ate;
+        # buscar(ids): os produtos indicados (colunas de COLUNAS_ALERTAS)
+        self.carregar = carregar
+        self.buscar = buscar
+        self.limiar = limiar
+        self.dias = dias
+        self.geracao = criar_geracao("alertas_estoque", versoes)
+        self._trava = threading.RLock()
+        self._dados = _Dados(limiar)
+        self._geracao_vista = None
+        self._recarregando = False
+
+    # --- manutenção ---
+    def atualizar(self, produto):
+        self.atualizar_varios([produto])
+
+    def atualizar_varios(self, produtos):
+        # Aceita registros completos ou parciais (só as colunas alteradas); parciais de
+        # produtos que não estão em memória são completados com uma consulta por id
+        if not produtos:
+            return
+        with self._trava:
+            faltando = {int(produto['id_produto']) for produto in produtos
+                        if int(produto['id_produto']) not in self._dados.produtos
+                        and produto.get('ativo', True) is not False and not {'estoque', 'validade'} <= produto.keys()}
+        completos = {int(produto['id_produto']): produto for produto in self.buscar(sorted(faltando))} if faltando else {}
+        with self._trava:
+            alteracoes = {}
+            for produto in produtos:
+                id_produto = int(produto['id_produto'])
+                base = completos.get(id_produto)
+                anterior = (alteracoes.get(id_produto) or self._dados.produtos.get(id_produto)
+                            or ((base.get('nome'), int(base.get('estoque') or 0), _data(base.get('validade'))) if base else (None, 0, None)))
+                if produto.get('ativo', True) is False or (base and base.get('ativo', True) is False):
+                    alteracoes[id_produto] = None
+                    continue
+                alteracoes[id_produto] = (
+                    produto.get('nome', anterior[0]),
+                    int(produto['estoque']) if produto.get('estoque') is not None else anterior[1],
+                    _data(produto['validade']) if 'validade' in produto else anterior[2])
+            # Quem deixou de ser candidato sai da memória
+            alteracoes = {id_produto: valores if valores is not None and self._dados.candidato(valores[1], valores[2]) else None
+                          for id_produto, valores in alteracoes.items()}
+            if len(alteracoes) == 1:
+                (id_produto, valores), = alteracoes.items()
+                self._dados.excluir(id_produto)
+                if valores is not None:
+                    self._dados.incluir(id_produto, *valores)
+            else:
+                self._dados.substituir(alteracoes)
+            self._avisar_outros_workers()
+
+    def definir_estoques(self, saldos):
+        # Saldos novos após venda ou movimentação ({id_produto: estoque}); a validade não muda.
+        # Produto fora da memória que caiu para o limiar é lido por id para entrar no painel
+        saldos = {int(id_produto): estoque for id_produto, estoque in saldos.items()}
+        with self._trava:
+            novos = [id_produto for id_produto, estoque in saldos.items()
+                     if id_produto not in self._dados.produtos and estoque <= self.limiar]
+        encontrados = self.buscar(sorted(novos)) if novos else []
+        with self._trava:
+            for produto in encontrados:
+                if produto.get('ativo', True) is not False:
+                    id_produto = int(produto['id_produto'])
+                    self._dados.excluir(id_produto)
+                    self._dados.incluir(id_produto, produto.get('nome'), saldos[id_produto], _data(produto.get('validade')))
+            for id_produto, estoque in saldos.items():
+                atual = self._dados.produtos.get(id_produto)
+                if atual is None:
+                    continue
+                if not self._dados.candidato(estoque, atual[2]):
+                    self._dados.excluir(id_produto)
+                    continue
+                self._dados.produtos[id_produto] = (atual[0], estoque, atual[2])
+                if estoque <= self.limiar:
+                    self._dados.baixo.add(id_produto)
+                else:
+                    self._dados.baixo.discard(id_produto)
+            self._avisar_outros_workers()
+
+    def remover(self, id_produto):
+        with self._trava:
+            self._dados.excluir(int(id_produto))
+            self._avisar_outros_workers()
+
+    def _avisar_outros_workers(self):
+        vista, nova = self._geracao_vista, self.geracao.incrementar()
+        if vista is not None and nova == vista + 1:
+            self._geracao_vista = nova
+
+    def reconstruir(self, hoje=None):
+        geracao = self.geracao.atual()
+        hoje = hoje or datetime.date.today()
+        dados = _Dados(self.limiar, hoje, (hoje + datetime.timedelta(days=2 * self.dias)).isoformat())
+        for produto in self.carregar(self.limiar, dados.ate):
+            if produto.get('ativo', True) is not False:
+                dados.incluir(int(produto['id_produto']), produto.get('nome'), int(produto.get('estoque') or 0),
+                              _data(produto.get('validade')))
+        with self._trava:
+            self._dados = dados
+            self._geracao_vista = geracao
+        logger.info("Alertas de estoque carregados: %d candidatos, %d abaixo do mínimo", len(dados.produtos), len(dados.baixo))
+
+    def _garantir_carregado(self, hoje):
+        if self._geracao_vista is None:
+            with self._trava:
+                if self._geracao_vista is None:
+                    self.reconstruir(hoje)
+        elif not self._recarregando and (self._dados.dia != hoje or self.geracao.atual() != self._geracao_vista):
+            # Outro worker alterou os dados ou o dia virou: relê os candidatos em segundo plano
+            self._recarregando = True
+            threading.Thread(target=self._recarregar_em_segundo_plano, args=(hoje,), daemon=True).start()
+
+    def _recarregar_em_segundo_plano(self, hoje):
+        try:
+            self.reconstruir(hoje)
+        except Exception as e:
+            logger.warning("Falha ao recarregar alertas de estoque: %s", e)
+        finally:
+            self._recarregando = False
+
+    # --- consulta ---
+    def _registro(self, id_produto):
+        nome, estoque, validade = self._dados.produtos[id_produto]
+        return {"id_produto": id_produto, "nome": nome, "estoque": estoque, "validade": validade}
+
+    def painel(self, limite=20, hoje=None):
+        hoje = hoje or datetime.date.today()
+        self._garantir_carregado(hoje)
+        ate = (hoje + datetime.timedelta(days=self.dias)).isoformat()
+        with self._trava:
+            produtos = self._dados.produtos
+            baixo = heapq.nsmallest(limite, self._dados.baixo,
+                                    key=lambda id_produto: (produtos[id_produto][1], produtos[id_produto][0] or ''))
+            # Vencidos e a vencer até a data limite são o prefixo da lista ordenada
+            fim = bisect.bisect_right(self._dados.validades, (ate, float('inf')))
+            return {
+                "limiar": self.limiar,
+                "dias": self.dias,
+                "hoje": hoje.isoformat(),
+                "estoque_baixo": [self._registro(id_produto) for id_produto in baixo],
+                "total_estoque_baixo": len(self._dados.baixo),
+                "vencendo": [self._registro(id_produto) for _, id_produto in self._dados.validades[:min(fim, limite)]],
+                "total_vencendo": fim,
+            }
+
+    def estatisticas(self):
+        return {"candidatos": len(self._dados.produtos), "estoque_baixo": len(self._dados.baixo),
+                "com_validade": len(self._dados.validades), "janela_validade": self._dados.ate,
+                "carregado": self._geracao_vista is not None}
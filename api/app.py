@@ -1,36 +1,129 @@
 import os
 import datetime
-import bcrypt
+import hmac
 import re
-from flask import Flask, request, jsonify, redirect, url_for, session, render_template, flash, make_response
-from functools import wraps, update_wrapper
-from supabase import create_client, Client
+from flask import Flask, request, jsonify, redirect, url_for, session, render_template, flash, Response, stream_with_context
+from functools import wraps
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
 
-# --- CONFIGURAÇÃO INICIAL ---
+# Antes dos módulos do projeto, que leem as configurações do ambiente ao serem importados
 load_dotenv()
 
-url: str = os.getenv("SUPABASE_URL")
-key: str = os.getenv("SUPABASE_KEY")
+from dados import BackendSobDemanda, criar_backend
+from paginacao import codificar_cursor, decodificar_cursor, tamanho_pagina, url_pagina
+from vendas import VendaInvalida, consolidar_itens, registrar_venda
+from estoque import ConflitoEstoque, EstoqueInsuficiente, ProdutoNaoEncontrado, movimentar_estoque
+from cache import CacheTTL
+from busca import IndiceTrigrama
+from alertas import COLUNAS_ALERTAS, AlertasEstoque
+from exportacao import FORMATOS, GERADORES, TAMANHO_LOTE_EXPORTACAO, FiltroInvalido, intervalo_datas
+from importacao import IMPORTACAO_TAMANHO_MAXIMO_MB, MODOS, ImportacaoInvalida, importar_clientes, importar_produtos, ler_csv
+from inventario import COLUNAS_INVENTARIO, aplicar_inventario
+import metricas
+import respostas
+import paralelo
+import relatorios
+import senhas
+from limites import LimitadorLogin, LimiteExcedido
 
-if not url or not key:
-    raise ValueError("Erro: As variáveis SUPABASE_URL e SUPABASE_KEY não foram encontradas. Verifique seu arquivo .env.")
-supabase: Client = create_client(url, key)
-app = Flask(__name__)
-app.secret_key = os.getenv("FLASK_SECRET_KEY", "uma-chave-secreta-padrao-muito-segura")
+# --- CONFIGURAÇÃO INICIAL ---
+# Repositórios de dados; ERP_BACKEND=sqlite roda tudo localmente, sem o Supabase.
+# O cliente só é montado no primeiro uso, uma vez por processo (depois do fork do gunicorn)
+db = BackendSobDemanda(lambda: metricas.medir_backend(criar_backend()))
+# Atrás de proxy (Render, nginx), o IP do cliente vem do X-Forwarded-For; o limite de login depende dele.
+# O gunicorn.conf.py (deploy no Render) define 1 quando a variável não está no ambiente
+PROXY_CONFIAVEL = int(os.getenv("PROXY_CONFIAVEL", 0))
+
+# As rotas são declaradas com @rota e registradas por criar_app, que monta o app
+ROTAS = []
+
+
+def rota(regra, **opcoes):
+    def decorador(view):
+        ROTAS.append((regra, view, opcoes))
+        return view
+    return decorador
+
+
+def criar_app(config=None):
+    app = Flask(__name__)
+    app.secret_key = os.getenv("FLASK_SECRET_KEY", "uma-chave-secreta-padrao-muito-segura")
+    app.jinja_env.globals['url_pagina'] = url_pagina
+    app.config['MAX_CONTENT_LENGTH'] = IMPORTACAO_TAMANHO_MAXIMO_MB * 1024 * 1024
+    app.config.update(config or {})
+    for regra, view, opcoes in ROTAS:
+        app.add_url_rule(regra, view_func=view, **opcoes)
+    # Server-Timing, log de requisições lentas e histogramas por rota (METRICAS_ATIVAS=0 desliga)
+    metricas.instalar(app)
+    # ?v=<hash> nos estáticos (cache de um ano) e gzip nas respostas de texto
+    respostas.instalar(app)
+    if PROXY_CONFIAVEL:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_CONFIAVEL)
+    return app
+
+
+limitador_login = LimitadorLogin()
+
+# Colunas exibidas nas listagens; evita trafegar a tabela inteira com select("*")
+COLUNAS_LISTA_USUARIOS = "id_usuario, nome, email, cpf, is_admin"
+COLUNAS_LISTA_PRODUTOS = "id_produto, nome, preco, estoque"
+COLUNAS_LISTA_CLIENTES = "id_cliente, nome, email, cpf"
+
+# As telas mostram só o histórico recente; o completo sai pela exportação
+HISTORICO_LIMITE = int(os.getenv("HISTORICO_LIMITE", 200))
+
+# Catálogo de produtos em cache por worker; a invalidação vale para todos (Redis ou tb_versao)
+catalogo = CacheTTL("catalogo", ttl=int(os.getenv("CATALOGO_CACHE_TTL", 60)),
+                    tamanho_maximo=int(os.getenv("CATALOGO_CACHE_TAMANHO", 256)), versoes=lambda: db.versoes)
+
+# Índices de busca por substring (carregados no primeiro uso de cada worker)
+COLUNAS_INDICE_PRODUTOS = ["id_produto", "nome", "marca", "preco"]
+COLUNAS_INDICE_CLIENTES = ["id_cliente", "nome", "cpf"]
+indice_produtos = IndiceTrigrama(
+    "produtos", "id_produto", ["nome", "marca"], COLUNAS_INDICE_PRODUTOS,
+    lambda: db.produtos.percorrer(", ".join(COLUNAS_INDICE_PRODUTOS)), versoes=lambda: db.versoes)
+indice_clientes = IndiceTrigrama(
+    "clientes", "id_cliente", ["nome", "cpf"], COLUNAS_INDICE_CLIENTES,
+    lambda: db.clientes.percorrer(", ".join(COLUNAS_INDICE_CLIENTES)), versoes=lambda: db.versoes)
+
+# Estoque baixo e validade próxima no painel, mantidos a cada movimentação, venda e edição
+alertas = AlertasEstoque(lambda limiar, ate: db.produtos.em_alerta(limiar, ate, COLUNAS_ALERTAS),
+                         lambda ids: db.produtos.por_ids(ids, COLUNAS_ALERTAS), versoes=lambda: db.versoes)
 
 
 # --- DECORATORS E FUNÇÕES HELPER ---
-def nocache(view):
-    @wraps(view)
-    def no_cache(*args, **kwargs):
-        response = make_response(view(*args, **kwargs))
-        response.headers['Last-Modified'] = datetime.datetime.now()
-        response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, post-check=0, pre-check=0, max-age=0'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '-1'
-        return response
-    return update_wrapper(no_cache, view)
+def condicional(*tabelas, extra=None):
+    # ETag pelas versões das tabelas exibidas: página sem mudança volta 304, sem consulta nem render
+    return respostas.condicional(lambda nomes: db.versoes.por_ids(nomes, "tabela, versao, alterado_em"), *tabelas, extra=extra)
+
+def geracao_da_busca(indice):
+    # Com ?q= a página sai do índice do worker, que recarrega em segundo plano depois de uma
+    # escrita em outro worker: a geração carregada entra no ETag, e a página muda quando ele alcança
+    return lambda: indice.geracao_carregada() if request.args.get('q', '').strip() else None
+
+def do_catalogo(chave, carregar):
+    # Em view condicional, a chave leva a versão de tb_produto que entrou no ETag: o cache
+    # de cada worker não devolve dados anteriores à versão que a página anuncia
+    versao = respostas.versao_lida("tb_produto")
+    return catalogo.obter(chave if versao is None else chave + (versao,), carregar)
+
+def pagina_da_busca(indice, repositorio, colunas, termo, cursor, tamanho):
+    # O índice resolve a busca e a ordem; o banco só devolve as linhas da página, por id
+    ids, proxima = indice.pagina(termo, decodificar_cursor(cursor), tamanho)
+    if not ids:
+        return [], None
+    linhas = repositorio.por_ids(ids, colunas)
+    linhas.sort(key=lambda linha: (linha['nome'] or '', linha[repositorio.coluna_id]))
+    return linhas, codificar_cursor(*proxima) if proxima else None
+
+def pagina_da_listagem(repositorio, colunas, cursor, tamanho, **filtros):
+    linhas, proxima = repositorio.pagina(colunas, decodificar_cursor(cursor), tamanho, **filtros)
+    return linhas, codificar_cursor(*proxima) if proxima else None
+
+def termo_cliente(termo):
+    # CPF digitado com pontuação é buscado só pelos dígitos, como está gravado
+    return re.sub(r'\D', '', termo) if re.fullmatch(r'[\d.\-/ ]+', termo) else termo
 
 def login_required():
     def wrapper(f):
@@ -57,18 +150,40 @@ def admin_required():
         return decorated_function
     return wrapper
 
+# --- SAÚDE (HEALTH CHECK DO RENDER, SEM LOGIN) ---
+@rota('/saude')
+def saude():
+    # Vivo: responde sem tocar no banco
+    return jsonify({"status": "ok"})
+
+@rota('/saude/pronto')
+def saude_pronto():
+    # Pronto: o backend deste processo está montado (monta agora se preciso), sem consultar o banco
+    try:
+        backend = db.iniciar()
+    except Exception as e:
+        return jsonify({"status": "indisponivel", "erro": str(e)}), 503
+    return jsonify({"status": "pronto", "backend": backend.nome, "pid": os.getpid()})
+
 # --- ROTAS PÚBLICAS (LOGIN, CADASTRO, LOGOUT) ---
-@app.route('/login', methods=['GET', 'POST'])
+@rota('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         email_input = request.form.get('email')
         senha_input = request.form.get('senha')
         try:
-            result = supabase.table("tb_usuario").select("id_usuario, nome, senha, is_admin").eq("email", email_input).limit(1).execute()
-            if result.data:
-                usuario = result.data[0]
-                stored_senha_hash = usuario['senha'].encode('utf-8')
-                if bcrypt.checkpw(senha_input.encode('utf-8'), stored_senha_hash):
+            limitador_login.reservar(email_input, request.remote_addr)
+        except LimiteExcedido as e:
+            flash(str(e), 'erro')
+            return render_template('login.html'), 429
+        try:
+            usuario = db.usuarios.por_email(email_input, "id_usuario, nome, senha, is_admin")
+            if usuario:
+                if senhas.verificar(senha_input, usuario['senha']):
+                    limitador_login.devolver(email_input, request.remote_addr)
+                    senhas.atualizar_hash_se_preciso(
+                        senha_input, usuario['senha'],
+                        lambda novo_hash, id_usuario=usuario['id_usuario']: db.usuarios.atualizar(id_usuario, {"senha": novo_hash}))
                     session['logged_in'] = True
                     session['id_usuario'] = usuario['id_usuario']
                     session['nome_usuario'] = usuario['nome']
@@ -76,11 +191,15 @@ def login():
                     flash(f"Bem-vindo(a), {usuario['nome']}!", 'sucesso')
                     return redirect(url_for('admin_dashboard')) if session.get('is_admin') else redirect(url_for('inicio'))
             flash('Email ou senha incorretos.', 'erro')
+        except senhas.SenhasOcupadas as e:
+            limitador_login.devolver(email_input, request.remote_addr)  # a tentativa nem chegou a ser verificada
+            flash(str(e), 'erro')
+            return render_template('login.html'), 503
         except Exception as e:
             flash(f'Ocorreu um erro: {e}', 'erro')
     return render_template('login.html')
 
-@app.route('/cadastro', methods=['GET', 'POST'])
+@rota('/cadastro', methods=['GET', 'POST'])
 def cadastro():
     if request.method == 'POST':
         nome = request.form.get('nome')
@@ -89,17 +208,13 @@ def cadastro():
         senha = request.form.get('senha')
         try:
             cpf_limpo = re.sub(r'\D', '', cpf)
-            existing_user = supabase.table("tb_usuario").select("cpf").eq("cpf", cpf_limpo).limit(1).execute()
-            if existing_user.data:
+            if db.usuarios.existe(cpf=cpf_limpo):
                 flash('Este CPF já está cadastrado.', 'erro')
                 return render_template('cadastro.html')
             
-            senha_hash = bcrypt.hashpw(senha.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-            supabase.table("tb_usuario").insert({"nome": nome, "cpf": cpf_limpo, "email": email, "senha": senha_hash, "is_admin": False}).execute()
-            
-            result = supabase.table("tb_usuario").select("id_usuario, nome, is_admin").eq("email", email).limit(1).execute()
-            if result.data:
-                usuario = result.data[0]
+            senha_hash = senhas.gerar_hash(senha)
+            usuario = db.usuarios.inserir({"nome": nome, "cpf": cpf_limpo, "email": email, "senha": senha_hash, "is_admin": False})
+            if usuario:
                 session['logged_in'] = True
                 session['id_usuario'] = usuario['id_usuario']
                 session['nome_usuario'] = usuario['nome']
@@ -110,30 +225,32 @@ def cadastro():
             flash(f'Ocorreu um erro ao cadastrar: {e}', 'erro')
     return render_template('cadastro.html')
 
-@app.route('/logout')
+@rota('/logout')
 def logout():
     session.clear()
     flash('Você saiu da sua conta.', 'sucesso')
     return redirect(url_for('login'))
 
-@app.route('/')
+@rota('/')
 def home():
     if session.get('logged_in'):
         return redirect(url_for('admin_dashboard')) if session.get('is_admin') else redirect(url_for('inicio'))
     return redirect(url_for('login'))
 
 # --- ROTAS PRINCIPAIS (USUÁRIO COMUM) ---
-@app.route('/inicio')
+@rota('/inicio')
 @login_required()
 def inicio():
     return render_template('inicio.html')
 
-@app.route('/perfil', methods=['GET', 'POST'])
+@rota('/perfil', methods=['GET', 'POST'])
 @login_required()
 def perfil():
     user_id = session.get('id_usuario')
     try:
-        current_user_data = supabase.table("tb_usuario").select("*").eq("id_usuario", user_id).single().execute().data
+        current_user_data = db.usuarios.obter(user_id)
+        if not current_user_data:
+            raise LookupError("usuário não encontrado")
     except Exception as e:
         flash(f'Não foi possível carregar os dados do perfil: {e}', 'erro')
         return redirect(url_for('inicio'))
@@ -146,28 +263,50 @@ def perfil():
     return render_template('perfil.html', usuario=current_user_data)
 
 # --- ROTAS DE ADMINISTRAÇÃO ---
-@app.route('/admin')
+@rota('/admin')
 @admin_required()
 def admin_dashboard():
-    return render_template('admin.html')
+    try:
+        painel = alertas.painel()
+    except Exception as e:
+        flash(f"Não foi possível carregar os alertas de estoque: {e}", "erro")
+        painel = None
+    return render_template('admin.html', painel=painel)
+
+@rota('/admin/cache')
+@admin_required()
+def estatisticas_cache():
+    return jsonify({"catalogo": catalogo.estatisticas(),
+                    "busca": {"produtos": indice_produtos.estatisticas(), "clientes": indice_clientes.estatisticas()},
+                    "alertas": alertas.estatisticas(), "senhas": senhas.estatisticas(),
+                    "paralelo": paralelo.estatisticas(), "relatorios": relatorios.estatisticas()})
+
+@rota('/admin/metricas')
+def metricas_prometheus():
+    # Admin logado ou scraper do Prometheus com METRICAS_TOKEN no cabeçalho Authorization: Bearer
+    token = os.getenv("METRICAS_TOKEN")
+    token_valido = bool(token) and hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}")
+    if not token_valido and not session.get('is_admin'):
+        return Response("Acesso negado.", status=403, mimetype='text/plain')
+    return Response(metricas.exportar_prometheus(), mimetype='text/plain; version=0.0.4')
 
 # --- GERENCIAMENTO DE USUÁRIOS (ADMIN) ---
-@app.route('/admin/gerenciar-usuarios', methods=['GET'])
+@rota('/admin/gerenciar-usuarios', methods=['GET'])
 @admin_required()
-@nocache
+@condicional("tb_usuario")
 def gerenciar_usuarios():
     termo_busca = request.args.get('busca', '').strip()
+    cursor = request.args.get('cursor')
     try:
-        query = supabase.table("tb_usuario").select("*").order("nome")
-        if termo_busca:
-            query = query.ilike('nome', f'%{termo_busca}%')
-        usuarios = query.execute().data
-        return render_template('gerenciar_usuarios.html', usuarios=usuarios, termo_busca=termo_busca)
+        usuarios, proximo_cursor = pagina_da_listagem(db.usuarios, COLUNAS_LISTA_USUARIOS, cursor,
+                                                      tamanho_pagina(request.args.get('por_pagina')), termo=termo_busca)
+        return render_template('gerenciar_usuarios.html', usuarios=usuarios, termo_busca=termo_busca,
+                               cursor=cursor, proximo_cursor=proximo_cursor)
     except Exception as e:
         flash(f"Erro ao carregar usuários: {e}", "erro")
         return render_template('gerenciar_usuarios.html', usuarios=[], termo_busca=termo_busca)
 
-@app.route('/admin/usuarios/adicionar', methods=['GET', 'POST'])
+@rota('/admin/usuarios/adicionar', methods=['GET', 'POST'])
 @admin_required()
 def adicionar_usuario():
     if request.method == 'POST':
@@ -179,24 +318,25 @@ def adicionar_usuario():
             is_admin = True
             
             cpf_limpo = re.sub(r'\D', '', cpf)
-            existing = supabase.table("tb_usuario").select("id_usuario").or_(f"cpf.eq.{cpf_limpo},email.eq.{email}").execute().data
-            if existing:
+            if db.usuarios.existe(cpf=cpf_limpo, email=email):
                 flash("Já existe um usuário com este CPF ou Email.", "erro")
                 return render_template('adicionar_usuario.html')
 
-            senha_hash = bcrypt.hashpw(senha.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-            supabase.table("tb_usuario").insert({"nome": nome, "email": email, "cpf": cpf_limpo, "senha": senha_hash, "is_admin": is_admin}).execute()
+            senha_hash = senhas.gerar_hash(senha)
+            db.usuarios.inserir({"nome": nome, "email": email, "cpf": cpf_limpo, "senha": senha_hash, "is_admin": is_admin})
             flash("Usuário administrador adicionado com sucesso!", "sucesso")
             return redirect(url_for('gerenciar_usuarios'))
         except Exception as e:
             flash(f"Erro ao adicionar usuário: {e}", "erro")
     return render_template('adicionar_usuario.html')
 
-@app.route('/admin/usuarios/editar/<int:id_usuario>', methods=['GET', 'POST'])
+@rota('/admin/usuarios/editar/<int:id_usuario>', methods=['GET', 'POST'])
 @admin_required()
 def editar_usuario(id_usuario):
     try:
-        usuario = supabase.table("tb_usuario").select("*").eq("id_usuario", id_usuario).single().execute().data
+        usuario = db.usuarios.obter(id_usuario)
+        if not usuario:
+            raise LookupError("usuário não encontrado")
     except Exception as e:
         flash(f"Erro ao carregar usuário: {e}", "erro")
         return redirect(url_for('gerenciar_usuarios'))
@@ -205,43 +345,49 @@ def editar_usuario(id_usuario):
         try:
             dados = {'nome': request.form.get('nome'), 'email': request.form.get('email'), 'is_admin': request.form.get('is_admin') == 'on'}
             # (Lógica completa de validação de CPF/email e atualização de senha aqui)
-            supabase.table("tb_usuario").update(dados).eq("id_usuario", id_usuario).execute()
+            db.usuarios.atualizar(id_usuario, dados)
             flash("Usuário atualizado com sucesso!", "sucesso")
             return redirect(url_for('gerenciar_usuarios'))
         except Exception as e:
             flash(f"Erro ao atualizar usuário: {e}", "erro")
     return render_template('editar_usuario.html', usuario=usuario)
 
-@app.route('/admin/usuarios/excluir/<int:id_usuario>', methods=['POST'])
+@rota('/admin/usuarios/excluir/<int:id_usuario>', methods=['POST'])
 @admin_required()
 def excluir_usuario(id_usuario):
     if id_usuario == session.get('id_usuario'):
         flash("Você não pode excluir sua própria conta.", "erro")
         return redirect(url_for('gerenciar_usuarios'))
     try:
-        supabase.table("tb_usuario").delete().eq("id_usuario", id_usuario).execute()
+        db.usuarios.excluir(id_usuario)
         flash("Usuário excluído com sucesso!", "sucesso")
     except Exception as e:
         flash(f"Erro ao excluir usuário: {e}", "erro")
     return redirect(url_for('gerenciar_usuarios'))
 
 # --- GERENCIAMENTO DE PRODUTOS (ADMIN) ---
-@app.route('/admin/gerenciar-produtos', methods=['GET'])
+@rota('/admin/gerenciar-produtos', methods=['GET'])
 @admin_required()
-@nocache
+@condicional("tb_produto", extra=geracao_da_busca(indice_produtos))
 def gerenciar_produtos():
     termo_busca = request.args.get('q', '').strip()
+    cursor = request.args.get('cursor')
     try:
-        query = supabase.table("tb_produto").select("*").order("nome")
+        tamanho = tamanho_pagina(request.args.get('por_pagina'))
         if termo_busca:
-            query = query.ilike('nome', f'%{termo_busca}%')
-        produtos = query.execute().data
-        return render_template('gerenciar_produtos.html', produtos=produtos, termo_busca=termo_busca)
+            produtos, proximo_cursor = pagina_da_busca(indice_produtos, db.produtos, COLUNAS_LISTA_PRODUTOS,
+                                                       termo_busca, cursor, tamanho)
+        else:
+            produtos, proximo_cursor = do_catalogo(
+                ("pagina", cursor, tamanho),
+                lambda: pagina_da_listagem(db.produtos, COLUNAS_LISTA_PRODUTOS, cursor, tamanho))
+        return render_template('gerenciar_produtos.html', produtos=produtos, termo_busca=termo_busca,
+                               cursor=cursor, proximo_cursor=proximo_cursor)
     except Exception as e:
         flash(f"Erro ao carregar produtos: {e}", "erro")
         return render_template('gerenciar_produtos.html', produtos=[], termo_busca=termo_busca)
 
-@app.route('/admin/produtos/adicionar', methods=['GET', 'POST'])
+@rota('/admin/produtos/adicionar', methods=['GET', 'POST'])
 @admin_required()
 def adicionar_produto():
     if request.method == 'POST':
@@ -251,18 +397,25 @@ def adicionar_produto():
                 "preco": float(request.form.get('preco', 0)), "estoque": 0,
                 "validade": request.form.get('validade') or None
             }
-            supabase.table("tb_produto").insert(dados).execute()
+            novo = db.produtos.inserir(dados)
+            catalogo.invalidar()
+            if novo:
+                indice_produtos.atualizar(novo)
+                alertas.atualizar(novo)
             flash("Produto adicionado com sucesso!", "sucesso")
         except Exception as e:
             flash(f"Erro ao adicionar produto: {e}", "erro")
         return redirect(url_for('gerenciar_produtos'))
     return render_template('adicionar_produto.html')
 
-@app.route('/admin/produtos/editar/<int:id_produto>', methods=['GET', 'POST'])
+@rota('/admin/produtos/editar/<int:id_produto>', methods=['GET', 'POST'])
 @admin_required()
+@condicional("tb_produto")
 def editar_produto(id_produto):
     try:
-        produto = supabase.table("tb_produto").select("*").eq("id_produto", id_produto).single().execute().data
+        produto = do_catalogo(("produto", id_produto), lambda: db.produtos.obter(id_produto))
+        if not produto:
+            raise LookupError("produto não encontrado")
     except Exception as e:
         flash(f"Não foi possível carregar o produto: {e}", "erro")
         return redirect(url_for('gerenciar_produtos'))
@@ -273,50 +426,61 @@ def editar_produto(id_produto):
                 "preco": float(request.form.get('preco', 0)), "estoque": int(request.form.get('estoque', 0)),
                 "validade": request.form.get('validade') or None
             }
-            supabase.table("tb_produto").update(dados).eq("id_produto", id_produto).execute()
+            atualizado = db.produtos.atualizar(id_produto, dados)
+            catalogo.invalidar()
+            if atualizado:
+                indice_produtos.atualizar(atualizado)
+                alertas.atualizar(atualizado)
             flash("Produto atualizado com sucesso!", "sucesso")
             return redirect(url_for('gerenciar_produtos'))
         except Exception as e:
             flash(f"Erro ao atualizar produto: {e}", "erro")
     return render_template('editar_produto.html', produto=produto)
 
-@app.route('/admin/produtos/excluir/<int:id_produto>', methods=['POST'])
+@rota('/admin/produtos/excluir/<int:id_produto>', methods=['POST'])
 @admin_required()
 def excluir_produto(id_produto):
     try:
-        movimentos = supabase.table("tb_estoque_mov").select("id_mov", count='exact').eq("id_produto", id_produto).execute()
-        if movimentos.count > 0:
+        uso = paralelo.em_paralelo({"movimentos": lambda: db.movimentos.contar_do_produto(id_produto),
+                                    "vendas": lambda: db.vendas.contar_itens_do_produto(id_produto)})
+        if uso["movimentos"] > 0:
             flash("Este produto não pode ser excluído, pois possui um histórico de movimentações.", "erro")
             return redirect(url_for('gerenciar_produtos'))
         
-        itens_venda = supabase.table("tb_venda_item").select("id_venda_item", count='exact').eq("id_produto", id_produto).execute()
-        if itens_venda.count > 0:
+        if uso["vendas"] > 0:
             flash("Este produto não pode ser excluído, pois está associado a vendas.", "erro")
             return redirect(url_for('gerenciar_produtos'))
 
-        supabase.table("tb_produto").delete().eq("id_produto", id_produto).execute()
+        db.produtos.excluir(id_produto)
+        catalogo.invalidar()
+        indice_produtos.remover(id_produto)
+        alertas.remover(id_produto)
         flash("Produto excluído com sucesso!", "sucesso")
     except Exception as e:
         flash(f"Erro ao excluir produto: {e}", "erro")
     return redirect(url_for('gerenciar_produtos'))
 
 # --- GERENCIAMENTO DE CLIENTES (ADMIN) ---
-@app.route('/admin/gerenciar-clientes', methods=['GET'])
+@rota('/admin/gerenciar-clientes', methods=['GET'])
 @admin_required()
-@nocache
+@condicional("tb_cliente", extra=geracao_da_busca(indice_clientes))
 def gerenciar_clientes():
     termo_busca = request.args.get('q', '').strip()
+    cursor = request.args.get('cursor')
     try:
-        query = supabase.table("tb_cliente").select("*").order("nome")
+        tamanho = tamanho_pagina(request.args.get('por_pagina'))
         if termo_busca:
-            query = query.or_(f"nome.ilike.%{termo_busca}%,cpf.ilike.%{termo_busca}%")
-        clientes = query.execute().data
-        return render_template('gerenciar_clientes.html', clientes=clientes, termo_busca=termo_busca)
+            clientes, proximo_cursor = pagina_da_busca(indice_clientes, db.clientes, COLUNAS_LISTA_CLIENTES,
+                                                       termo_cliente(termo_busca), cursor, tamanho)
+        else:
+            clientes, proximo_cursor = pagina_da_listagem(db.clientes, COLUNAS_LISTA_CLIENTES, cursor, tamanho)
+        return render_template('gerenciar_clientes.html', clientes=clientes, termo_busca=termo_busca,
+                               cursor=cursor, proximo_cursor=proximo_cursor)
     except Exception as e:
         flash(f"Erro ao carregar clientes: {e}", "erro")
         return render_template('gerenciar_clientes.html', clientes=[], termo_busca=termo_busca)
 
-@app.route('/admin/clientes/adicionar', methods=['GET', 'POST'])
+@rota('/admin/clientes/adicionar', methods=['GET', 'POST'])
 @admin_required()
 def adicionar_cliente():
     if request.method == 'POST':
@@ -324,100 +488,226 @@ def adicionar_cliente():
             nome = request.form.get('nome')
             email = request.form.get('email')
             cpf = re.sub(r'\D', '', request.form.get('cpf'))
-            existing = supabase.table("tb_cliente").select("id_cliente").eq("cpf", cpf).execute().data
-            if existing:
+            if db.clientes.existe_cpf(cpf):
                 flash("Cliente já cadastrado com esse CPF.", "erro")
                 return redirect(url_for('adicionar_cliente'))
-            supabase.table("tb_cliente").insert({"nome": nome, "email": email, "cpf": cpf}).execute()
+            novo = db.clientes.inserir({"nome": nome, "email": email, "cpf": cpf})
+            if novo:
+                indice_clientes.atualizar(novo)
             flash("Cliente adicionado com sucesso!", "sucesso")
         except Exception as e:
             flash(f"Erro ao adicionar cliente: {e}", "erro")
         return redirect(url_for('gerenciar_clientes'))
     return render_template('adicionar_cliente.html')
 
-@app.route('/admin/clientes/editar/<int:id_cliente>', methods=['GET', 'POST'])
+@rota('/admin/clientes/editar/<int:id_cliente>', methods=['GET', 'POST'])
 @admin_required()
 def editar_cliente(id_cliente):
     try:
-        cliente = supabase.table("tb_cliente").select("*").eq("id_cliente", id_cliente).single().execute().data
+        cliente = db.clientes.obter(id_cliente)
+        if not cliente:
+            raise LookupError("cliente não encontrado")
     except Exception as e:
         flash(f"Erro ao carregar cliente: {e}", "erro")
         return redirect(url_for('gerenciar_clientes'))
     if request.method == 'POST':
         try:
             dados = {"nome": request.form.get('nome'), "email": request.form.get('email'), "cpf": re.sub(r'\D', '', request.form.get('cpf'))}
-            supabase.table("tb_cliente").update(dados).eq("id_cliente", id_cliente).execute()
+            atualizado = db.clientes.atualizar(id_cliente, dados)
+            if atualizado:
+                indice_clientes.atualizar(atualizado)
             flash("Cliente atualizado com sucesso!", "sucesso")
         except Exception as e:
             flash(f"Erro ao atualizar cliente: {e}", "erro")
         return redirect(url_for('gerenciar_clientes'))
     return render_template('editar_cliente.html', cliente=cliente)
 
-@app.route('/admin/clientes/excluir/<int:id_cliente>', methods=['POST'])
+@rota('/admin/clientes/excluir/<int:id_cliente>', methods=['POST'])
 @admin_required()
 def excluir_cliente(id_cliente):
     try:
-        supabase.table("tb_cliente").delete().eq("id_cliente", id_cliente).execute()
+        db.clientes.excluir(id_cliente)
+        indice_clientes.remover(id_cliente)
         flash("Cliente excluído com sucesso!", "sucesso")
     except Exception as e:
         flash(f"Erro ao excluir cliente: {e}", "erro")
     return redirect(url_for('gerenciar_clientes'))
 
+# --- IMPORTAÇÃO EM LOTE (ADMIN) ---
+def produtos_importados(registros):
+    catalogo.invalidar()
+    indice_produtos.atualizar_varios(registros)
+    alertas.atualizar_varios(registros)
+
+IMPORTACOES = {
+    "produtos": {
+        "titulo": "Produtos", "origem": "gerenciar_produtos", "importar": importar_produtos,
+        "obrigatorias": ["nome", "preco"], "colunas": "nome, preco, marca, validade, id_produto",
+        "ajuda": "Linhas com id_produto atualizam o produto existente; sem id, um produto com o mesmo nome e marca é atualizado e os demais viram produtos novos com estoque zero.",
+        "ao_gravar": produtos_importados,
+    },
+    "clientes": {
+        "titulo": "Clientes", "origem": "gerenciar_clientes", "importar": importar_clientes,
+        "obrigatorias": ["nome", "cpf"], "colunas": "nome, cpf, email",
+        "ajuda": "O CPF pode vir com ou sem pontuação; clientes com CPF já cadastrado são atualizados ou mantidos.",
+        "ao_gravar": indice_clientes.atualizar_varios,
+    },
+}
+
+@rota('/admin/importar/<tipo>', methods=['GET', 'POST'])
+@admin_required()
+def importar(tipo):
+    config = IMPORTACOES.get(tipo)
+    if not config:
+        return redirect(url_for('admin_dashboard'))
+    contexto = {"tipo": tipo, "titulo": config["titulo"], "origem": config["origem"],
+                "colunas": config["colunas"], "ajuda": config["ajuda"]}
+    if request.method == 'POST':
+        arquivo = request.files.get('arquivo')
+        modo = request.form.get('modo', 'atualizar')
+        if not arquivo or not arquivo.filename or modo not in MODOS:
+            flash("Selecione um arquivo CSV para importar.", "erro")
+            return render_template('importar.html', **contexto)
+        try:
+            linhas = ler_csv(arquivo.stream, config["obrigatorias"])
+            relatorio = config["importar"](db, linhas, modo, config["ao_gravar"])
+        except ImportacaoInvalida as e:
+            flash(str(e), "erro")
+            return render_template('importar.html', **contexto)
+        except Exception as e:
+            flash(f"Erro ao importar o arquivo: {e}", "erro")
+            return render_template('importar.html', **contexto)
+        flash(f"Importação concluída: {relatorio.inseridos} incluído(s), {relatorio.atualizados} atualizado(s), "
+              f"{relatorio.total_erros} com erro.", "sucesso" if not relatorio.total_erros else "info")
+        return render_template('importar.html', relatorio=relatorio, **contexto)
+    return render_template('importar.html', **contexto)
+
+# --- BUSCA RÁPIDA (AUTOCOMPLETE DO CAIXA) ---
+# Só para administradores, como a tela de venda que usa: o índice de clientes traz CPF
+def limite_autocomplete():
+    try:
+        return max(1, min(int(request.args.get('limite', 10)), 50))
+    except ValueError:
+        return 10
+
+@rota('/api/autocomplete/produtos')
+@admin_required()
+def autocomplete_produtos():
+    return jsonify(indice_produtos.buscar(request.args.get('q', ''), limite_autocomplete()))
+
+@rota('/api/autocomplete/clientes')
+@admin_required()
+def autocomplete_clientes():
+    return jsonify(indice_clientes.buscar(termo_cliente(request.args.get('q', '').strip()), limite_autocomplete()))
+
 # --- GERENCIAMENTO DE VENDAS (ADMIN) ---
-@app.route('/admin/gerenciar-vendas')
+@rota('/admin/gerenciar-vendas')
 @admin_required()
-@nocache
+@condicional("tb_venda", "tb_usuario")
 def gerenciar_vendas():
     try:
-        vendas_response = supabase.table("tb_venda").select("*, tb_usuario(nome)").order("data_venda", desc=True).execute()
-        return render_template('gerenciar_vendas.html', vendas=vendas_response.data)
+        vendas = db.vendas.recentes(HISTORICO_LIMITE)
+        return render_template('gerenciar_vendas.html', vendas=vendas, limite=HISTORICO_LIMITE)
     except Exception as e:
         flash("Não foi possível carregar a lista de vendas.", "erro")
         return render_template('gerenciar_vendas.html', vendas=[])
     
-@app.route('/admin/vendas/adicionar', methods=['GET', 'POST'])
+@rota('/admin/vendas/adicionar', methods=['GET', 'POST'])
 @admin_required()
 def adicionar_venda():
     if request.method == 'POST':
         try:
             produtos_selecionados = request.form.getlist('produtos[]')
             quantidades = request.form.getlist('quantidades[]')
-            
-            for i, id_produto in enumerate(produtos_selecionados):
-                qtd = int(quantidades[i])
-                produto = supabase.table("tb_produto").select("nome, estoque").eq("id_produto", id_produto).single().execute().data
-                if produto['estoque'] < qtd:
-                    flash(f"Venda não realizada. Estoque de '{produto['nome']}' insuficiente.", "erro")
-                    return redirect(url_for('adicionar_venda'))
-            
-            # (Lógica completa para processar a venda)
+            itens = consolidar_itens(produtos_selecionados, quantidades)
+            _, saldos = registrar_venda(db, session.get('id_usuario'), itens, request.form.get('id_cliente') or None)
+            catalogo.invalidar()
+            alertas.definir_estoques(saldos)
             flash("Venda registrada com sucesso!", "sucesso")
             return redirect(url_for('gerenciar_vendas'))
+        except VendaInvalida as e:
+            flash(str(e), "erro")
+            return redirect(url_for('adicionar_venda'))
         except Exception as e:
             flash(f"Ocorreu um erro ao registrar a venda: {e}", "erro")
             return redirect(url_for('adicionar_venda'))
 
     try:
-        produtos = supabase.table("tb_produto").select("*").eq('ativo', True).order("nome").execute().data
+        produtos = catalogo.obter(("ativos",), lambda: db.produtos.listar("*", apenas_ativos=True))
         return render_template('adicionar_venda.html', produtos=produtos)
     except Exception as e:
         flash(f"Não foi possível carregar os produtos: {e}", "erro")
         return redirect(url_for('admin_dashboard'))
 
+# --- RELATÓRIOS DE VENDAS (ADMIN) ---
+RELATORIOS_LIMITE = int(os.getenv("RELATORIOS_LIMITE", 20))
+
+def limite_relatorio():
+    try:
+        return max(1, min(int(request.args.get('limite', RELATORIOS_LIMITE)), 1000))
+    except ValueError:
+        return RELATORIOS_LIMITE
+
+@rota('/admin/relatorios')
+@admin_required()
+def relatorios_vendas():
+    ordem = request.args.get('ordem', 'receita')
+    try:
+        inicio, fim = relatorios.periodo(request.args.get('inicio'), request.args.get('fim'))
+        agregado = relatorios.agregar_vendas(db, inicio, fim)
+        tabelas = relatorios.nomear(db, {"produto": relatorios.ranking(agregado, "produto", ordem, RELATORIOS_LIMITE),
+                                          "vendedor": relatorios.ranking(agregado, "vendedor", ordem)})
+    except FiltroInvalido as e:
+        flash(str(e), "erro")
+        return redirect(url_for('relatorios_vendas'))
+    except paralelo.ConsultaExpirada:
+        flash("O relatório demorou demais para ser calculado. Os meses já prontos ficam guardados; tente novamente.", "erro")
+        return redirect(url_for('gerenciar_vendas'))
+    except Exception as e:
+        flash(f"Não foi possível gerar o relatório: {e}", "erro")
+        return redirect(url_for('gerenciar_vendas'))
+    return render_template('relatorios.html', inicio=inicio, fim=fim - datetime.timedelta(days=1), ordem=ordem,
+                           ordens=relatorios.ORDENS, totais=relatorios.totais(agregado), produtos=tabelas["produto"],
+                           vendedores=tabelas["vendedor"], dias=relatorios.serie_diaria(agregado, inicio, fim),
+                           limite=RELATORIOS_LIMITE)
+
+@rota('/api/relatorios/vendas')
+@admin_required()
+def api_relatorio_vendas():
+    dimensao = request.args.get('dimensao', 'produto')
+    ordem = request.args.get('ordem', 'receita')
+    try:
+        if dimensao not in relatorios.DIMENSOES:
+            raise relatorios.RelatorioInvalido(f"Dimensão inválida: {dimensao}. Use uma de: {', '.join(relatorios.DIMENSOES)}.")
+        inicio, fim = relatorios.periodo(request.args.get('inicio'), request.args.get('fim'))
+        agregado = relatorios.agregar_vendas(db, inicio, fim)
+        if dimensao == "dia":
+            linhas = relatorios.serie_diaria(agregado, inicio, fim)
+        else:
+            linhas = relatorios.nomear(db, {dimensao: relatorios.ranking(agregado, dimensao, ordem, limite_relatorio())})[dimensao]
+    except FiltroInvalido as e:
+        return jsonify({"erro": str(e)}), 400
+    except paralelo.ConsultaExpirada as e:
+        return jsonify({"erro": str(e)}), 503
+    except Exception as e:
+        return jsonify({"erro": f"Não foi possível gerar o relatório: {e}"}), 503
+    return jsonify({"inicio": inicio.isoformat(), "fim": (fim - datetime.timedelta(days=1)).isoformat(), "dimensao": dimensao,
+                    "ordem": ordem, "totais": relatorios.totais(agregado), "linhas": linhas})
+
 # --- GERENCIAMENTO DE ESTOQUE (ADMIN) ---
-@app.route('/admin/estoque')
+@rota('/admin/estoque')
 @admin_required()
-@nocache
+@condicional("tb_estoque_mov", "tb_produto")
 def estoque_mov():
     try:
-        movimentos = supabase.table("tb_estoque_mov").select("*, tb_produto(nome)").order("criado_em", desc=True).execute()
-        produtos = supabase.table("tb_produto").select("id_produto, nome").order("nome").execute()
-        return render_template('estoque.html', movimentos=movimentos.data, produtos=produtos.data)
+        dados = paralelo.em_paralelo({"movimentos": lambda: db.movimentos.recentes(HISTORICO_LIMITE),
+                                      "produtos": lambda: do_catalogo(("nomes",), lambda: db.produtos.listar("id_produto, nome"))})
+        return render_template('estoque.html', limite=HISTORICO_LIMITE, **dados)
     except Exception as e:
         flash(f"Não foi possível carregar o histórico de estoque: {e}", "erro")
         return render_template('estoque.html', movimentos=[], produtos=[])
 
-@app.route('/admin/estoque/adicionar', methods=['POST'])
+@rota('/admin/estoque/adicionar', methods=['POST'])
 @admin_required()
 def adicionar_movimento():
     try:
@@ -425,25 +715,107 @@ def adicionar_movimento():
         tipo_mov = request.form.get('tipo_mov')
         quantidade = int(request.form.get('quantidade'))
         motivo = request.form.get('motivo')
-        
-        produto = supabase.table("tb_produto").select("id_produto, nome, estoque").eq("id_produto", id_produto).single().execute().data
-        if not produto:
-            flash("Produto não encontrado.", "erro")
-            return redirect(url_for('estoque_mov'))
-
-        if tipo_mov == "SAIDA" and produto['estoque'] < quantidade:
-            flash(f"Estoque insuficiente para '{produto['nome']}'. Disponível: {produto['estoque']}", "erro")
-            return redirect(url_for('estoque_mov'))
 
-        novo_estoque = produto['estoque'] + quantidade if tipo_mov == "ENTRADA" else produto['estoque'] - quantidade
-        supabase.table("tb_produto").update({"estoque": novo_estoque}).eq("id_produto", id_produto).execute()
-        supabase.table("tb_estoque_mov").insert({"id_produto": id_produto, "tipo_mov": tipo_mov, "quantidade": quantidade, "motivo": motivo}).execute()
+        novo_estoque = movimentar_estoque(db, id_produto, tipo_mov, quantidade, motivo)
+        catalogo.invalidar()
+        alertas.definir_estoques({id_produto: novo_estoque})
         flash("Movimentação registrada com sucesso!", "sucesso")
+    except (ProdutoNaoEncontrado, EstoqueInsuficiente, ConflitoEstoque) as e:
+        flash(str(e), "erro")
     except Exception as e:
         flash(f"Erro ao registrar movimentação: {e}", "erro")
     return redirect(url_for('estoque_mov'))
 
+# --- INVENTÁRIO EM LOTE (ADMIN) ---
+def estoques_inventariados(saldos):
+    catalogo.invalidar()
+    alertas.definir_estoques(saldos)
+
+def renderizar_inventario(relatorio=None):
+    try:
+        inventarios = db.inventarios.recentes(HISTORICO_LIMITE)
+    except Exception as e:
+        flash(f"Não foi possível carregar os inventários anteriores: {e}", "erro")
+        inventarios = []
+    return render_template('inventario.html', inventarios=inventarios, relatorio=relatorio,
+                           colunas=", ".join(COLUNAS_INVENTARIO), limite=HISTORICO_LIMITE)
+
+@rota('/admin/estoque/inventario', methods=['GET', 'POST'])
+@admin_required()
+@condicional("tb_inventario", "tb_usuario")
+def inventario():
+    if request.method == 'POST':
+        arquivo = request.files.get('arquivo')
+        if not arquivo or not arquivo.filename:
+            flash("Selecione o arquivo CSV com a contagem.", "erro")
+            return renderizar_inventario()
+        try:
+            linhas = ler_csv(arquivo.stream, COLUNAS_INVENTARIO)
+            relatorio = aplicar_inventario(db, session.get('id_usuario'), linhas,
+                                           (request.form.get('observacao') or '').strip() or None, estoques_inventariados)
+        except ImportacaoInvalida as e:
+            flash(str(e), "erro")
+            return renderizar_inventario()
+        except Exception as e:
+            flash(f"Erro ao registrar o inventário: {e}", "erro")
+            return renderizar_inventario()
+        flash(f"Inventário #{relatorio.id_inventario} registrado: {relatorio.contados} produto(s) contado(s), "
+              f"{relatorio.ajustados} ajustado(s), {relatorio.total_erros} com erro.",
+              "sucesso" if not relatorio.total_erros else "info")
+        return renderizar_inventario(relatorio)
+    return renderizar_inventario()
+
+@rota('/admin/estoque/inventario/planilha')
+@admin_required()
+def planilha_inventario():
+    # Folha de contagem com os produtos ativos; o saldo do sistema fica de fora para a contagem não ser induzida
+    produtos = (produto for produto in db.produtos.percorrer("id_produto, nome, marca, ativo", TAMANHO_LOTE_EXPORTACAO)
+                if produto.get('ativo', True) is not False)
+    colunas = [("id_produto", "id_produto"), ("nome", "nome"), ("marca", "marca"), ("quantidade", "quantidade")]
+    resposta = Response(stream_with_context(GERADORES["csv"](produtos, colunas)), mimetype=FORMATOS["csv"])
+    resposta.headers['Content-Disposition'] = f'attachment; filename="contagem_{datetime.date.today().isoformat()}.csv"'
+    return resposta
+
+# --- EXPORTAÇÃO (ADMIN) ---
+EXPORTACOES = {
+    "estoque": {
+        "repositorio": "movimentos", "origem": "estoque_mov",
+        "colunas": [("id_mov", "id_mov"), ("criado_em", "criado_em"), ("id_produto", "id_produto"), ("produto", "tb_produto.nome"),
+                    ("tipo_mov", "tipo_mov"), ("quantidade", "quantidade"), ("motivo", "motivo")],
+    },
+    "vendas": {
+        "repositorio": "vendas", "origem": "gerenciar_vendas",
+        "colunas": [("id_venda", "id_venda"), ("data_venda", "data_venda"), ("id_usuario", "id_usuario"), ("vendedor", "tb_usuario.nome"),
+                    ("id_cliente", "id_cliente"), ("valor_total", "valor_total")],
+    },
+}
+
+@rota('/admin/exportar/<tipo>')
+@admin_required()
+def exportar(tipo):
+    config = EXPORTACOES.get(tipo)
+    if not config:
+        return redirect(url_for('admin_dashboard'))
+    formato = request.args.get('formato', 'csv')
+    try:
+        if formato not in FORMATOS:
+            raise FiltroInvalido("Formato de exportação inválido.")
+        inicio, fim = intervalo_datas(request.args.get('inicio'), request.args.get('fim'))
+    except FiltroInvalido as e:
+        flash(str(e), "erro")
+        return redirect(url_for(config["origem"]))
+
+    linhas = getattr(db, config["repositorio"]).percorrer_periodo(inicio, fim, TAMANHO_LOTE_EXPORTACAO)
+    periodo = "_".join(filter(None, [request.args.get('inicio'), request.args.get('fim')])) or "completo"
+    resposta = Response(stream_with_context(GERADORES[formato](linhas, config["colunas"])), mimetype=FORMATOS[formato])
+    resposta.headers['Content-Disposition'] = f'attachment; filename="{tipo}_{periodo}.{formato}"'
+    resposta.headers['X-Accel-Buffering'] = 'no'
+    return resposta
+
 # --- EXECUÇÃO DO APP ---
+# O gunicorn usa app:app (veja gunicorn.conf.py); criar_app() monta outras instâncias, como em testes
+app = criar_app()
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))  # usa PORT do Render, ou 5000 local
     app.run(host="0.0.0.0", port=port)
\ No newline at end of file
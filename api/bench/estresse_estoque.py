@@ -0,0 +1,98 @@
+"""Teste de estresse das movimentações de estoque com escritores concorrentes.
+
+Roda contra o backend SQLite (dados/sqlite_backend.py), com latência de rede
+simulada em cada chamada aos repositórios. Verifica que nenhuma atualização se
+perde e que o estoque nunca fica negativo. Uso, a partir de api/:
+
+    python -m bench.estresse_estoque --threads 32 --operacoes 20000
+    python -m bench.estresse_estoque --sem-cas   # mostra o problema do código antigo
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.instrumentado import BackendInstrumentado
+from dados.sqlite_backend import BackendSQLite
+from estoque import ConflitoEstoque, EstoqueInsuficiente, movimentar_estoque
+
+
+def movimentar_sem_cas(db, id_produto, tipo_mov, quantidade, motivo):
+    # Lógica antiga de adicionar_movimento: lê, calcula em Python e grava de volta
+    produto = db.produtos.saldo(id_produto)
+    if tipo_mov == "SAIDA" and produto['estoque'] < quantidade:
+        raise EstoqueInsuficiente(produto)
+    novo_estoque = produto['estoque'] + quantidade if tipo_mov == "ENTRADA" else produto['estoque'] - quantidade
+    db.produtos.atualizar(id_produto, {"estoque": novo_estoque})
+    db.movimentos.inserir({"id_produto": id_produto, "tipo_mov": tipo_mov, "quantidade": quantidade, "motivo": motivo})
+
+
+def executar(args):
+    base = BackendSQLite(args.banco)
+    iniciais = {}
+    for id_produto in range(1, args.produtos + 1):
+        produto = base.produtos.inserir({"nome": f"Produto {id_produto}", "preco": 1, "estoque": args.estoque_inicial})
+        iniciais[produto["id_produto"]] = args.estoque_inicial
+    db = BackendInstrumentado(base, latencia=args.latencia_ms / 1000)
+    ids = list(iniciais)
+
+    movimentar = movimentar_sem_cas if args.sem_cas else movimentar_estoque
+    contadores = {"ok": 0, "insuficiente": 0, "conflito": 0}
+    trava_contadores = threading.Lock()
+
+    def operacao(_):
+        id_produto = random.choice(ids)
+        tipo_mov = random.choice(("ENTRADA", "SAIDA", "SAIDA"))
+        try:
+            movimentar(db, id_produto, tipo_mov, random.randint(1, 5), "estresse")
+            resultado = "ok"
+        except EstoqueInsuficiente:
+            resultado = "insuficiente"
+        except ConflitoEstoque:
+            resultado = "conflito"
+        with trava_contadores:
+            contadores[resultado] += 1
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        list(executor.map(operacao, range(args.operacoes)))
+    duracao = time.perf_counter() - inicio
+
+    esperados = dict(iniciais)
+    movimentos = 0
+    for mov in base.movimentos.percorrer("id_mov, id_produto, tipo_mov, quantidade"):
+        esperados[mov["id_produto"]] += mov["quantidade"] if mov["tipo_mov"] == "ENTRADA" else -mov["quantidade"]
+        movimentos += 1
+    produtos = base.produtos.por_ids(ids, "id_produto, estoque")
+    perdidas = sum(1 for produto in produtos if esperados[produto["id_produto"]] != produto["estoque"])
+    negativos = sum(1 for produto in produtos if produto["estoque"] < 0)
+    chamadas = db.total_chamadas()
+    base.fechar()
+
+    print(f"modo: {'sem CAS (antigo)' if args.sem_cas else 'compare-and-swap'}")
+    print(f"operações: {args.operacoes} em {duracao:.2f}s ({args.operacoes / duracao:.0f} op/s, {args.threads} threads)")
+    print(f"registradas: {contadores['ok']}  estoque insuficiente: {contadores['insuficiente']}  conflitos esgotados: {contadores['conflito']}")
+    print(f"chamadas ao banco: {chamadas} ({chamadas / max(args.operacoes, 1):.2f} por operação)")
+    print(f"produtos com saldo divergente do histórico: {perdidas}")
+    print(f"produtos com estoque negativo: {negativos}")
+    correto = perdidas == 0 and negativos == 0 and contadores['ok'] == movimentos
+    print("RESULTADO:", "OK" if correto else "FALHOU")
+    return 0 if correto else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--operacoes", type=int, default=20000)
+    parser.add_argument("--produtos", type=int, default=5, help="poucos produtos = mais disputa por linha")
+    parser.add_argument("--estoque-inicial", type=int, default=50)
+    parser.add_argument("--latencia-ms", type=float, default=0.5, help="latência simulada por chamada")
+    parser.add_argument("--banco", default=":memory:", help="arquivo SQLite (padrão: temporário)")
+    parser.add_argument("--sem-cas", action="store_true", help="usa a lógica antiga de ler-calcular-gravar")
+    return executar(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
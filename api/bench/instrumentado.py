@@ -0,0 +1,94 @@
+import inspect
+import random
+import threading
+import time
+from collections import Counter
+
+from dados import REPOSITORIOS
+
+# --- BACKEND INSTRUMENTADO ---
+# Envolve os repositórios de um backend (normalmente o SQLite) contando as chamadas
+# e, opcionalmente, somando uma latência aleatória por chamada, como a ida e volta
+# até o PostgREST. Nos geradores (percorrer, lotes_com_itens) a chamada é cada lote
+# lido durante a iteração, como no backend de verdade.
+
+
+def _tamanho_lote(metodo, args, kwargs):
+    # inspect.signature segue __wrapped__ até o método do repositório, com os valores padrão
+    try:
+        argumentos = inspect.signature(metodo).bind(*args, **kwargs)
+    except (TypeError, ValueError):
+        return None
+    argumentos.apply_defaults()
+    return argumentos.arguments.get("tamanho_lote")
+
+
+class _RepositorioInstrumentado:
+    def __init__(self, nome, repositorio, backend):
+        self._nome = nome
+        self._repositorio = repositorio
+        self._backend = backend
+
+    def __getattr__(self, atributo):
+        metodo = getattr(self._repositorio, atributo)
+        if not callable(metodo):
+            return metodo
+        chave = f"{self._nome}.{atributo}"
+
+        def chamar(*args, **kwargs):
+            # O método pode vir embrulhado (BackendMedido do app): o que decide é o resultado
+            try:
+                resultado = metodo(*args, **kwargs)
+            except Exception:
+                self._backend.registrar(chave)
+                raise
+            if inspect.isgenerator(resultado):
+                return self._por_lote(resultado, chave, _tamanho_lote(metodo, args, kwargs))
+            self._backend.registrar(chave)
+            return resultado
+        return chamar
+
+    def _por_lote(self, gerador, chave, tamanho_lote):
+        # O backend busca a página seguinte só depois de uma página cheia; cada busca conta
+        # uma chamada. Lotes entregues como lista contam pelo número de linhas
+        linhas = 0
+        try:
+            while True:
+                if not tamanho_lote or linhas % tamanho_lote == 0:
+                    self._backend.registrar(chave)
+                try:
+                    item = next(gerador)
+                except StopIteration:
+                    return
+                linhas += len(item) if isinstance(item, list) else 1
+                yield item
+        finally:
+            gerador.close()
+
+
+class BackendInstrumentado:
+    def __init__(self, backend, latencia=0.0):
+        self.backend = backend
+        self.nome = backend.nome
+        self.latencia = latencia
+        self.chamadas = Counter()
+        self._trava = threading.Lock()
+        for nome in REPOSITORIOS:
+            setattr(self, nome, _RepositorioInstrumentado(nome, getattr(backend, nome), self))
+
+    def registrar(self, chave):
+        with self._trava:
+            self.chamadas[chave] += 1
+        if self.latencia:
+            time.sleep(self.latencia * random.random())
+
+    def total_chamadas(self):
+        with self._trava:
+            return sum(self.chamadas.values())
+
+    def zerar(self):
+        with self._trava:
+            self.chamadas.clear()
+
+    def fechar(self):
+        self.backend.fechar()
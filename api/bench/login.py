@@ -0,0 +1,158 @@
+"""Benchmark de login sob carga: vazão do login e latência das outras rotas ao mesmo tempo.
+
+Primeiro mede as rotas de leitura sozinhas (linha de base); depois repete a medição
+com threads disparando logins sem parar: uma parte com a senha certa e outra imitando
+credential stuffing (senhas erradas vindas de poucos IPs). Mostra quanto os logins
+degradam o resto do app, com o pool de bcrypt e o limite de tentativas ativos. Uso,
+a partir de api/:
+
+    python -m bench.login --banco /tmp/erp_bench.db
+    BCRYPT_CUSTO=10 SENHAS_WORKERS=2 python -m bench.login --threads-login 16 --saida login.json
+"""
+import argparse
+import importlib
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from bench import semente
+from bench.rotas import _Clientes, percentil, preparar_banco
+
+ROTAS_LEITURA = ["/admin/gerenciar-produtos", "/admin/gerenciar-clientes", "/admin/estoque",
+                 "/api/autocomplete/produtos?q=cafe", "/admin"]
+
+
+def _resumo(latencias, duracao):
+    latencias = [latencia * 1000 for latencia in latencias]
+    return {"requisicoes": len(latencias), "req_por_s": round(len(latencias) / duracao, 1) if duracao else None,
+            "p50_ms": round(percentil(latencias, 50), 2) if latencias else None,
+            "p95_ms": round(percentil(latencias, 95), 2) if latencias else None,
+            "p99_ms": round(percentil(latencias, 99), 2) if latencias else None}
+
+
+def medir_leituras(clientes, threads, duracao):
+    latencias, trava = [], threading.Lock()
+    fim = time.perf_counter() + duracao
+
+    def ler(_):
+        cliente = clientes.atual()
+        while time.perf_counter() < fim:
+            inicio = time.perf_counter()
+            cliente.get(random.choice(ROTAS_LEITURA)).get_data()
+            with trava:
+                latencias.append(time.perf_counter() - inicio)
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(ler, range(threads)))
+    return _resumo(latencias, time.perf_counter() - inicio)
+
+
+def disparar_logins(app, threads, parar, proporcao_ataque, ips_ataque, usuarios):
+    # Ataque e usuários legítimos usam contas diferentes (metade de cada); todas têm a senha do benchmark
+    metade = usuarios // 2
+
+    resultados, trava = [], threading.Lock()
+
+    def logar(indice):
+        cliente = app.test_client()
+        while not parar.is_set():
+            if random.random() < proporcao_ataque:
+                dados = {"email": f"usuario{random.randint(1, metade - 1)}@bench.local", "senha": "senha-errada"}
+                ip = f"203.0.113.{random.randint(1, ips_ataque)}"
+                tipo = "ataque"
+            else:
+                dados = {"email": f"usuario{random.randint(metade, usuarios - 1)}@bench.local", "senha": semente.SENHA_ADMIN}
+                ip = f"10.0.{indice}.{random.randint(1, 250)}"
+                tipo = "legitimo"
+            inicio = time.perf_counter()
+            resposta = cliente.post("/login", data=dados, environ_base={"REMOTE_ADDR": ip})
+            resposta.get_data()
+            with trava:
+                resultados.append((tipo, resposta.status_code, time.perf_counter() - inicio))
+            with cliente.session_transaction() as sessao:
+                sessao.clear()
+
+    executor = ThreadPoolExecutor(max_workers=threads)
+    futuros = [executor.submit(logar, indice) for indice in range(threads)]
+    return executor, futuros, resultados
+
+
+def executar(args):
+    volumes = preparar_banco(args)
+    os.environ["ERP_BACKEND"] = "sqlite"
+    os.environ["SQLITE_CAMINHO"] = args.banco
+    modulo_app = importlib.import_module("app")
+    senhas = importlib.import_module("senhas")
+    clientes = _Clientes(modulo_app.app)
+
+    # Os clientes de leitura fazem login antes das medições
+    with ThreadPoolExecutor(max_workers=args.threads_leitura) as executor:
+        barreira = threading.Barrier(args.threads_leitura)
+        list(executor.map(lambda _: (clientes.atual(), barreira.wait()), range(args.threads_leitura)))
+        print(f"bcrypt: custo {senhas.BCRYPT_CUSTO}, {senhas.SENHAS_WORKERS} workers, fila {senhas.SENHAS_FILA}")
+
+        print("linha de base (só leituras)...", flush=True)
+        base = medir_leituras(clientes, args.threads_leitura, args.duracao)
+
+        print(f"leituras com {args.threads_login} threads de login...", flush=True)
+        parar = threading.Event()
+        pool_login, futuros, resultados = disparar_logins(modulo_app.app, args.threads_login, parar, args.ataque,
+                                                          args.ips_ataque, semente.USUARIOS)
+        inicio = time.perf_counter()
+        sob_carga = medir_leituras(clientes, args.threads_leitura, args.duracao)
+        parar.set()
+        for futuro in futuros:
+            futuro.result()
+        duracao_login = time.perf_counter() - inicio
+        pool_login.shutdown()
+
+    logins = {}
+    for tipo in ("legitimo", "ataque"):
+        do_tipo = [(status, latencia) for t, status, latencia in resultados if t == tipo]
+        logins[tipo] = {**_resumo([latencia for _, latencia in do_tipo], duracao_login),
+                        "status": dict(Counter(str(status) for status, _ in do_tipo))}
+    resultado = {"parametros": {"bcrypt_custo": senhas.BCRYPT_CUSTO, "senhas_workers": senhas.SENHAS_WORKERS,
+                                "senhas_fila": senhas.SENHAS_FILA, "threads_login": args.threads_login,
+                                "threads_leitura": args.threads_leitura, "duracao_s": args.duracao, **volumes},
+                 "leituras_base": base, "leituras_sob_carga": sob_carga, "logins": logins}
+
+    print(f"{'':<24}{'req/s':>9}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for nome, medida in (("leituras (base)", base), ("leituras (sob carga)", sob_carga),
+                         ("login legítimo", logins["legitimo"]), ("login ataque", logins["ataque"])):
+        print(f"{nome:<24}{medida['req_por_s'] or '-':>9}{medida['p50_ms'] or '-':>10}{medida['p95_ms'] or '-':>10}"
+              f"{medida['p99_ms'] or '-':>10}")
+    print("status dos logins legítimos:", logins["legitimo"]["status"])
+    print("status dos logins de ataque:", logins["ataque"]["status"], "(429 = barrado antes do bcrypt)")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+        print(f"resultado salvo em {args.saida}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--banco", default=os.path.join(tempfile.gettempdir(), "erp_bench.db"))
+    parser.add_argument("--produtos", type=int, default=100000)
+    parser.add_argument("--clientes", type=int, default=20000)
+    parser.add_argument("--movimentos", type=int, default=1000000)
+    parser.add_argument("--vendas", type=int, default=50000)
+    parser.add_argument("--dias", type=int, default=365)
+    parser.add_argument("--threads-leitura", type=int, default=4)
+    parser.add_argument("--threads-login", type=int, default=8)
+    parser.add_argument("--duracao", type=float, default=10, help="segundos de cada fase")
+    parser.add_argument("--ataque", type=float, default=0.8, help="fração dos logins com senha errada")
+    parser.add_argument("--ips-ataque", type=int, default=2, help="quantos IPs o ataque usa")
+    parser.add_argument("--saida", help="arquivo JSON com o resultado")
+    return executar(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
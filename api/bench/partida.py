@@ -0,0 +1,75 @@
+"""Partida a frio: tempo do import do app até a primeira resposta, em processos novos.
+
+Cada rodada é um interpretador Python novo, como um worker recém-criado: importa o
+módulo app, pega o app e faz uma requisição pelo test client. Por padrão usa o backend
+Supabase com uma URL local que não responde, para o custo de montar o cliente entrar
+na conta sem depender da rede. Uso, a partir de api/:
+
+    python -m bench.partida
+    python -m bench.partida --rodadas 20 --rota /saude --saida partida.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+RODADA = r"""
+import json, sys, time
+inicio = time.perf_counter()
+import app as modulo
+importado = time.perf_counter()
+cliente = modulo.app.test_client()
+resposta = cliente.get(sys.argv[1])
+resposta.get_data()
+fim = time.perf_counter()
+print(json.dumps({"import_ms": (importado - inicio) * 1000, "primeira_resposta_ms": (fim - importado) * 1000,
+                  "total_ms": (fim - inicio) * 1000, "status": resposta.status_code}))
+"""
+
+
+def rodar(rota, ambiente):
+    saida = subprocess.run([sys.executable, "-c", RODADA, rota], capture_output=True, text=True, env=ambiente,
+                           cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if saida.returncode != 0:
+        raise RuntimeError(saida.stderr.strip().splitlines()[-1] if saida.stderr.strip() else "falha na rodada")
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def executar(args):
+    ambiente = {**os.environ, "ERP_BACKEND": args.backend, "METRICAS_LENTO_MS": "1000000"}
+    if args.backend == "supabase":
+        ambiente.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+        ambiente.setdefault("SUPABASE_KEY", "chave-do-benchmark")
+    rodar(args.rota, ambiente)  # aquece o cache de bytecode e do sistema de arquivos
+
+    rodadas = [rodar(args.rota, ambiente) for _ in range(args.rodadas)]
+    resultado = {"parametros": {"rota": args.rota, "backend": args.backend, "rodadas": args.rodadas},
+                 "status": sorted({rodada["status"] for rodada in rodadas})}
+    print(f"{'':<22}{'mediana':>10}{'mínimo':>10}{'máximo':>10}")
+    for medida in ("import_ms", "primeira_resposta_ms", "total_ms"):
+        valores = [rodada[medida] for rodada in rodadas]
+        resultado[medida] = {"mediana": round(statistics.median(valores), 1), "minimo": round(min(valores), 1),
+                             "maximo": round(max(valores), 1)}
+        print(f"{medida:<22}{resultado[medida]['mediana']:>10}{resultado[medida]['minimo']:>10}{resultado[medida]['maximo']:>10}")
+    print("status da resposta:", resultado["status"])
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+        print(f"resultado salvo em {args.saida}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rodadas", type=int, default=10)
+    parser.add_argument("--rota", default="/login", help="rota da primeira requisição")
+    parser.add_argument("--backend", default="supabase", choices=("supabase", "sqlite"))
+    parser.add_argument("--saida", help="arquivo JSON com o resultado")
+    return executar(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,285 @@
+"""Benchmark das rotas do app contra o backend SQLite populado com volume realista.
+
+Cada rota roda em uma fase própria, com várias threads disparando requisições pelo
+test client do Flask. Para cada rota o relatório traz vazão, latências p50/p95/p99,
+chamadas aos repositórios por requisição e pico de memória alocada. O resultado é
+salvo em JSON; com --comparar, aponta regressões em relação a uma execução anterior
+(mais chamadas por requisição denunciam um N+1 que voltou). Uso, a partir de api/:
+
+    python -m bench.rotas --banco /tmp/erp_bench.db --saida resultado.json
+    python -m bench.rotas --banco /tmp/erp_bench.db --comparar resultado.json
+    python -m bench.rotas --produtos 5000 --movimentos 50000 --requisicoes 50   # rodada rápida
+"""
+import argparse
+import datetime
+import importlib
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from bench import semente
+from bench.instrumentado import BackendInstrumentado
+from dados.sqlite_backend import BackendSQLite
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _produto(contexto):
+    return random.randint(1, contexto["produtos"])
+
+
+def _termo(_):
+    return random.choice(semente.PALAVRAS)[:4]
+
+
+def _dia(contexto):
+    dia = datetime.date.today() - datetime.timedelta(days=random.randint(1, contexto["dias"]))
+    return dia.isoformat(), (dia + datetime.timedelta(days=1)).isoformat()
+
+
+# (nome, método, caminho, formulário); caminho e formulário podem depender do sorteio da requisição
+ROTAS = [
+    # Contas variadas: logins simultâneos na mesma conta seriam barrados pelo limite de tentativas
+    ("login", "POST", "/login", lambda c: {"email": f"usuario{random.randint(1, semente.USUARIOS - 1)}@bench.local",
+                                           "senha": semente.SENHA_ADMIN}),
+    ("gerenciar_usuarios", "GET", "/admin/gerenciar-usuarios", None),
+    ("gerenciar_produtos", "GET", "/admin/gerenciar-produtos", None),
+    ("gerenciar_produtos_busca", "GET", lambda c: f"/admin/gerenciar-produtos?q={_termo(c)}", None),
+    ("gerenciar_clientes", "GET", "/admin/gerenciar-clientes", None),
+    ("gerenciar_clientes_busca", "GET", lambda c: f"/admin/gerenciar-clientes?q={_termo(c)}", None),
+    ("gerenciar_vendas", "GET", "/admin/gerenciar-vendas", None),
+    ("estoque_mov", "GET", "/admin/estoque", None),
+    ("autocomplete_produtos", "GET", lambda c: f"/api/autocomplete/produtos?q={_termo(c)}", None),
+    ("adicionar_venda_form", "GET", "/admin/vendas/adicionar", None),
+    ("adicionar_venda", "POST", "/admin/vendas/adicionar",
+     lambda c: {"produtos[]": [str(_produto(c)) for _ in range(3)], "quantidades[]": ["1", "2", "1"]}),
+    ("adicionar_movimento", "POST", "/admin/estoque/adicionar",
+     lambda c: {"id_produto": str(_produto(c)), "tipo_mov": random.choice(("ENTRADA", "SAIDA")),
+                "quantidade": str(random.randint(1, 5)), "motivo": "benchmark"}),
+    ("exportar_estoque_dia", "GET", lambda c: "/admin/exportar/estoque?inicio={}&fim={}".format(*_dia(c)), None),
+    ("relatorios_vendas", "GET", "/admin/relatorios", None),
+    ("api_relatorio_produtos_ano", "GET", "/api/relatorios/vendas?dimensao=produto&inicio={}&limite=100".format(
+        (datetime.date.today() - datetime.timedelta(days=365)).isoformat()), None),
+]
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def rss_pico_mb():
+    if resource is None:
+        return None
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class _Clientes:
+    # Um test client por thread. O login roda uma vez só e os outros clientes recebem uma
+    # cópia do cookie de sessão: logins simultâneos na mesma conta esbarrariam no limite de tentativas
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+        self._cookie = None
+        self._trava = threading.Lock()
+
+    def _cookie_de_sessao(self):
+        with self._trava:
+            if self._cookie is None:
+                cliente = self.app.test_client()
+                resposta = cliente.post("/login", data={"email": semente.EMAIL_ADMIN, "senha": semente.SENHA_ADMIN})
+                cookie = cliente.get_cookie(self.app.config["SESSION_COOKIE_NAME"])
+                if resposta.status_code != 302 or cookie is None:
+                    raise RuntimeError("Não foi possível autenticar o usuário do benchmark.")
+                self._cookie = cookie.value
+            return self._cookie
+
+    def atual(self):
+        cliente = getattr(self._local, "cliente", None)
+        if cliente is None:
+            cliente = self.app.test_client()
+            cliente.set_cookie(self.app.config["SESSION_COOKIE_NAME"], self._cookie_de_sessao())
+            self._local.cliente = cliente
+        return cliente
+
+
+def _requisitar(clientes, rota, contexto):
+    _, metodo, caminho, formulario = rota
+    caminho = caminho(contexto) if callable(caminho) else caminho
+    dados = formulario(contexto) if formulario else None
+    # O login usa um cliente descartável para não trocar a sessão de administrador da thread
+    cliente = clientes.app.test_client() if caminho == "/login" else clientes.atual()
+    inicio = time.perf_counter()
+    resposta = cliente.open(caminho, method=metodo, data=dados)
+    resposta.get_data()  # consome respostas em streaming (exportação)
+    duracao = time.perf_counter() - inicio
+    ok = resposta.status_code < 400
+    if resposta.status_code == 302:
+        # Sem seguir o redirect ninguém lê os flashes; limpa para a sessão não crescer
+        # e conta como erro quando a rota avisou falha
+        with cliente.session_transaction() as sessao:
+            flashes = sessao.pop('_flashes', [])
+        ok = not any(categoria == 'erro' for categoria, _ in flashes)
+    return duracao, ok
+
+
+def autenticar_threads(executor, clientes, threads):
+    # A barreira garante que cada thread do pool faça o próprio login antes das medições
+    barreira = threading.Barrier(threads)
+
+    def autenticar(_):
+        clientes.atual()
+        barreira.wait()
+    list(executor.map(autenticar, range(threads)))
+
+
+def medir_rota(executor, clientes, db, rota, contexto, args):
+    for _ in range(args.aquecimento):
+        _requisitar(clientes, rota, contexto)
+
+    db.zerar()
+    inicio = time.perf_counter()
+    resultados = list(executor.map(lambda _: _requisitar(clientes, rota, contexto), range(args.requisicoes)))
+    duracao = time.perf_counter() - inicio
+    chamadas = dict(db.chamadas)
+    total_chamadas = sum(chamadas.values())
+
+    # Memória medida à parte, em poucas requisições: o tracemalloc distorce as latências
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    for _ in range(args.requisicoes_memoria):
+        _requisitar(clientes, rota, contexto)
+    pico = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    latencias = [duracao_req * 1000 for duracao_req, _ in resultados]
+    return {
+        "requisicoes": args.requisicoes,
+        "erros": sum(1 for _, ok in resultados if not ok),
+        "req_por_s": round(args.requisicoes / duracao, 1),
+        "p50_ms": round(percentil(latencias, 50), 2),
+        "p95_ms": round(percentil(latencias, 95), 2),
+        "p99_ms": round(percentil(latencias, 99), 2),
+        "chamadas_por_requisicao": round(total_chamadas / args.requisicoes, 2),
+        "chamadas": chamadas,
+        "memoria_pico_kb": round(pico / 1024, 1),
+    }
+
+
+def comparar(atual, anterior, tolerancia):
+    regressoes = []
+    for nome, medida in atual["rotas"].items():
+        antes = anterior.get("rotas", {}).get(nome)
+        if not antes:
+            continue
+        if medida["chamadas_por_requisicao"] > antes["chamadas_por_requisicao"] + 0.5:
+            regressoes.append(f"{nome}: chamadas por requisição {antes['chamadas_por_requisicao']} -> "
+                              f"{medida['chamadas_por_requisicao']} (possível N+1)")
+        if antes["p95_ms"] and medida["p95_ms"] > antes["p95_ms"] * (1 + tolerancia):
+            regressoes.append(f"{nome}: p95 {antes['p95_ms']} ms -> {medida['p95_ms']} ms")
+        if medida["erros"] > antes["erros"]:
+            regressoes.append(f"{nome}: erros {antes['erros']} -> {medida['erros']}")
+    return regressoes
+
+
+def preparar_banco(args):
+    base = BackendSQLite(args.banco)
+    if semente.ja_populado(base):
+        print(f"usando banco já populado: {args.banco}")
+    else:
+        print("populando banco de benchmark...", flush=True)
+        inicio = time.perf_counter()
+        semente.popular(base, produtos=args.produtos, clientes=args.clientes, movimentos=args.movimentos,
+                        vendas=args.vendas, dias=args.dias)
+        print(f"banco populado em {time.perf_counter() - inicio:.1f}s")
+    conexao = base.conexoes.atual()
+    volumes = {tabela: conexao.execute(f"SELECT COUNT(*) AS n FROM tb_{tabela}").fetchone()["n"]
+               for tabela in ("produto", "cliente", "estoque_mov", "venda")}
+    base.fechar()
+    return volumes
+
+
+def executar(args):
+    volumes = preparar_banco(args)
+
+    os.environ["ERP_BACKEND"] = "sqlite"
+    os.environ["SQLITE_CAMINHO"] = args.banco
+    modulo_app = importlib.import_module("app")
+    db = BackendInstrumentado(modulo_app.db, latencia=args.latencia_ms / 1000)
+    modulo_app.db = db  # as rotas leem o global a cada requisição
+    clientes = _Clientes(modulo_app.app)
+    contexto = {"produtos": volumes["produto"], "dias": args.dias}
+
+    selecionadas = [rota for rota in ROTAS if not args.rotas or rota[0] in args.rotas]
+    resultado = {
+        "gerado_em": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "parametros": {"threads": args.threads, "requisicoes": args.requisicoes, "latencia_ms": args.latencia_ms, **volumes},
+        "rotas": {},
+    }
+    print(f"{'rota':<28}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'cham/req':>10}{'mem KB':>10}{'erros':>7}")
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        autenticar_threads(executor, clientes, args.threads)
+        for rota in selecionadas:
+            medida = medir_rota(executor, clientes, db, rota, contexto, args)
+            resultado["rotas"][rota[0]] = medida
+            print(f"{rota[0]:<28}{medida['req_por_s']:>9}{medida['p50_ms']:>9}{medida['p95_ms']:>9}{medida['p99_ms']:>9}"
+                  f"{medida['chamadas_por_requisicao']:>10}{medida['memoria_pico_kb']:>10}{medida['erros']:>7}", flush=True)
+    resultado["rss_pico_mb"] = rss_pico_mb()
+    print(f"pico de memória do processo: {resultado['rss_pico_mb']} MB")
+    db.fechar()
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+        print(f"resultado salvo em {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            regressoes = comparar(resultado, json.load(arquivo), args.tolerancia)
+        for regressao in regressoes:
+            print("REGRESSÃO:", regressao)
+        print("RESULTADO:", "FALHOU" if regressoes else "OK")
+        return 1 if regressoes else 0
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    # O app abre o próprio backend, então o banco precisa ser um arquivo
+    parser.add_argument("--banco", default=os.path.join(tempfile.gettempdir(), "erp_bench.db"),
+                        help="arquivo SQLite; reaproveitado se já estiver populado (apague para mudar os volumes)")
+    parser.add_argument("--produtos", type=int, default=100000)
+    parser.add_argument("--clientes", type=int, default=20000)
+    parser.add_argument("--movimentos", type=int, default=1000000)
+    parser.add_argument("--vendas", type=int, default=50000)
+    parser.add_argument("--dias", type=int, default=365, help="período coberto pelo histórico gerado")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requisicoes", type=int, default=200, help="requisições medidas por rota")
+    parser.add_argument("--aquecimento", type=int, default=5, help="requisições descartadas antes de medir")
+    parser.add_argument("--requisicoes-memoria", type=int, default=5)
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="latência simulada por chamada ao backend")
+    parser.add_argument("--rotas", nargs="*", help="mede só estas rotas")
+    parser.add_argument("--saida", help="arquivo JSON com o resultado")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="aumento de p95 aceito na comparação")
+    return executar(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
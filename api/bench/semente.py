@@ -0,0 +1,74 @@
+import datetime
+import random
+
+import bcrypt
+
+from dados import em_lotes
+from senhas import BCRYPT_CUSTO
+
+# --- DADOS DE TESTE PARA OS BENCHMARKS ---
+# Popula um BackendSQLite direto por SQL (executemany em uma transação por tabela),
+# que é ordens de grandeza mais rápido do que passar pelos repositórios.
+EMAIL_ADMIN = "admin@bench.local"
+SENHA_ADMIN = "bench123"
+
+MARCAS = ["Nestlé", "Sadia", "Ypê", "Omo", "Pilão", "Tio João", "Camil", "Italac", "Seara", "Qualy"]
+PALAVRAS = ["Arroz", "Feijão", "Café", "Açúcar", "Leite", "Óleo", "Sabão", "Detergente", "Macarrão", "Biscoito",
+            "Farinha", "Sal", "Molho", "Suco", "Iogurte", "Queijo", "Manteiga", "Pão", "Chocolate", "Refrigerante"]
+VARIANTES = ["Integral", "Tradicional", "Light", "Zero", "Premium", "Extra", "Orgânico", "Especial"]
+USUARIOS = 200
+TAMANHO_LOTE = 10000
+
+
+def _inserir(conexoes, sql, linhas):
+    for lote in em_lotes(linhas, TAMANHO_LOTE):
+        with conexoes.transacao() as conexao:
+            conexao.executemany(sql, lote)
+
+
+def _data(rng, inicio, dias):
+    instante = inicio + datetime.timedelta(seconds=rng.randrange(dias * 86400))
+    return instante.strftime("%Y-%m-%dT%H:%M:%S.000")
+
+
+def ja_populado(backend):
+    return backend.usuarios.por_email(EMAIL_ADMIN, "id_usuario") is not None
+
+
+def popular(backend, produtos=100000, clientes=20000, movimentos=1000000, vendas=50000, usuarios=USUARIOS,
+            dias=365, semente=42):
+    rng = random.Random(semente)
+    conexoes = backend.conexoes
+    inicio = datetime.datetime.now() - datetime.timedelta(days=dias)
+    senha = bcrypt.hashpw(SENHA_ADMIN.encode('utf-8'), bcrypt.gensalt(BCRYPT_CUSTO)).decode('utf-8')
+
+    _inserir(conexoes, "INSERT INTO tb_usuario (nome, email, cpf, senha, is_admin) VALUES (?, ?, ?, ?, ?)",
+             [("Administrador Bench", EMAIL_ADMIN, "00000000000", senha, 1)]
+             + [(f"Usuário {i}", f"usuario{i}@bench.local", f"{i:011d}", senha, 0) for i in range(1, usuarios)])
+
+    _inserir(conexoes, "INSERT INTO tb_produto (nome, marca, preco, estoque, validade, ativo) VALUES (?, ?, ?, ?, ?, ?)",
+             ((f"{rng.choice(PALAVRAS)} {rng.choice(VARIANTES)} {i}", rng.choice(MARCAS), round(rng.uniform(1, 200), 2),
+               rng.randint(500, 5000), (inicio + datetime.timedelta(days=rng.randint(dias, dias + 720))).date().isoformat(),
+               1 if rng.random() < 0.95 else 0)
+              for i in range(1, produtos + 1)))
+
+    _inserir(conexoes, "INSERT INTO tb_cliente (nome, email, cpf) VALUES (?, ?, ?)",
+             ((f"Cliente {rng.choice(PALAVRAS)} {i}", f"cliente{i}@bench.local", f"{10**10 + i:011d}")
+              for i in range(1, clientes + 1)))
+
+    _inserir(conexoes, "INSERT INTO tb_estoque_mov (id_produto, tipo_mov, quantidade, motivo, criado_em) VALUES (?, ?, ?, ?, ?)",
+             ((rng.randint(1, produtos), rng.choice(("ENTRADA", "SAIDA")), rng.randint(1, 20), "carga de benchmark",
+               _data(rng, inicio, dias))
+              for _ in range(movimentos)))
+
+    _inserir(conexoes, "INSERT INTO tb_venda (id_usuario, id_cliente, valor_total, data_venda) VALUES (?, ?, ?, ?)",
+             ((rng.randint(1, usuarios), rng.randint(1, clientes) if rng.random() < 0.7 else None,
+               round(rng.uniform(5, 500), 2), _data(rng, inicio, dias))
+              for _ in range(vendas)))
+
+    _inserir(conexoes, "INSERT INTO tb_venda_item (id_venda, id_produto, quantidade, preco_unitario) VALUES (?, ?, ?, ?)",
+             ((id_venda, rng.randint(1, produtos), rng.randint(1, 5), round(rng.uniform(1, 200), 2))
+              for id_venda in range(1, vendas + 1) for _ in range(rng.randint(1, 3))))
+
+    conexoes.atual().execute("ANALYZE")
+    return {"produtos": produtos, "clientes": clientes, "movimentos": movimentos, "vendas": vendas, "usuarios": usuarios}
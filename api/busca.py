@@ -0,0 +1,192 @@
+import heapq
+import logging
+import threading
+import unicodedata
+from collections import defaultdict
+
+from cache import criar_geracao
+
+logger = logging.getLogger(__name__)
+
+# --- ÍNDICE DE TRIGRAMAS EM MEMÓRIA ---
+# Substitui os ilike('%termo%') (varredura completa no banco) por interseção de
+# listas de trigramas. O índice é carregado uma vez por worker e atualizado a cada
+# inclusão, edição ou exclusão; a geração compartilhada (Redis ou tb_versao, ver
+# cache.py) avisa os outros workers para recarregar.
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', str(texto or '')).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(texto.lower().split())
+
+
+def trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def _gramas_consulta(termo):
+    # Termos de dois caracteres usam o trigrama de início de palavra, então casam por prefixo
+    if len(termo) >= 3:
+        return trigramas(termo)
+    if len(termo) == 2:
+        return {f" {termo}"}
+    return None
+
+
+class _Dados:
+    def __init__(self):
+        self.registros = {}
+        self.textos = {}
+        self.postings = defaultdict(set)
+
+    def indexar(self, id_registro, registro, texto):
+        self.registros[id_registro] = registro
+        self.textos[id_registro] = texto
+        for gram in trigramas(texto):
+            self.postings[gram].add(id_registro)
+
+    def desindexar(self, id_registro):
+        texto = self.textos.pop(id_registro, None)
+        self.registros.pop(id_registro, None)
+        if texto is None:
+            return
+        for gram in trigramas(texto):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(id_registro)
+                if not ids:
+                    del self.postings[gram]
+
+
+class IndiceTrigrama:
+    def __init__(self, nome, coluna_id, campos, colunas, carregar, versoes=None):
+        self.nome = nome
+        self.coluna_id = coluna_id
+        self.campos = campos
+        self.colunas = colunas
+        self.carregar = carregar
+        self.geracao = criar_geracao(f"busca_{nome}", versoes)
+        self._trava = threading.RLock()
+        self._dados = _Dados()
+        self._geracao_vista = None
+        self._recarregando = False
+
+    # --- manutenção ---
+    def _texto(self, registro):
+        return ' ' + ' | '.join(normalizar(registro.get(campo)) for campo in self.campos) + ' '
+
+    def _projetar(self, registro):
+        # Guarda só as colunas servidas pelo autocomplete (nada de estoque, que muda a todo momento)
+        return {coluna: registro.get(coluna) for coluna in self.colunas}
+
+    def atualizar(self, registro):
+        self.atualizar_varios([registro])
+
+    def atualizar_varios(self, registros):
+        # Importações atualizam muitos registros de uma vez: uma trava e um aviso só
+        registros = [self._projetar(registro) for registro in registros]
+        if not registros:
+            return
+        with self._trava:
+            for registro in registros:
+                id_registro = registro[self.coluna_id]
+                self._dados.desindexar(id_registro)
+                self._dados.indexar(id_registro, registro, self._texto(registro))
+            self._avisar_outros_workers()
+
+    def remover(self, id_registro):
+        with self._trava:
+            self._dados.desindexar(id_registro)
+            self._avisar_outros_workers()
+
+    def _avisar_outros_workers(self):
+        vista, nova = self._geracao_vista, self.geracao.incrementar()
+        # Só adota a nova geração se ninguém mais escreveu desde a última carga
+        if vista is not None and nova == vista + 1:
+            self._geracao_vista = nova
+
+    def reconstruir(self):
+        # Monta o índice novo fora da trava; as buscas seguem usando o atual até a troca
+        geracao = self.geracao.atual()
+        dados = _Dados()
+        for registro in map(self._projetar, self.carregar()):
+            dados.indexar(registro[self.coluna_id], registro, self._texto(registro))
+        with self._trava:
+            self._dados = dados
+            self._geracao_vista = geracao
+        logger.info("Índice de busca '%s' carregado com %d registros", self.nome, len(dados.registros))
+
+    def _garantir_carregado(self):
+        if self._geracao_vista is None:
+            with self._trava:
+                if self._geracao_vista is None:
+                    self.reconstruir()
+        elif not self._recarregando and self.geracao.atual() != self._geracao_vista:
+            # Outro worker alterou os dados: recarrega em segundo plano e continua servindo o índice atual
+            self._recarregando = True
+            threading.Thread(target=self._recarregar_em_segundo_plano, daemon=True).start()
+
+    def _recarregar_em_segundo_plano(self):
+        try:
+            self.reconstruir()
+        except Exception as e:
+            logger.warning("Falha ao recarregar índice de busca '%s': %s", self.nome, e)
+        finally:
+            self._recarregando = False
+
+    # --- consulta ---
+    def _candidatos(self, termo):
+        gramas = _gramas_consulta(termo)
+        if gramas is None:
+            # Um caractere só: prefixo de palavra, verificado direto nos textos
+            return [id_registro for id_registro, texto in self._dados.textos.items() if f" {termo}" in texto]
+        listas = sorted((self._dados.postings.get(gram, set()) for gram in gramas), key=len)
+        if not listas or not listas[0]:
+            return []
+        ids = set(listas[0])
+        for lista in listas[1:]:
+            ids &= lista
+            if not ids:
+                return []
+        # Trigramas em comum não garantem a substring inteira; confirma no texto
+        return [id_registro for id_registro in ids if termo in self._dados.textos[id_registro]]
+
+    def _relevancia(self, termo, id_registro):
+        texto = self._dados.textos[id_registro]
+        posicao = texto.find(termo)
+        inicio_palavra = texto[posicao - 1] in ' |' if posicao > 0 else True
+        return (0 if posicao == 1 else 1 if inicio_palavra else 2, len(texto), id_registro)
+
+    def buscar(self, termo, limite=10):
+        termo = normalizar(termo)
+        if not termo:
+            return []
+        self._garantir_carregado()
+        with self._trava:
+            ids = self._candidatos(termo)
+            melhores = heapq.nsmallest(limite, ids, key=lambda id_registro: self._relevancia(termo, id_registro))
+            return [self._dados.registros[id_registro] for id_registro in melhores]
+
+    def pagina(self, termo, posicao=None, tamanho=50):
+        # Mesma ordem (nome, id) da paginação por cursor das listagens
+        termo = normalizar(termo)
+        if not termo:
+            return [], None
+        self._garantir_carregado()
+        with self._trava:
+            chaves = []
+            for id_registro in self._candidatos(termo):
+                chave = (self._dados.registros[id_registro].get('nome') or '', id_registro)
+                if posicao is None or chave > posicao:
+                    chaves.append(chave)
+        selecionadas = heapq.nsmallest(tamanho + 1, chaves)
+        proxima = selecionadas[tamanho - 1] if len(selecionadas) > tamanho else None
+        return [id_registro for _, id_registro in selecionadas[:tamanho]], proxima
+
+    def geracao_carregada(self):
+        # Geração dos dados que as buscas estão usando agora; se outro worker gravou, dispara a recarga
+        self._garantir_carregado()
+        return self._geracao_vista
+
+    def estatisticas(self):
+        return {"registros": len(self._dados.registros), "trigramas": len(self._dados.postings), "carregado": self._geracao_vista is not None}
@@ -0,0 +1,128 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # backend compartilhado é opcional
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# --- CACHE EM MEMÓRIA (TTL + LRU) COM INVALIDAÇÃO ENTRE WORKERS ---
+# Cada worker do gunicorn tem sua cópia local. Um contador de geração compartilhado faz
+# a invalidação feita em um worker valer para todos: no Redis, quando CACHE_REDIS_URL
+# está definido, ou senão em uma linha de tb_versao, quando quem cria o cache passa o
+# repositório (versoes=). Sem nenhum dos dois, a geração vale só para o processo.
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+
+
+class GeracaoCompartilhada:
+    def __init__(self, ler, somar, origem, intervalo_verificacao=1.0):
+        # ler() devolve o valor atual e somar() incrementa e devolve o novo, no armazenamento comum
+        self._ler = ler
+        self._somar = somar
+        self.origem = origem
+        self.intervalo_verificacao = intervalo_verificacao
+        self._valor = 0
+        self._verificado_em = 0.0
+
+    def atual(self):
+        # Consulta o armazenamento no máximo uma vez por intervalo para não virar outro round-trip por requisição
+        agora = time.monotonic()
+        if agora - self._verificado_em >= self.intervalo_verificacao:
+            try:
+                self._valor = int(self._ler() or 0)
+            except Exception as e:
+                logger.warning("Falha ao ler geração do cache (%s): %s", self.origem, e)
+            self._verificado_em = agora
+        return self._valor
+
+    def incrementar(self):
+        try:
+            self._valor = int(self._somar())
+        except Exception as e:
+            logger.warning("Falha ao invalidar cache (%s): %s", self.origem, e)
+            self._valor += 1
+        self._verificado_em = time.monotonic()
+        return self._valor
+
+
+class GeracaoLocal:
+    def __init__(self):
+        self._valor = 0
+
+    def atual(self):
+        return self._valor
+
+    def incrementar(self):
+        self._valor += 1
+        return self._valor
+
+
+def criar_geracao(nome, versoes=None):
+    # versoes: função que devolve o repositório de tb_versao (db.versoes), usado quando não há Redis.
+    # Sem Redis e sem versoes, a geração vale só para o processo
+    if CACHE_REDIS_URL:
+        if redis is None:
+            logger.warning("CACHE_REDIS_URL definido, mas o pacote redis não está instalado; ignorando o Redis.")
+        else:
+            cliente, chave = redis.Redis.from_url(CACHE_REDIS_URL), f"erp:cache:{nome}:geracao"
+            return GeracaoCompartilhada(lambda: cliente.get(chave), lambda: cliente.incr(chave), "redis")
+    if versoes is not None:
+        chave = f"geracao:{nome}"
+        return GeracaoCompartilhada(
+            lambda: next((linha['versao'] for linha in versoes().por_ids([chave], "tabela, versao")), 0),
+            lambda: versoes().incrementar(chave), "tb_versao")
+    return GeracaoLocal()
+
+
+class CacheTTL:
+    def __init__(self, nome, ttl=60, tamanho_maximo=256, versoes=None):
+        self.nome = nome
+        self.ttl = ttl
+        self.tamanho_maximo = tamanho_maximo
+        self.geracao = criar_geracao(nome, versoes)
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave, carregar):
+        geracao = self.geracao.atual()
+        agora = time.monotonic()
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is not None and item[0] == geracao and (item[1] is None or item[1] > agora):
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return item[2]
+            self.falhas += 1
+
+        valor = carregar()
+        with self._trava:
+            # ttl=None: o item só sai por invalidação ou pelo limite de tamanho
+            self._itens[chave] = (geracao, agora + self.ttl if self.ttl is not None else None, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho_maximo:
+                self._itens.popitem(last=False)
+        return valor
+
+    def invalidar(self):
+        self.geracao.incrementar()
+        with self._trava:
+            self._itens.clear()
+
+    def estatisticas(self):
+        total = self.acertos + self.falhas
+        return {
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "taxa_acerto": round(self.acertos / total, 4) if total else 0.0,
+            "itens": len(self._itens),
+            "tamanho_maximo": self.tamanho_maximo,
+            "ttl": self.ttl,
+            "compartilhado": isinstance(self.geracao, GeracaoCompartilhada),
+        }
@@ -0,0 +1,76 @@
+"""Camada de acesso a dados.
+
+As rotas falam com repositórios (``db.usuarios``, ``db.produtos``, ``db.clientes``,
+``db.vendas``, ``db.movimentos`` e ``db.inventarios``) em vez do cliente Supabase.
+Existem dois backends com a mesma interface e o mesmo esquema:
+
+- ``supabase``: PostgREST sobre uma sessão HTTP com pool de conexões keep-alive;
+- ``sqlite``: banco local, para rodar o app, benchmarks e testes de carga offline.
+
+O backend é escolhido por ``ERP_BACKEND`` (padrão ``supabase``); no SQLite o arquivo
+vem de ``SQLITE_CAMINHO`` (padrão ``:memory:``).
+
+``BackendSobDemanda`` adia a criação do backend até o primeiro uso: importar o app
+não abre cliente HTTP nem banco, e cada processo (worker do gunicorn depois do fork)
+monta o seu uma única vez.
+"""
+import os
+import threading
+
+from dados.base import REPOSITORIOS, SaldoInsuficiente, em_lotes
+
+BACKENDS = ("supabase", "sqlite")
+
+
+def criar_backend(nome=None):
+    nome = (nome or os.getenv("ERP_BACKEND", "supabase")).lower()
+    if nome == "sqlite":
+        from dados.sqlite_backend import BackendSQLite
+        return BackendSQLite(os.getenv("SQLITE_CAMINHO", ":memory:"))
+    if nome == "supabase":
+        url, key = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY")
+        if not url or not key:
+            raise ValueError("Erro: As variáveis SUPABASE_URL e SUPABASE_KEY não foram encontradas. Verifique seu arquivo .env.")
+        from dados.supabase_backend import BackendSupabase
+        return BackendSupabase(url, key)
+    raise ValueError(f"ERP_BACKEND inválido: {nome}. Use um de: {', '.join(BACKENDS)}.")
+
+
+class BackendSobDemanda:
+    def __init__(self, fabrica):
+        self._fabrica = fabrica
+        self._backend = None
+        self._trava = threading.Lock()
+        if hasattr(os, "register_at_fork"):
+            # Conexões e pools não sobrevivem ao fork: o filho monta o próprio backend
+            os.register_at_fork(after_in_child=self._descartar)
+
+    def _descartar(self):
+        self._backend = None
+        self._trava = threading.Lock()
+
+    def iniciar(self):
+        backend = self._backend
+        if backend is None:
+            with self._trava:
+                if self._backend is None:
+                    self._backend = self._fabrica()
+                backend = self._backend
+        return backend
+
+    @property
+    def iniciado(self):
+        return self._backend is not None
+
+    def fechar(self):
+        with self._trava:
+            backend, self._backend = self._backend, None
+        if backend is not None:
+            backend.fechar()
+
+    def __getattr__(self, nome):
+        # Só é chamado para o que não existe no próprio objeto: repositórios e demais atributos do backend
+        return getattr(self.iniciar(), nome)
+
+
+__all__ = ["BACKENDS", "REPOSITORIOS", "BackendSobDemanda", "SaldoInsuficiente", "criar_backend", "em_lotes"]
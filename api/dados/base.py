@@ -0,0 +1,39 @@
+# --- TIPOS E FUNÇÕES COMUNS AOS BACKENDS ---
+# Atributos que todo backend expõe, um repositório por tabela principal
+REPOSITORIOS = ("usuarios", "produtos", "clientes", "vendas", "movimentos", "inventarios", "versoes")
+
+
+class SaldoInsuficiente(Exception):
+    def __init__(self, id_produto):
+        super().__init__(f"Estoque insuficiente para o produto {id_produto}")
+        self.id_produto = id_produto
+
+
+def fatiar(linhas, coluna_ordem, coluna_id, tamanho):
+    # Os repositórios buscam tamanho + 1 linhas: a sobra indica que há próxima página
+    if len(linhas) <= tamanho:
+        return linhas, None
+    linhas = linhas[:tamanho]
+    ultima = linhas[-1]
+    return linhas, (ultima[coluna_ordem], ultima[coluna_id])
+
+
+def consolidar_ajustes(itens):
+    # Soma linhas do mesmo produto e ordena por id (ordem fixa evita deadlock entre transações)
+    total = {}
+    for item in itens:
+        id_produto = int(item["id_produto"])
+        total[id_produto] = total.get(id_produto, 0) + int(item["quantidade"])
+    return sorted(total.items())
+
+
+def em_lotes(itens, tamanho):
+    # Listas de até tamanho itens, lendo a entrada (que pode ser um stream) sob demanda
+    lote = []
+    for item in itens:
+        lote.append(item)
+        if len(lote) == tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
@@ -0,0 +1,144 @@
+-- Mesmo esquema das tabelas do Supabase, para rodar o app e os benchmarks sem o serviço.
+PRAGMA foreign_keys = ON;
+
+CREATE TABLE IF NOT EXISTS tb_usuario (
+    id_usuario  INTEGER PRIMARY KEY AUTOINCREMENT,
+    nome        TEXT NOT NULL,
+    email       TEXT NOT NULL UNIQUE,
+    cpf         TEXT UNIQUE,
+    senha       TEXT NOT NULL,
+    is_admin    INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_usuario_nome ON tb_usuario (nome, id_usuario);
+
+CREATE TABLE IF NOT EXISTS tb_produto (
+    id_produto  INTEGER PRIMARY KEY AUTOINCREMENT,
+    nome        TEXT NOT NULL,
+    marca       TEXT,
+    preco       REAL NOT NULL DEFAULT 0,
+    estoque     INTEGER NOT NULL DEFAULT 0,
+    validade    TEXT,
+    ativo       INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS ix_produto_nome ON tb_produto (nome, id_produto);
+CREATE INDEX IF NOT EXISTS ix_produto_estoque ON tb_produto (estoque);
+CREATE INDEX IF NOT EXISTS ix_produto_validade ON tb_produto (validade);
+
+CREATE TABLE IF NOT EXISTS tb_cliente (
+    id_cliente  INTEGER PRIMARY KEY AUTOINCREMENT,
+    nome        TEXT NOT NULL,
+    email       TEXT,
+    cpf         TEXT UNIQUE
+);
+CREATE INDEX IF NOT EXISTS ix_cliente_nome ON tb_cliente (nome, id_cliente);
+
+CREATE TABLE IF NOT EXISTS tb_venda (
+    id_venda    INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_usuario  INTEGER REFERENCES tb_usuario (id_usuario),
+    id_cliente  INTEGER REFERENCES tb_cliente (id_cliente),
+    valor_total REAL NOT NULL DEFAULT 0,
+    data_venda  TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE INDEX IF NOT EXISTS ix_venda_data ON tb_venda (data_venda, id_venda);
+
+CREATE TABLE IF NOT EXISTS tb_venda_item (
+    id_venda_item  INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_venda       INTEGER NOT NULL REFERENCES tb_venda (id_venda),
+    id_produto     INTEGER NOT NULL REFERENCES tb_produto (id_produto),
+    quantidade     INTEGER NOT NULL,
+    preco_unitario REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_venda_item_venda ON tb_venda_item (id_venda);
+CREATE INDEX IF NOT EXISTS ix_venda_item_produto ON tb_venda_item (id_produto);
+
+CREATE TABLE IF NOT EXISTS tb_estoque_mov (
+    id_mov      INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_produto  INTEGER NOT NULL REFERENCES tb_produto (id_produto),
+    tipo_mov    TEXT NOT NULL CHECK (tipo_mov IN ('ENTRADA', 'SAIDA')),
+    quantidade  INTEGER NOT NULL,
+    motivo      TEXT,
+    criado_em   TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    -- Preenchido nos ajustes gerados por um inventário
+    id_inventario INTEGER REFERENCES tb_inventario (id_inventario)
+);
+CREATE INDEX IF NOT EXISTS ix_estoque_mov_data ON tb_estoque_mov (criado_em, id_mov);
+CREATE INDEX IF NOT EXISTS ix_estoque_mov_produto ON tb_estoque_mov (id_produto);
+CREATE INDEX IF NOT EXISTS ix_estoque_mov_inventario ON tb_estoque_mov (id_inventario);
+
+CREATE TABLE IF NOT EXISTS tb_inventario (
+    id_inventario   INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_usuario      INTEGER REFERENCES tb_usuario (id_usuario),
+    observacao      TEXT,
+    itens_contados  INTEGER NOT NULL DEFAULT 0,
+    itens_ajustados INTEGER NOT NULL DEFAULT 0,
+    criado_em       TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE INDEX IF NOT EXISTS ix_inventario_data ON tb_inventario (criado_em, id_inventario);
+
+-- Marcador de versão por tabela para o GET condicional (ver sql/versoes.sql); o SQLite
+-- só tem gatilhos por linha, então um insert em lote incrementa uma vez por linha
+CREATE TABLE IF NOT EXISTS tb_versao (
+    tabela      TEXT PRIMARY KEY,
+    versao      INTEGER NOT NULL DEFAULT 0,
+    alterado_em TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+INSERT OR IGNORE INTO tb_versao (tabela) VALUES ('tb_usuario');
+CREATE TRIGGER IF NOT EXISTS tg_versao_usuario_insert AFTER INSERT ON tb_usuario BEGIN
+    UPDATE tb_versao SET versao = versao + 1, alterado_em = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE tabela = 'tb_usuario';
+END;
+CREATE TRIGGER IF NOT EXISTS tg_versao_usuario_update AFTER UPDATE ON tb_usuario BEGIN
+    UPDATE tb_versao SET versao = versao + 1, alterado_em = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE tabela = 'tb_usuario';
+END;
+CREATE TRIGGER IF NOT EXISTS tg_versao_usuario_delete AFTER DELETE ON tb_usuario BEGIN
+    UPDATE tb_versao SET versao = versao + 1, alterado_em = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE tabela = 'tb_usuario';
+END;
+INSERT OR IGNORE INTO tb_versao (tabela) VALUES ('tb_produto');
+CREATE TRIGGER IF NOT EXISTS tg_versao_produto_insert AFTER INSERT ON tb_produto BEGIN
+    UPDATE tb_versao SET versao = versao + 1, alterado_em = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE tabela = 'tb_produto';
+END;
+CREATE TRIGGER IF NOT EXISTS tg_versao_produto_update AFTER UPDATE ON tb_produto BEGIN
+    UPDATE tb_versao SET versao = versao + 1, alterado_em = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE tabela = 'tb_produto';
+END;
+CREATE TRIGGER IF NOT EXISTS tg_versao_produto_delete AFTER DELETE ON tb_produto BEGIN
+    UPDATE tb_versao SET versao = versao + 1, alterado_em = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE tabela = 'tb_produto';
+END;
+INSERT OR IGNORE INTO tb_versao (tabela) VALUES ('tb_cliente');
+CREATE TRIGGER IF NOT EXISTS tg_versao_cliente_insert AFTER INSERT ON tb_cliente BEGIN
+    UPDATE tb_versao SET versao = versao + 1, alterado_em = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE tabela = 'tb_cliente';
+END;
+CREATE TRIGGER IF NOT EXISTS tg_versao_cliente_update AFTER UPDATE ON tb_cliente BEGIN
+    UPDATE tb_versao SET versao = versao + 1, alterado_em = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE tabela = 'tb_cliente';
+END;
+CREATE TRIGGER IF NOT EXISTS tg_versao_cliente_delete AFTER DELETE ON tb_cliente BEGIN
+    UPDATE tb_versao SET versao = versao + 1, alterado_em = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE tabela = 'tb_cliente';
+END;
+INSERT OR IGNORE INTO tb_versao (tabela) VALUES ('tb_venda');
+CREATE TRIGGER IF NOT EXISTS tg_versao_venda_insert AFTER INSERT ON tb_venda BEGIN
+    UPDATE tb_versao SET versao = versao + 1, alterado_em = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE tabela = 'tb_venda';
+END;
+CREATE TRIGGER IF NOT EXISTS tg_versao_venda_update AFTER UPDATE ON tb_venda BEGIN
+    UPDATE tb_versao SET versao = versao + 1, alterado_em = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE tabela = 'tb_venda';
+END;
+CREATE TRIGGER IF NOT EXISTS tg_versao_venda_delete AFTER DELETE ON tb_venda BEGIN
+    UPDATE tb_versao SET versao = versao + 1, alterado_em = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE tabela = 'tb_venda';
+END;
+INSERT OR IGNORE INTO tb_versao (tabela) VALUES ('tb_estoque_mov');
+CREATE TRIGGER IF NOT EXISTS tg_versao_estoque_mov_insert AFTER INSERT ON tb_estoque_mov BEGIN
+    UPDATE tb_versao SET versao = versao + 1, alterado_em = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE tabela = 'tb_estoque_mov';
+END;
+CREATE TRIGGER IF NOT EXISTS tg_versao_estoque_mov_update AFTER UPDATE ON tb_estoque_mov BEGIN
+    UPDATE tb_versao SET versao = versao + 1, alterado_em = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE tabela = 'tb_estoque_mov';
+END;
+CREATE TRIGGER IF NOT EXISTS tg_versao_estoque_mov_delete AFTER DELETE ON tb_estoque_mov BEGIN
+    UPDATE tb_versao SET versao = versao + 1, alterado_em = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE tabela = 'tb_estoque_mov';
+END;
+INSERT OR IGNORE INTO tb_versao (tabela) VALUES ('tb_inventario');
+CREATE TRIGGER IF NOT EXISTS tg_versao_inventario_insert AFTER INSERT ON tb_inventario BEGIN
+    UPDATE tb_versao SET versao = versao + 1, alterado_em = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE tabela = 'tb_inventario';
+END;
+CREATE TRIGGER IF NOT EXISTS tg_versao_inventario_update AFTER UPDATE ON tb_inventario BEGIN
+    UPDATE tb_versao SET versao = versao + 1, alterado_em = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE tabela = 'tb_inventario';
+END;
+CREATE TRIGGER IF NOT EXISTS tg_versao_inventario_delete AFTER DELETE ON tb_inventario BEGIN
+    UPDATE tb_versao SET versao = versao + 1, alterado_em = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE tabela = 'tb_inventario';
+END;
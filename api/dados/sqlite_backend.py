@@ -0,0 +1,353 @@
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from dados.base import SaldoInsuficiente, consolidar_ajustes, fatiar
+
+# --- BACKEND SQLITE LOCAL ---
+# Mesmo esquema e mesmos repositórios do backend Supabase, para rodar o app,
+# benchmarks e testes de carga sem depender do serviço. Uma conexão por thread
+# (WAL + busy_timeout), escrita com várias linhas sempre em transação.
+ESQUEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema_sqlite.sql")
+
+
+def _linha_como_dict(cursor, linha):
+    return {coluna[0]: valor for coluna, valor in zip(cursor.description, linha)}
+
+
+class _Conexoes:
+    def __init__(self, caminho):
+        self.temporario = caminho == ":memory:"
+        if self.temporario:
+            # Várias threads precisam enxergar o mesmo banco, então ":memory:" vira um arquivo temporário
+            descritor, caminho = tempfile.mkstemp(prefix="erp_", suffix=".db")
+            os.close(descritor)
+        self.caminho = caminho
+        self._local = threading.local()
+        self._todas = []
+        self._trava = threading.Lock()
+        with open(ESQUEMA, encoding="utf-8") as arquivo:
+            self.atual().executescript(arquivo.read())
+
+    def atual(self):
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30, isolation_level=None, check_same_thread=False)
+            conexao.row_factory = _linha_como_dict
+            conexao.execute("PRAGMA journal_mode = WAL")
+            conexao.execute("PRAGMA synchronous = NORMAL")
+            conexao.execute("PRAGMA foreign_keys = ON")
+            self._local.conexao = conexao
+            with self._trava:
+                self._todas.append(conexao)
+        return conexao
+
+    @contextmanager
+    def transacao(self):
+        conexao = self.atual()
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            yield conexao
+        except BaseException:
+            conexao.execute("ROLLBACK")
+            raise
+        conexao.execute("COMMIT")
+
+    def fechar(self):
+        with self._trava:
+            for conexao in self._todas:
+                conexao.close()
+            self._todas.clear()
+        self._local = threading.local()
+        if self.temporario:
+            for sufixo in ("", "-wal", "-shm"):
+                if os.path.exists(self.caminho + sufixo):
+                    os.remove(self.caminho + sufixo)
+
+
+def _colunas_sql(colunas):
+    # Aceita o mesmo formato do select() do PostgREST ("id, nome" ou "*")
+    return ", ".join(coluna.strip() for coluna in colunas.split(","))
+
+
+# --- REPOSITÓRIOS ---
+class _Repositorio:
+    tabela = None
+    coluna_id = None
+    booleanas = ()
+
+    def __init__(self, conexoes):
+        self.conexoes = conexoes
+
+    def _saida(self, linha):
+        for coluna in self.booleanas:
+            if coluna in linha and linha[coluna] is not None:
+                linha[coluna] = bool(linha[coluna])
+        return linha
+
+    def _todas(self, sql, parametros=()):
+        return [self._saida(linha) for linha in self.conexoes.atual().execute(sql, parametros).fetchall()]
+
+    def _uma(self, sql, parametros=()):
+        linhas = self._todas(sql, parametros)
+        return linhas[0] if linhas else None
+
+    def _insert(self, conexao, dados):
+        colunas = list(dados)
+        sql = (f"INSERT INTO {self.tabela} ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))}) RETURNING *")
+        return self._saida(conexao.execute(sql, [dados[coluna] for coluna in colunas]).fetchone())
+
+    def obter(self, id_registro, colunas="*"):
+        return self._uma(f"SELECT {_colunas_sql(colunas)} FROM {self.tabela} WHERE {self.coluna_id} = ?", (id_registro,))
+
+    def por_ids(self, ids, colunas="*"):
+        ids = list(ids)
+        if not ids:
+            return []
+        return self._todas(f"SELECT {_colunas_sql(colunas)} FROM {self.tabela} WHERE {self.coluna_id} IN ({', '.join('?' * len(ids))})", ids)
+
+    def inserir(self, dados):
+        if isinstance(dados, list):
+            with self.conexoes.transacao() as conexao:
+                return [self._insert(conexao, linha) for linha in dados]
+        return self._insert(self.conexoes.atual(), dados)
+
+    def upsert(self, linhas, conflito):
+        if not linhas:
+            return []
+        colunas = list(linhas[0])
+        atualizar = ", ".join(f"{coluna} = excluded.{coluna}" for coluna in colunas if coluna != conflito)
+        sql = (f"INSERT INTO {self.tabela} ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))}) "
+               f"ON CONFLICT ({conflito}) DO UPDATE SET {atualizar} RETURNING *")
+        with self.conexoes.transacao() as conexao:
+            return [self._saida(conexao.execute(sql, [linha.get(coluna) for coluna in colunas]).fetchone()) for linha in linhas]
+
+    def atualizar(self, id_registro, dados):
+        atribuicoes = ", ".join(f"{coluna} = ?" for coluna in dados)
+        return self._uma(f"UPDATE {self.tabela} SET {atribuicoes} WHERE {self.coluna_id} = ? RETURNING *",
+                         [*dados.values(), id_registro])
+
+    def excluir(self, id_registro):
+        self.conexoes.atual().execute(f"DELETE FROM {self.tabela} WHERE {self.coluna_id} = ?", (id_registro,))
+
+    def _pagina_keyset(self, colunas, coluna_ordem, posicao, tamanho, condicoes=(), parametros=(), origem=None):
+        condicoes, parametros = list(condicoes), list(parametros)
+        if posicao:
+            condicoes.append(f"({coluna_ordem}, {self.coluna_id}) > (?, ?)")
+            parametros += [posicao[0], posicao[1]]
+        onde = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        linhas = self._todas(f"SELECT {colunas} FROM {origem or self.tabela} {onde} "
+                             f"ORDER BY {coluna_ordem}, {self.coluna_id} LIMIT ?", [*parametros, tamanho + 1])
+        return fatiar(linhas, coluna_ordem, self.coluna_id, tamanho)
+
+    def pagina(self, colunas, posicao=None, tamanho=50):
+        return self._pagina_keyset(_colunas_sql(colunas), "nome", posicao, tamanho)
+
+    def percorrer(self, colunas, tamanho_lote=1000):
+        ultimo = None
+        while True:
+            if ultimo is None:
+                linhas = self._todas(f"SELECT {_colunas_sql(colunas)} FROM {self.tabela} ORDER BY {self.coluna_id} LIMIT ?", (tamanho_lote,))
+            else:
+                linhas = self._todas(f"SELECT {_colunas_sql(colunas)} FROM {self.tabela} WHERE {self.coluna_id} > ? "
+                                     f"ORDER BY {self.coluna_id} LIMIT ?", (ultimo, tamanho_lote))
+            yield from linhas
+            if len(linhas) < tamanho_lote:
+                return
+            ultimo = linhas[-1][self.coluna_id]
+
+
+class _RepositorioHistorico(_Repositorio):
+    coluna_data = None
+    # (tabela embutida, coluna de ligação, coluna trazida), no formato que o PostgREST devolve
+    embutido = None
+
+    def _origem(self):
+        tabela, ligacao, coluna = self.embutido
+        return (f"(SELECT h.*, e.{coluna} AS _embutido FROM {self.tabela} h "
+                f"LEFT JOIN {tabela} e ON e.{ligacao} = h.{ligacao})")
+
+    def _aninhar(self, linha):
+        valor = linha.pop("_embutido", None)
+        linha[self.embutido[0]] = {self.embutido[2]: valor} if valor is not None else None
+        return linha
+
+    def recentes(self, limite):
+        linhas = self._todas(f"SELECT * FROM {self._origem()} ORDER BY {self.coluna_data} DESC, {self.coluna_id} DESC LIMIT ?", (limite,))
+        return [self._aninhar(linha) for linha in linhas]
+
+    def _periodo(self, inicio, fim):
+        condicoes, parametros = [], []
+        if inicio:
+            condicoes.append(f"{self.coluna_data} >= ?")
+            parametros.append(inicio)
+        if fim:
+            condicoes.append(f"{self.coluna_data} < ?")
+            parametros.append(fim)
+        return condicoes, parametros
+
+    def percorrer_periodo(self, inicio=None, fim=None, tamanho_lote=1000):
+        condicoes, parametros = self._periodo(inicio, fim)
+        posicao = None
+        while True:
+            linhas, posicao = self._pagina_keyset("*", self.coluna_data, posicao, tamanho_lote, condicoes, parametros, self._origem())
+            for linha in linhas:
+                yield self._aninhar(linha)
+            if not posicao:
+                return
+
+
+class UsuariosSQLite(_Repositorio):
+    tabela, coluna_id, booleanas = "tb_usuario", "id_usuario", ("is_admin",)
+
+    def por_email(self, email, colunas="*"):
+        return self._uma(f"SELECT {_colunas_sql(colunas)} FROM tb_usuario WHERE email = ? LIMIT 1", (email,))
+
+    def existe(self, cpf=None, email=None):
+        condicoes = [(f"{coluna} = ?", valor) for coluna, valor in (("cpf", cpf), ("email", email)) if valor]
+        if not condicoes:
+            return False
+        sql = f"SELECT 1 FROM tb_usuario WHERE {' OR '.join(condicao for condicao, _ in condicoes)} LIMIT 1"
+        return bool(self._todas(sql, [valor for _, valor in condicoes]))
+
+    def pagina(self, colunas, posicao=None, tamanho=50, termo=''):
+        if not termo:
+            return super().pagina(colunas, posicao, tamanho)
+        return self._pagina_keyset(_colunas_sql(colunas), "nome", posicao, tamanho, ["nome LIKE ?"], [f"%{termo}%"])
+
+
+class ProdutosSQLite(_Repositorio):
+    tabela, coluna_id, booleanas = "tb_produto", "id_produto", ("ativo",)
+
+    def listar(self, colunas, apenas_ativos=False):
+        onde = "WHERE ativo = 1" if apenas_ativos else ""
+        return self._todas(f"SELECT {_colunas_sql(colunas)} FROM tb_produto {onde} ORDER BY nome")
+
+    def em_alerta(self, limiar, validade_ate, colunas):
+        # Ativos com estoque baixo ou validade até a data: cada lado do OR usa o seu índice
+        return self._todas(f"SELECT {_colunas_sql(colunas)} FROM tb_produto WHERE ativo = 1 AND (estoque <= ? OR validade <= ?)",
+                           (limiar, validade_ate))
+
+    def saldo(self, id_produto):
+        return self.obter(id_produto, "id_produto, nome, estoque")
+
+    def trocar_estoque(self, id_produto, esperado, novo):
+        cursor = self.conexoes.atual().execute(
+            "UPDATE tb_produto SET estoque = ? WHERE id_produto = ? AND estoque = ?", (novo, id_produto, esperado))
+        return cursor.rowcount == 1
+
+    def ajustar_estoque(self, itens):
+        # Mesma semântica da função ajustar_estoque do Postgres: tudo ou nada
+        atualizados = []
+        with self.conexoes.transacao() as conexao:
+            for id_produto, quantidade in consolidar_ajustes(itens):
+                linha = conexao.execute(
+                    "UPDATE tb_produto SET estoque = estoque - ? WHERE id_produto = ? AND estoque >= ? "
+                    "RETURNING id_produto, estoque", (quantidade, id_produto, quantidade)).fetchone()
+                if linha is None:
+                    raise SaldoInsuficiente(id_produto)
+                atualizados.append(linha)
+        return atualizados
+
+    def desfazer_ajuste(self, itens):
+        # Devolve o que ajustar_estoque(itens) aplicou, sem condição de saldo (compensação)
+        atualizados = []
+        with self.conexoes.transacao() as conexao:
+            for id_produto, quantidade in consolidar_ajustes(itens):
+                atualizados += conexao.execute(
+                    "UPDATE tb_produto SET estoque = estoque + ? WHERE id_produto = ? "
+                    "RETURNING id_produto, estoque", (quantidade, id_produto)).fetchall()
+        return atualizados
+
+
+class ClientesSQLite(_Repositorio):
+    tabela, coluna_id = "tb_cliente", "id_cliente"
+
+    def existe_cpf(self, cpf):
+        return bool(self._todas("SELECT 1 FROM tb_cliente WHERE cpf = ? LIMIT 1", (cpf,)))
+
+    def por_cpfs(self, cpfs, colunas="id_cliente, cpf"):
+        cpfs = list(cpfs)
+        if not cpfs:
+            return []
+        return self._todas(f"SELECT {_colunas_sql(colunas)} FROM tb_cliente WHERE cpf IN ({', '.join('?' * len(cpfs))})", cpfs)
+
+
+class VendasSQLite(_RepositorioHistorico):
+    tabela, coluna_id, coluna_data = "tb_venda", "id_venda", "data_venda"
+    embutido = ("tb_usuario", "id_usuario", "nome")
+
+    def inserir_itens(self, itens):
+        with self.conexoes.transacao() as conexao:
+            return [conexao.execute(
+                "INSERT INTO tb_venda_item (id_venda, id_produto, quantidade, preco_unitario) VALUES (?, ?, ?, ?) RETURNING *",
+                (item["id_venda"], item["id_produto"], item["quantidade"], item["preco_unitario"])).fetchone() for item in itens]
+
+    def excluir(self, id_venda):
+        with self.conexoes.transacao() as conexao:
+            conexao.execute("DELETE FROM tb_venda_item WHERE id_venda = ?", (id_venda,))
+            conexao.execute("DELETE FROM tb_venda WHERE id_venda = ?", (id_venda,))
+
+    def contar_itens_do_produto(self, id_produto):
+        return self._uma("SELECT COUNT(*) AS total FROM tb_venda_item WHERE id_produto = ?", (id_produto,))["total"]
+
+    def lotes_com_itens(self, inicio=None, fim=None, tamanho_lote=1000):
+        # Um lote de vendas do período por vez, cada uma com os itens em "tb_venda_item" (como o embed do PostgREST)
+        condicoes, parametros = self._periodo(inicio, fim)
+        posicao = None
+        while True:
+            vendas, posicao = self._pagina_keyset("id_venda, id_usuario, data_venda", self.coluna_data, posicao,
+                                                  tamanho_lote, condicoes, parametros)
+            if vendas:
+                itens = {}
+                for item in self._todas("SELECT id_venda, id_produto, quantidade, preco_unitario FROM tb_venda_item "
+                                        f"WHERE id_venda IN ({', '.join('?' * len(vendas))})", [v["id_venda"] for v in vendas]):
+                    itens.setdefault(item.pop("id_venda"), []).append(item)
+                for venda in vendas:
+                    venda["tb_venda_item"] = itens.get(venda["id_venda"], [])
+                yield vendas
+            if not posicao:
+                return
+
+
+class MovimentosSQLite(_RepositorioHistorico):
+    tabela, coluna_id, coluna_data = "tb_estoque_mov", "id_mov", "criado_em"
+    embutido = ("tb_produto", "id_produto", "nome")
+
+    def contar_do_produto(self, id_produto):
+        return self._uma("SELECT COUNT(*) AS total FROM tb_estoque_mov WHERE id_produto = ?", (id_produto,))["total"]
+
+
+class InventariosSQLite(_RepositorioHistorico):
+    tabela, coluna_id, coluna_data = "tb_inventario", "id_inventario", "criado_em"
+    embutido = ("tb_usuario", "id_usuario", "nome")
+
+
+class VersoesSQLite(_Repositorio):
+    # Uma linha por tabela, mantida pelos gatilhos do esquema
+    tabela, coluna_id = "tb_versao", "tabela"
+
+    def incrementar(self, nome):
+        # Contador avulso (geração dos caches em memória dos workers), criado no primeiro uso
+        return self._uma("INSERT INTO tb_versao (tabela, versao) VALUES (?, 1) ON CONFLICT (tabela) DO UPDATE "
+                         "SET versao = versao + 1, alterado_em = strftime('%Y-%m-%dT%H:%M:%f', 'now') RETURNING versao",
+                         (nome,))["versao"]
+
+
+class BackendSQLite:
+    nome = "sqlite"
+
+    def __init__(self, caminho=":memory:"):
+        self.conexoes = _Conexoes(caminho)
+        self.usuarios = UsuariosSQLite(self.conexoes)
+        self.produtos = ProdutosSQLite(self.conexoes)
+        self.clientes = ClientesSQLite(self.conexoes)
+        self.vendas = VendasSQLite(self.conexoes)
+        self.movimentos = MovimentosSQLite(self.conexoes)
+        self.inventarios = InventariosSQLite(self.conexoes)
+        self.versoes = VersoesSQLite(self.conexoes)
+
+    def fechar(self):
+        self.conexoes.fechar()
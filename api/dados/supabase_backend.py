@@ -0,0 +1,275 @@
+import os
+import re
+
+import httpx
+from postgrest import SyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+from postgrest.exceptions import APIError
+from postgrest.utils import SyncClient
+
+from dados.base import SaldoInsuficiente, consolidar_ajustes, fatiar
+
+# --- BACKEND SUPABASE (POSTGREST SOBRE HTTP COM POOL DE CONEXÕES) ---
+# Só o cliente PostgREST é construído (auth, storage e realtime não são usados),
+# com uma sessão httpx que mantém as conexões abertas entre requisições.
+POOL_CONEXOES = int(os.getenv("SUPABASE_POOL_CONEXOES", 20))
+POOL_KEEPALIVE = int(os.getenv("SUPABASE_POOL_KEEPALIVE", 10))
+POOL_KEEPALIVE_SEGUNDOS = float(os.getenv("SUPABASE_POOL_KEEPALIVE_SEGUNDOS", 60))
+TIMEOUT_SEGUNDOS = float(os.getenv("SUPABASE_TIMEOUT", 10))
+
+
+class _ClientePostgrestPool(SyncPostgrestClient):
+    def __init__(self, base_url, headers, timeout, limites):
+        self._limites = limites
+        super().__init__(base_url, headers=headers, timeout=timeout)
+
+    def create_session(self, base_url, headers, timeout):
+        return SyncClient(base_url=base_url, headers=headers, timeout=timeout, limits=self._limites)
+
+
+def criar_cliente_postgrest(url, key):
+    key = key.strip()
+    limites = httpx.Limits(max_connections=POOL_CONEXOES, max_keepalive_connections=POOL_KEEPALIVE,
+                           keepalive_expiry=POOL_KEEPALIVE_SEGUNDOS)
+    headers = {**DEFAULT_POSTGREST_CLIENT_HEADERS, "apiKey": key, "Authorization": f"Bearer {key}"}
+    return _ClientePostgrestPool(f"{url.strip().rstrip('/')}/rest/v1", headers, TIMEOUT_SEGUNDOS, limites)
+
+
+# --- FILTROS POSTGREST ---
+def valor_postgrest(valor):
+    # Aspas protegem vírgulas, pontos e parênteses dentro de filtros or/and
+    texto = str(valor).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{texto}"'
+
+
+def adicionar_filtro_logico(query, operador, expressao):
+    # O postgrest-py fixado no requirements não expõe or_(); o parâmetro é montado direto
+    query.params = query.params.add(operador, f"({expressao})")
+    return query
+
+
+def pagina_keyset(query, coluna_ordem, coluna_id, posicao, tamanho, condicoes=()):
+    condicoes = list(condicoes)
+    if posicao:
+        valor = valor_postgrest(posicao[0])
+        # O gte redundante dá ao planejador um limite inferior no índice (coluna_ordem, coluna_id),
+        # que ele não tira do or(); sem ele, cada página varre o índice desde o começo
+        condicoes.append(f"{coluna_ordem}.gte.{valor}")
+        condicoes.append(f"or({coluna_ordem}.gt.{valor},and({coluna_ordem}.eq.{valor},{coluna_id}.gt.{posicao[1]}))")
+    if condicoes:
+        query = adicionar_filtro_logico(query, "and", ",".join(condicoes))
+    linhas = query.order(f"{coluna_ordem},{coluna_id}").limit(tamanho + 1).execute().data or []
+    return fatiar(linhas, coluna_ordem, coluna_id, tamanho)
+
+
+def _primeira(resposta):
+    return resposta.data[0] if resposta.data else None
+
+
+# --- REPOSITÓRIOS ---
+class _Repositorio:
+    tabela = None
+    coluna_id = None
+
+    def __init__(self, cliente):
+        self.cliente = cliente
+
+    def _consulta(self):
+        return self.cliente.from_(self.tabela)
+
+    def obter(self, id_registro, colunas="*"):
+        return _primeira(self._consulta().select(colunas).eq(self.coluna_id, id_registro).limit(1).execute())
+
+    def por_ids(self, ids, colunas="*"):
+        if not ids:
+            return []
+        return self._consulta().select(colunas).in_(self.coluna_id, list(ids)).execute().data or []
+
+    def inserir(self, dados):
+        resposta = self._consulta().insert(dados).execute()
+        return resposta.data if isinstance(dados, list) else _primeira(resposta)
+
+    def upsert(self, linhas, conflito):
+        # Insere ou atualiza em lote, resolvendo pela coluna única indicada
+        if not linhas:
+            return []
+        return self._consulta().upsert(linhas, on_conflict=conflito).execute().data or []
+
+    def atualizar(self, id_registro, dados):
+        return _primeira(self._consulta().update(dados).eq(self.coluna_id, id_registro).execute())
+
+    def excluir(self, id_registro):
+        self._consulta().delete().eq(self.coluna_id, id_registro).execute()
+
+    def pagina(self, colunas, posicao=None, tamanho=50):
+        return pagina_keyset(self._consulta().select(colunas), "nome", self.coluna_id, posicao, tamanho)
+
+    def percorrer(self, colunas, tamanho_lote=1000):
+        # Leitura da tabela inteira em lotes (keyset só no id, que é indexado)
+        ultimo = None
+        while True:
+            query = self._consulta().select(colunas)
+            if ultimo is not None:
+                query = query.gt(self.coluna_id, ultimo)
+            linhas = query.order(self.coluna_id).limit(tamanho_lote).execute().data or []
+            yield from linhas
+            if len(linhas) < tamanho_lote:
+                return
+            ultimo = linhas[-1][self.coluna_id]
+
+
+class _RepositorioHistorico(_Repositorio):
+    coluna_data = None
+    embutido = None
+
+    def recentes(self, limite):
+        return (self._consulta().select(f"*, {self.embutido}").order(self.coluna_data, desc=True)
+                .limit(limite).execute().data or [])
+
+    def _periodo(self, colunas, inicio, fim):
+        query = self._consulta().select(colunas)
+        if inicio:
+            query = query.gte(self.coluna_data, inicio)
+        if fim:
+            query = query.lt(self.coluna_data, fim)
+        return query
+
+    def percorrer_periodo(self, inicio=None, fim=None, tamanho_lote=1000):
+        posicao = None
+        while True:
+            query = self._periodo(f"*, {self.embutido}", inicio, fim)
+            linhas, posicao = pagina_keyset(query, self.coluna_data, self.coluna_id, posicao, tamanho_lote)
+            yield from linhas
+            if not posicao:
+                return
+
+
+class UsuariosSupabase(_Repositorio):
+    tabela, coluna_id = "tb_usuario", "id_usuario"
+
+    def por_email(self, email, colunas="*"):
+        return _primeira(self._consulta().select(colunas).eq("email", email).limit(1).execute())
+
+    def existe(self, cpf=None, email=None):
+        condicoes = [f"{coluna}.eq.{valor_postgrest(valor)}" for coluna, valor in (("cpf", cpf), ("email", email)) if valor]
+        if not condicoes:
+            return False
+        query = adicionar_filtro_logico(self._consulta().select(self.coluna_id), "or", ",".join(condicoes))
+        return bool(query.limit(1).execute().data)
+
+    def pagina(self, colunas, posicao=None, tamanho=50, termo=''):
+        condicoes = [f"nome.ilike.{valor_postgrest(f'*{termo}*')}"] if termo else []
+        return pagina_keyset(self._consulta().select(colunas), "nome", self.coluna_id, posicao, tamanho, condicoes)
+
+
+class ProdutosSupabase(_Repositorio):
+    tabela, coluna_id = "tb_produto", "id_produto"
+
+    def listar(self, colunas, apenas_ativos=False):
+        query = self._consulta().select(colunas)
+        if apenas_ativos:
+            query = query.eq("ativo", True)
+        return query.order("nome").execute().data or []
+
+    def em_alerta(self, limiar, validade_ate, colunas):
+        # Ativos com estoque baixo ou validade até a data (índices de sql/indices.sql)
+        query = self._consulta().select(colunas).eq("ativo", True)
+        return adicionar_filtro_logico(query, "or", f"estoque.lte.{int(limiar)},validade.lte.{validade_ate}").execute().data or []
+
+    def saldo(self, id_produto):
+        return self.obter(id_produto, "id_produto, nome, estoque")
+
+    def trocar_estoque(self, id_produto, esperado, novo):
+        # Compare-and-swap: só grava se o saldo ainda for o lido
+        resposta = self._consulta().update({"estoque": novo}).eq(self.coluna_id, id_produto).eq("estoque", esperado).execute()
+        return bool(resposta.data)
+
+    def ajustar_estoque(self, itens):
+        # Baixa condicional em lote, uma transação no banco (sql/ajustar_estoque.sql)
+        ajustes = [{"id_produto": id_produto, "quantidade": quantidade} for id_produto, quantidade in consolidar_ajustes(itens)]
+        try:
+            return self.cliente.rpc("ajustar_estoque", {"itens": ajustes}).execute().data
+        except APIError as e:
+            if e.code == "P0001":
+                id_produto = re.search(r"(\d+)\s*$", e.message or "")
+                raise SaldoInsuficiente(int(id_produto.group(1)) if id_produto else None)
+            raise
+
+    def desfazer_ajuste(self, itens):
+        # Devolve o que ajustar_estoque(itens) aplicou, sem condição de saldo (sql/ajustar_estoque.sql)
+        ajustes = [{"id_produto": id_produto, "quantidade": quantidade} for id_produto, quantidade in consolidar_ajustes(itens)]
+        return self.cliente.rpc("desfazer_ajuste_estoque", {"itens": ajustes}).execute().data
+
+
+class ClientesSupabase(_Repositorio):
+    tabela, coluna_id = "tb_cliente", "id_cliente"
+
+    def existe_cpf(self, cpf):
+        return bool(self._consulta().select(self.coluna_id).eq("cpf", cpf).limit(1).execute().data)
+
+    def por_cpfs(self, cpfs, colunas="id_cliente, cpf"):
+        if not cpfs:
+            return []
+        return self._consulta().select(colunas).in_("cpf", list(cpfs)).execute().data or []
+
+
+class VendasSupabase(_RepositorioHistorico):
+    tabela, coluna_id, coluna_data, embutido = "tb_venda", "id_venda", "data_venda", "tb_usuario(nome)"
+
+    def inserir_itens(self, itens):
+        return self.cliente.from_("tb_venda_item").insert(itens).execute().data
+
+    def excluir(self, id_venda):
+        self.cliente.from_("tb_venda_item").delete().eq("id_venda", id_venda).execute()
+        super().excluir(id_venda)
+
+    def contar_itens_do_produto(self, id_produto):
+        return self.cliente.from_("tb_venda_item").select("id_venda_item", count='exact').eq("id_produto", id_produto).limit(1).execute().count or 0
+
+    def lotes_com_itens(self, inicio=None, fim=None, tamanho_lote=1000):
+        # Um lote de vendas do período por consulta, com os itens embutidos em "tb_venda_item"
+        posicao = None
+        while True:
+            query = self._periodo("id_venda, id_usuario, data_venda, tb_venda_item(id_produto, quantidade, preco_unitario)", inicio, fim)
+            vendas, posicao = pagina_keyset(query, self.coluna_data, self.coluna_id, posicao, tamanho_lote)
+            if vendas:
+                yield vendas
+            if not posicao:
+                return
+
+
+class MovimentosSupabase(_RepositorioHistorico):
+    tabela, coluna_id, coluna_data, embutido = "tb_estoque_mov", "id_mov", "criado_em", "tb_produto(nome)"
+
+    def contar_do_produto(self, id_produto):
+        return self._consulta().select(self.coluna_id, count='exact').eq("id_produto", id_produto).limit(1).execute().count or 0
+
+
+class InventariosSupabase(_RepositorioHistorico):
+    tabela, coluna_id, coluna_data, embutido = "tb_inventario", "id_inventario", "criado_em", "tb_usuario(nome)"
+
+
+class VersoesSupabase(_Repositorio):
+    # Uma linha por tabela, mantida pelos gatilhos de sql/versoes.sql
+    tabela, coluna_id = "tb_versao", "tabela"
+
+    def incrementar(self, nome):
+        # Contador avulso (geração dos caches em memória dos workers), em sql/versoes.sql
+        return self.cliente.rpc("incrementar_geracao", {"nome": nome}).execute().data
+
+
+class BackendSupabase:
+    nome = "supabase"
+
+    def __init__(self, url, key):
+        self.cliente = criar_cliente_postgrest(url, key)
+        self.usuarios = UsuariosSupabase(self.cliente)
+        self.produtos = ProdutosSupabase(self.cliente)
+        self.clientes = ClientesSupabase(self.cliente)
+        self.vendas = VendasSupabase(self.cliente)
+        self.movimentos = MovimentosSupabase(self.cliente)
+        self.inventarios = InventariosSupabase(self.cliente)
+        self.versoes = VersoesSupabase(self.cliente)
+
+    def fechar(self):
+        self.cliente.aclose()
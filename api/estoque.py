@@ -0,0 +1,62 @@
+import logging
+import os
+import random
+import time
+
+# --- MOVIMENTAÇÃO DE ESTOQUE SEM PERDA DE ATUALIZAÇÃO ---
+# A gravação é condicional ao saldo lido (compare-and-swap): se outro worker alterou
+# o estoque entre a leitura e a escrita, o update não afeta nenhuma linha e a
+# operação é refeita com o saldo novo. Não há trava global entre os workers.
+TENTATIVAS_CAS = int(os.getenv("ESTOQUE_TENTATIVAS_CAS", 10))
+TIPOS_MOVIMENTO = ("ENTRADA", "SAIDA")
+
+logger = logging.getLogger(__name__)
+
+
+class ProdutoNaoEncontrado(Exception):
+    pass
+
+
+class EstoqueInsuficiente(Exception):
+    def __init__(self, produto):
+        super().__init__(f"Estoque insuficiente para '{produto['nome']}'. Disponível: {produto['estoque']}")
+        self.produto = produto
+
+
+class ConflitoEstoque(Exception):
+    pass
+
+
+def movimentar_estoque(db, id_produto, tipo_mov, quantidade, motivo, tentativas=TENTATIVAS_CAS):
+    if tipo_mov not in TIPOS_MOVIMENTO:
+        raise ValueError(f"Tipo de movimento inválido: {tipo_mov}")
+    if quantidade <= 0:
+        raise ValueError("A quantidade deve ser maior que zero.")
+    delta = quantidade if tipo_mov == "ENTRADA" else -quantidade
+
+    for tentativa in range(tentativas):
+        produto = db.produtos.saldo(id_produto)
+        if not produto:
+            raise ProdutoNaoEncontrado("Produto não encontrado.")
+        novo_estoque = produto['estoque'] + delta
+        if novo_estoque < 0:
+            raise EstoqueInsuficiente(produto)
+
+        if db.produtos.trocar_estoque(id_produto, produto['estoque'], novo_estoque):
+            try:
+                db.movimentos.inserir({"id_produto": id_produto, "tipo_mov": tipo_mov, "quantidade": quantidade, "motivo": motivo})
+            except Exception:
+                # Sem o registro no histórico o saldo não pode ficar alterado. A devolução não
+                # depende de saldo (o produto pode ter saído nesse meio-tempo) e, se falhar,
+                # fica no log: quem chamou recebe o erro original
+                try:
+                    db.produtos.desfazer_ajuste([{"id_produto": id_produto, "quantidade": -delta}])
+                except Exception:
+                    logger.exception("Estoque do produto %s alterado em %+d sem movimento registrado", id_produto, delta)
+                raise
+            return novo_estoque
+
+        # Backoff exponencial com jitter para os concorrentes não colidirem de novo
+        time.sleep(random.uniform(0, 0.002 * (2 ** tentativa)))
+
+    raise ConflitoEstoque("Muitas movimentações simultâneas neste produto; tente novamente.")
@@ -0,0 +1,69 @@
+import csv
+import datetime
+import io
+import json
+import os
+
+# --- EXPORTAÇÃO EM STREAMING (CSV / NDJSON) ---
+# Os repositórios leem em lotes de tamanho fixo (keyset em data, id) e as linhas são
+# escritas na resposta conforme chegam: a memória não cresce com o período exportado e o
+# primeiro byte sai assim que o primeiro lote é lido.
+TAMANHO_LOTE_EXPORTACAO = int(os.getenv("EXPORTACAO_TAMANHO_LOTE", 1000))
+TAMANHO_BUFFER = 64 * 1024
+FORMATOS = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+class FiltroInvalido(Exception):
+    pass
+
+
+def intervalo_datas(inicio, fim):
+    # fim é inclusivo no formulário; no banco vira "< dia seguinte"
+    try:
+        inicio = datetime.date.fromisoformat(inicio).isoformat() if inicio else None
+        fim = (datetime.date.fromisoformat(fim) + datetime.timedelta(days=1)).isoformat() if fim else None
+    except ValueError:
+        raise FiltroInvalido("Datas devem estar no formato AAAA-MM-DD.")
+    if inicio and fim and inicio >= fim:
+        raise FiltroInvalido("A data inicial deve ser anterior à final.")
+    return inicio, fim
+
+
+def _achatar(linha, colunas):
+    # colunas: pares (nome na saída, caminho); "tabela.campo" vem de recurso embutido, ex.: tb_produto(nome)
+    valores = {}
+    for nome, caminho in colunas:
+        if '.' in caminho:
+            tabela, campo = caminho.split('.', 1)
+            valores[nome] = (linha.get(tabela) or {}).get(campo)
+        else:
+            valores[nome] = linha.get(caminho)
+    return valores
+
+
+def gerar_csv(linhas, colunas):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow([nome for nome, _ in colunas])
+    for linha in linhas:
+        escritor.writerow(list(_achatar(linha, colunas).values()))
+        if buffer.tell() >= TAMANHO_BUFFER:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def gerar_ndjson(linhas, colunas):
+    partes, tamanho = [], 0
+    for linha in linhas:
+        parte = json.dumps(_achatar(linha, colunas), ensure_ascii=False, default=str) + "\n"
+        partes.append(parte)
+        tamanho += len(parte)
+        if tamanho >= TAMANHO_BUFFER:
+            yield "".join(partes)
+            partes, tamanho = [], 0
+    yield "".join(partes)
+
+
+GERADORES = {"csv": gerar_csv, "ndjson": gerar_ndjson}
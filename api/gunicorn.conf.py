@@ -0,0 +1,35 @@
+import os
+
+# --- GUNICORN (RENDER) ---
+# Start command: gunicorn app:app (a partir de api/, que carrega este arquivo sozinho).
+# Com preload, o app é importado uma vez no processo mestre e os workers nascem do fork
+# já com templates, rotas e módulos prontos. O backend (cliente HTTP do Supabase ou
+# conexão SQLite) nunca atravessa o fork: cada worker monta o seu ao iniciar.
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") != "0"
+wsgi_app = "app:app"
+accesslog = "-"
+# No Render toda requisição chega pelo proxy deles, que acrescenta o IP do cliente ao
+# X-Forwarded-For. Sem confiar nesse salto, todos os usuários dividiriam o limite de
+# login do IP do proxy. Lido pelo app ao ser importado, depois deste arquivo
+os.environ.setdefault("PROXY_CONFIAVEL", "1")
+
+
+def when_ready(server):
+    # Com preload, o módulo do cliente Supabase (httpx/postgrest, a parte mais lenta do
+    # import) é carregado uma vez no mestre; os workers só montam o cliente
+    if preload_app and os.getenv("ERP_BACKEND", "supabase").lower() == "supabase":
+        import dados.supabase_backend  # noqa: F401
+
+
+def post_worker_init(worker):
+    # Monta o backend antes da primeira requisição chegar; se faltar configuração, a
+    # primeira rota que usar o banco mostra o erro e /saude/pronto responde 503
+    from app import db
+    try:
+        db.iniciar()
+    except Exception as e:
+        worker.log.warning("Backend não iniciado no worker %s: %s", worker.pid, e)
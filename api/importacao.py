@@ -0,0 +1,261 @@
+import csv
+import datetime
+import io
+import os
+import re
+
+from busca import normalizar
+from dados import em_lotes
+
+# --- IMPORTAÇÃO EM LOTE (CSV) DE PRODUTOS E CLIENTES ---
+# O arquivo é lido como stream e processado em lotes: cada lote é validado em memória,
+# confere duplicados com uma consulta só (CPFs ou ids do lote inteiro) e é gravado com
+# um insert/upsert em lote. Linhas inválidas entram no relatório sem interromper o resto.
+TAMANHO_LOTE_IMPORTACAO = int(os.getenv("IMPORTACAO_LOTE", 500))
+IMPORTACAO_TAMANHO_MAXIMO_MB = int(os.getenv("IMPORTACAO_TAMANHO_MAXIMO_MB", 20))
+ERROS_EXIBIDOS = 200
+MODOS = ("atualizar", "ignorar")
+
+
+class ImportacaoInvalida(Exception):
+    pass
+
+
+class LinhaInvalida(Exception):
+    pass
+
+
+class Relatorio:
+    def __init__(self):
+        self.linhas = 0
+        self.inseridos = 0
+        self.atualizados = 0
+        self.ignorados = 0
+        self.total_erros = 0
+        self.erros = []
+
+    def erro(self, numero_linha, mensagem):
+        self.total_erros += 1
+        if len(self.erros) < ERROS_EXIBIDOS:
+            self.erros.append((numero_linha, mensagem))
+
+
+# --- LEITURA DO CSV ---
+def _codificacao(stream):
+    # Planilhas salvas pelo Excel em português costumam vir em cp1252 em vez de UTF-8
+    amostra = stream.read(65536)
+    stream.seek(0)
+    try:
+        amostra.decode('utf-8')
+    except UnicodeDecodeError as e:
+        if e.start < len(amostra) - 3:  # erro no meio da amostra, não um caractere cortado no fim
+            return 'cp1252'
+    return 'utf-8-sig'
+
+
+def ler_csv(stream, obrigatorias):
+    texto = io.TextIOWrapper(stream, encoding=_codificacao(stream), newline='')
+    primeira = texto.readline()
+    if not primeira.strip():
+        raise ImportacaoInvalida("O arquivo está vazio.")
+    delimitador = ';' if primeira.count(';') > primeira.count(',') else ','
+    # "Preço" -> preco, "E-mail" -> email, "ID Produto" -> id_produto
+    cabecalho = [normalizar(coluna).replace('-', '').replace(' ', '_')
+                 for coluna in next(csv.reader([primeira], delimiter=delimitador))]
+    faltando = [coluna for coluna in obrigatorias if coluna not in cabecalho]
+    if faltando:
+        raise ImportacaoInvalida(f"Colunas obrigatórias ausentes no cabeçalho: {', '.join(faltando)}.")
+
+    def linhas():
+        leitor = csv.reader(texto, delimiter=delimitador)
+        for valores in leitor:
+            if any(valor.strip() for valor in valores):
+                # line_num conta a partir da linha após o cabeçalho
+                yield leitor.line_num + 1, dict(zip(cabecalho, valores))
+    return linhas()
+
+
+# --- NORMALIZAÇÃO E VALIDAÇÃO ---
+def _texto(valor):
+    valor = (valor or '').strip()
+    return valor or None
+
+
+def limpar_cpf(valor):
+    return re.sub(r'\D', '', valor or '')
+
+
+def _preco(valor):
+    valor = (valor or '').strip().replace('R$', '').replace(' ', '')
+    if not valor:
+        raise LinhaInvalida("Preço não informado.")
+    if ',' in valor:
+        valor = valor.replace('.', '').replace(',', '.')  # 1.234,56
+    try:
+        preco = round(float(valor), 2)
+    except ValueError:
+        raise LinhaInvalida(f"Preço inválido: {valor}.")
+    if preco < 0:
+        raise LinhaInvalida("O preço não pode ser negativo.")
+    return preco
+
+
+def _validade(valor):
+    valor = (valor or '').strip()
+    if not valor:
+        return None
+    for formato in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.datetime.strptime(valor, formato).date().isoformat()
+        except ValueError:
+            pass
+    raise LinhaInvalida(f"Validade inválida: {valor} (use AAAA-MM-DD ou DD/MM/AAAA).")
+
+
+def validar_cliente(linha):
+    nome = _texto(linha.get('nome'))
+    if not nome:
+        raise LinhaInvalida("Nome não informado.")
+    cpf = limpar_cpf(linha.get('cpf'))
+    if len(cpf) != 11:
+        raise LinhaInvalida(f"CPF inválido: {linha.get('cpf') or 'vazio'}.")
+    cliente = {"nome": nome, "cpf": cpf}
+    # Colunas opcionais ausentes do arquivo não apagam o que já está cadastrado
+    if 'email' in linha:
+        cliente["email"] = _texto(linha['email'])
+        if cliente["email"] and '@' not in cliente["email"]:
+            raise LinhaInvalida(f"Email inválido: {cliente['email']}.")
+    return cliente
+
+
+def validar_produto(linha):
+    nome = _texto(linha.get('nome'))
+    if not nome:
+        raise LinhaInvalida("Nome não informado.")
+    produto = {"nome": nome, "preco": _preco(linha.get('preco'))}
+    if 'marca' in linha:
+        produto["marca"] = _texto(linha['marca'])
+    if 'validade' in linha:
+        produto["validade"] = _validade(linha['validade'])
+    id_produto = _texto(linha.get('id_produto'))
+    if id_produto:
+        if not id_produto.isdigit():
+            raise LinhaInvalida(f"id_produto inválido: {id_produto}.")
+        produto["id_produto"] = int(id_produto)
+    return produto
+
+
+def _validar_lote(lote, validar, chave, vistos, relatorio):
+    validos = []
+    for numero_linha, linha in lote:
+        relatorio.linhas += 1
+        try:
+            registro = validar(linha)
+        except LinhaInvalida as e:
+            relatorio.erro(numero_linha, str(e))
+            continue
+        valor_chave = chave(registro)
+        if valor_chave is not None:
+            if valor_chave in vistos:
+                relatorio.erro(numero_linha, f"Registro repetido no arquivo (mesmo da linha {vistos[valor_chave]}).")
+                continue
+            vistos[valor_chave] = numero_linha
+        validos.append((numero_linha, registro))
+    return validos
+
+
+def _gravar(relatorio, numeros_linhas, operacao):
+    # Falha no banco invalida só as linhas do lote
+    try:
+        return operacao()
+    except Exception as e:
+        for numero_linha in numeros_linhas:
+            relatorio.erro(numero_linha, f"Falha no banco ao processar o lote: {e}")
+        return None
+
+
+# --- IMPORTADORES ---
+def importar_clientes(db, linhas, modo="atualizar", ao_gravar=None):
+    relatorio, vistos = Relatorio(), {}
+    for lote in em_lotes(linhas, TAMANHO_LOTE_IMPORTACAO):
+        validos = _validar_lote(lote, validar_cliente, lambda cliente: cliente["cpf"], vistos, relatorio)
+        if not validos:
+            continue
+        # Uma consulta por lote para saber quais CPFs já existem
+        numeros = [numero for numero, _ in validos]
+        existentes = _gravar(relatorio, numeros, lambda: {
+            cliente["cpf"] for cliente in db.clientes.por_cpfs([cliente["cpf"] for _, cliente in validos])})
+        if existentes is None:
+            continue
+        novos = [cliente for _, cliente in validos if cliente["cpf"] not in existentes]
+        repetidos = [cliente for _, cliente in validos if cliente["cpf"] in existentes]
+        if modo == "ignorar":
+            relatorio.ignorados += len(repetidos)
+            repetidos = []
+        gravados = _gravar(relatorio, numeros, lambda: db.clientes.upsert(novos + repetidos, "cpf"))
+        if gravados is None:
+            continue
+        relatorio.inseridos += len(novos)
+        relatorio.atualizados += len(repetidos)
+        if ao_gravar:
+            ao_gravar(gravados)
+    return relatorio
+
+
+def _chave_produto(produto):
+    # Sem id, o mesmo nome + marca duas vezes no arquivo é tratado como repetido
+    return produto.get("id_produto") or (normalizar(produto["nome"]), normalizar(produto.get("marca")))
+
+
+def _produtos_por_nome(db):
+    # Produtos ativos já cadastrados, por nome + marca normalizados
+    return {_chave_produto({"nome": produto["nome"], "marca": produto.get("marca")}): produto["id_produto"]
+            for produto in db.produtos.percorrer("id_produto, nome, marca, ativo") if produto.get("ativo", True) is not False}
+
+
+def importar_produtos(db, linhas, modo="atualizar", ao_gravar=None):
+    # Linhas com id_produto atualizam o produto (sem mexer no estoque). Sem id, a linha é
+    # comparada pelo nome + marca com os produtos ativos: se já existe, vale como se
+    # trouxesse o id dele (reenviar a mesma planilha não duplica o catálogo); senão, é nova
+    relatorio, vistos, por_nome = Relatorio(), {}, None
+    for lote in em_lotes(linhas, TAMANHO_LOTE_IMPORTACAO):
+        validos = _validar_lote(lote, validar_produto, _chave_produto, vistos, relatorio)
+        if por_nome is None and any("id_produto" not in produto for _, produto in validos):
+            # Carregado uma vez por importação, só se alguma linha vier sem id
+            por_nome = _gravar(relatorio, [numero for numero, _ in validos], lambda: _produtos_por_nome(db))
+            if por_nome is None:
+                continue
+        for indice, (numero_linha, produto) in enumerate(validos):
+            if "id_produto" not in produto and _chave_produto(produto) in por_nome:
+                validos[indice] = (numero_linha, {**produto, "id_produto": por_nome[_chave_produto(produto)]})
+        ids = [produto["id_produto"] for _, produto in validos if "id_produto" in produto]
+        existentes = _gravar(relatorio, [numero for numero, _ in validos],
+                             lambda: {produto["id_produto"] for produto in db.produtos.por_ids(ids, "id_produto")})
+        if existentes is None:
+            continue
+        novos, atualizar = [], []
+        for numero_linha, produto in validos:
+            if "id_produto" not in produto:
+                novos.append((numero_linha, {**produto, "estoque": 0}))
+            elif produto["id_produto"] not in existentes:
+                relatorio.erro(numero_linha, f"Produto {produto['id_produto']} não existe.")
+            elif modo == "ignorar":
+                relatorio.ignorados += 1
+            else:
+                atualizar.append((numero_linha, produto))
+
+        if novos:
+            gravados = _gravar(relatorio, [numero for numero, _ in novos],
+                               lambda: db.produtos.inserir([produto for _, produto in novos]))
+            if gravados is not None:
+                relatorio.inseridos += len(novos)
+                if ao_gravar:
+                    ao_gravar(gravados)
+        if atualizar:
+            gravados = _gravar(relatorio, [numero for numero, _ in atualizar],
+                               lambda: db.produtos.upsert([produto for _, produto in atualizar], "id_produto"))
+            if gravados is not None:
+                relatorio.atualizados += len(atualizar)
+                if ao_gravar:
+                    ao_gravar(gravados)
+    return relatorio
@@ -0,0 +1,128 @@
+import logging
+
+from dados import SaldoInsuficiente, em_lotes
+from importacao import TAMANHO_LOTE_IMPORTACAO, ImportacaoInvalida, Relatorio
+
+# --- INVENTÁRIO (CONTAGEM FÍSICA EM LOTE) ---
+# O operador envia as quantidades contadas de muitos produtos de uma vez. Os saldos
+# atuais são lidos em lote, as diferenças são calculadas em memória e gravadas por
+# lote com um ajustar_estoque (delta assinado, tudo ou nada no banco) e um insert de
+# movimentos ENTRADA/SAIDA ligados ao inventário (id_inventario, e o motivo
+# "Inventário #<id>" no histórico). Por ser relativo, o ajuste não apaga vendas feitas
+# durante o envio.
+COLUNAS_INVENTARIO = ["id_produto", "quantidade"]
+
+logger = logging.getLogger(__name__)
+
+
+class InventarioInvalido(ImportacaoInvalida):
+    pass
+
+
+class RelatorioInventario(Relatorio):
+    def __init__(self):
+        super().__init__()
+        self.id_inventario = None
+        self.contados = 0
+        self.ajustados = 0
+        self.sem_diferenca = 0
+        self.entradas = 0
+        self.saidas = 0
+
+
+def _inteiro(valor, mensagem):
+    valor = (valor or '').strip()
+    if not valor.isdigit():
+        raise ValueError(f"{mensagem}: {valor or 'vazio'}.")
+    return int(valor)
+
+
+def ler_contagens(linhas, relatorio):
+    # {id_produto: [quantidade, primeira linha]}; o mesmo produto contado em linhas
+    # diferentes (prateleira e depósito, por exemplo) tem as quantidades somadas
+    contagens = {}
+    for numero_linha, linha in linhas:
+        relatorio.linhas += 1
+        try:
+            id_produto = _inteiro(linha.get('id_produto'), "id_produto inválido")
+            quantidade = _inteiro(linha.get('quantidade'), "Quantidade inválida")
+        except ValueError as e:
+            relatorio.erro(numero_linha, str(e))
+            continue
+        if id_produto in contagens:
+            contagens[id_produto][0] += quantidade
+        else:
+            contagens[id_produto] = [quantidade, numero_linha]
+    return contagens
+
+
+def _aplicar_lote(db, ajustes, id_inventario, linha_de, relatorio):
+    # ajustes: {id_produto: diferença (contado - sistema)}. Se o saldo de um produto caiu
+    # entre a leitura e a gravação a ponto de ficar negativo, ele sai do lote e o resto é refeito
+    while ajustes:
+        baixa = [{"id_produto": i, "quantidade": -d} for i, d in sorted(ajustes.items())]
+        try:
+            saldos = db.produtos.ajustar_estoque(baixa)
+        except SaldoInsuficiente as e:
+            if e.id_produto not in ajustes:
+                raise
+            relatorio.erro(linha_de[e.id_produto], f"O estoque do produto {e.id_produto} mudou durante o inventário; conte de novo.")
+            del ajustes[e.id_produto]
+            continue
+        try:
+            db.movimentos.inserir([
+                {"id_produto": i, "tipo_mov": "ENTRADA" if d > 0 else "SAIDA", "quantidade": abs(d),
+                 "motivo": f"Inventário #{id_inventario}", "id_inventario": id_inventario}
+                for i, d in sorted(ajustes.items())
+            ])
+        except Exception:
+            # Sem os movimentos no histórico o saldo do lote não pode ficar alterado (devolução sem
+            # condição de saldo; se falhar, fica no log e sobe o erro original)
+            try:
+                db.produtos.desfazer_ajuste(baixa)
+            except Exception:
+                logger.exception("Inventário #%s: estoque alterado sem movimentos registrados: %s", id_inventario, baixa)
+            raise
+        return {linha['id_produto']: linha['estoque'] for linha in saldos or []}
+    return {}
+
+
+def aplicar_inventario(db, id_usuario, linhas, observacao=None, ao_gravar=None):
+    relatorio = RelatorioInventario()
+    contagens = ler_contagens(linhas, relatorio)
+    if not contagens:
+        raise InventarioInvalido("Nenhuma contagem válida no arquivo.")
+
+    inventario = db.inventarios.inserir({"id_usuario": id_usuario, "observacao": observacao,
+                                         "itens_contados": len(contagens), "itens_ajustados": 0})
+    relatorio.id_inventario = inventario['id_inventario']
+    linha_de = {id_produto: numero_linha for id_produto, (_, numero_linha) in contagens.items()}
+
+    for lote in em_lotes(sorted(contagens), TAMANHO_LOTE_IMPORTACAO):
+        try:
+            atuais = {p['id_produto']: p['estoque'] for p in db.produtos.por_ids(lote, "id_produto, estoque")}
+            diferencas = {id_produto: contagens[id_produto][0] - (atuais[id_produto] or 0)
+                          for id_produto in lote if id_produto in atuais}
+            ajustes = {id_produto: diferenca for id_produto, diferenca in diferencas.items() if diferenca}
+            saldos = _aplicar_lote(db, ajustes, relatorio.id_inventario, linha_de, relatorio)
+        except Exception as e:
+            # Falha no banco invalida só as linhas do lote
+            for id_produto in lote:
+                relatorio.erro(linha_de[id_produto], f"Falha no banco ao processar o lote: {e}")
+            continue
+        for id_produto in lote:
+            if id_produto not in atuais:
+                relatorio.erro(linha_de[id_produto], f"Produto {id_produto} não existe.")
+        # ajustes fica só com os produtos gravados (os recusados por saldo já estão nos erros)
+        sem_diferenca = len(diferencas) - sum(1 for diferenca in diferencas.values() if diferenca)
+        relatorio.sem_diferenca += sem_diferenca
+        relatorio.ajustados += len(ajustes)
+        relatorio.contados += sem_diferenca + len(ajustes)
+        relatorio.entradas += sum(d for d in ajustes.values() if d > 0)
+        relatorio.saidas += sum(-d for d in ajustes.values() if d < 0)
+        if ao_gravar and saldos:
+            ao_gravar(saldos)
+
+    db.inventarios.atualizar(relatorio.id_inventario, {"itens_contados": relatorio.contados,
+                                                       "itens_ajustados": relatorio.ajustados})
+    return relatorio
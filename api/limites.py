@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# --- LIMITE DE TENTATIVAS DE LOGIN (TOKEN BUCKET EM MEMÓRIA) ---
+# Cada conta e cada IP têm um balde de fichas. Toda tentativa de login gasta uma ficha
+# antes do bcrypt rodar e o login certo devolve a ficha; sem fichas, a tentativa é
+# recusada sem gastar CPU com hash. As fichas voltam aos poucos. Os baldes são por
+# processo e ficam limitados a BALDES_MAXIMO entradas (os mais antigos saem primeiro).
+LOGIN_TENTATIVAS_CONTA = int(os.getenv("LOGIN_TENTATIVAS_CONTA", 5))
+LOGIN_TENTATIVAS_IP = int(os.getenv("LOGIN_TENTATIVAS_IP", 20))
+LOGIN_RECARGA_SEGUNDOS = float(os.getenv("LOGIN_RECARGA_SEGUNDOS", 60))
+BALDES_MAXIMO = 100000
+
+
+class LimiteExcedido(Exception):
+    def __init__(self, espera):
+        super().__init__(f"Muitas tentativas de login. Tente novamente em {int(espera) + 1} segundos.")
+        self.espera = espera
+
+
+class BaldesDeFichas:
+    def __init__(self, capacidade, segundos_por_ficha, maximo=BALDES_MAXIMO):
+        self.capacidade = capacidade
+        self.segundos_por_ficha = segundos_por_ficha
+        self.maximo = maximo
+        self._baldes = OrderedDict()  # chave -> [fichas, instante da última recarga]
+        self._trava = threading.Lock()
+
+    def _recarregar(self, chave, agora):
+        balde = self._baldes.get(chave)
+        if balde is None:
+            balde = self._baldes[chave] = [float(self.capacidade), agora]
+            if len(self._baldes) > self.maximo:
+                self._baldes.popitem(last=False)
+        else:
+            balde[0] = min(self.capacidade, balde[0] + (agora - balde[1]) / self.segundos_por_ficha)
+            balde[1] = agora
+            self._baldes.move_to_end(chave)
+        return balde
+
+    def espera(self, chave, agora=None):
+        # Segundos até haver uma ficha inteira (0 se já houver)
+        with self._trava:
+            balde = self._recarregar(chave, agora if agora is not None else time.monotonic())
+            return 0.0 if balde[0] >= 1 else (1 - balde[0]) * self.segundos_por_ficha
+
+    def consumir(self, chave, agora=None):
+        with self._trava:
+            self._recarregar(chave, agora if agora is not None else time.monotonic())[0] -= 1
+
+    def devolver(self, chave):
+        with self._trava:
+            balde = self._baldes.get(chave)
+            if balde is not None:
+                balde[0] = min(self.capacidade, balde[0] + 1)
+
+
+class LimitadorLogin:
+    def __init__(self, tentativas_conta=LOGIN_TENTATIVAS_CONTA, tentativas_ip=LOGIN_TENTATIVAS_IP,
+                 recarga=LOGIN_RECARGA_SEGUNDOS):
+        # A recarga é o tempo para o balde inteiro voltar a encher
+        self.contas = BaldesDeFichas(tentativas_conta, recarga / tentativas_conta)
+        self.ips = BaldesDeFichas(tentativas_ip, recarga / tentativas_ip)
+        self._trava = threading.Lock()
+
+    def reservar(self, email, ip):
+        # Checa e consome as duas fichas juntas, para requisições simultâneas não passarem do limite
+        conta = (email or '').strip().lower()
+        with self._trava:
+            espera = max(self.contas.espera(conta), self.ips.espera(ip))
+            if espera > 0:
+                raise LimiteExcedido(espera)
+            self.contas.consumir(conta)
+            self.ips.consumir(ip)
+
+    def devolver(self, email, ip):
+        # Login certo (ou tentativa que nem foi verificada) não conta para o limite
+        self.contas.devolver((email or '').strip().lower())
+        self.ips.devolver(ip)
@@ -0,0 +1,249 @@
+import inspect
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+
+from dados import REPOSITORIOS
+
+logger = logging.getLogger(__name__)
+
+# --- INSTRUMENTAÇÃO POR REQUISIÇÃO ---
+# Para cada requisição: quantas consultas foram ao banco e quanto tempo cada uma levou,
+# tempo de renderização dos templates, trechos medidos com medir() (ex.: bcrypt) e o
+# tempo total. Sai no cabeçalho Server-Timing, no log de requisições lentas e nos
+# histogramas por rota servidos em formato Prometheus. O custo é um perf_counter e um
+# append por consulta; as métricas são por processo (cada worker do gunicorn tem as suas).
+METRICAS_ATIVAS = os.getenv("METRICAS_ATIVAS", "1") != "0"
+LENTO_MS = float(os.getenv("METRICAS_LENTO_MS", 500))
+SERVER_TIMING_MAX_CONSULTAS = 8
+
+BALDES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BALDES_CONSULTAS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class _Medicao:
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        # list.append é atômico: consultas disparadas em outras threads da mesma requisição podem registrar aqui
+        self.consultas = []
+        self.trechos = []
+
+
+def _atual():
+    if not has_request_context():
+        return None
+    return g.get('_medicao')
+
+
+@contextmanager
+def medir(nome):
+    medicao = _atual()
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        if medicao is not None:
+            medicao.trechos.append((nome, time.perf_counter() - inicio))
+
+
+# --- BACKEND MEDIDO ---
+class _RepositorioMedido:
+    def __init__(self, nome, repositorio):
+        self._nome = nome
+        self._repositorio = repositorio
+
+    def __getattr__(self, atributo):
+        metodo = getattr(self._repositorio, atributo)
+        if not callable(metodo):
+            return metodo
+        consulta = f"{self._nome}.{atributo}"
+
+        @wraps(metodo)  # inspect.signature enxerga os parâmetros do método original
+        def chamar(*args, **kwargs):
+            medicao = _atual()
+            if medicao is None:
+                return metodo(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                resultado = metodo(*args, **kwargs)
+            except Exception:
+                medicao.consultas.append((consulta, time.perf_counter() - inicio))
+                raise
+            if inspect.isgenerator(resultado):
+                return _gerador_medido(resultado, consulta, medicao)
+            medicao.consultas.append((consulta, time.perf_counter() - inicio))
+            return resultado
+        return chamar
+
+
+def _gerador_medido(gerador, consulta, medicao):
+    # Em percorrer, percorrer_periodo e lotes_com_itens as consultas acontecem a cada next(),
+    # não na chamada. Cada lote (lista) entregue conta como uma consulta; o tempo das linhas
+    # avulsas e do fim da leitura é somado e registrado como mais uma ao terminar
+    pendente = 0.0
+    try:
+        while True:
+            inicio = time.perf_counter()
+            try:
+                item = next(gerador)
+            except StopIteration:
+                pendente += time.perf_counter() - inicio
+                return
+            duracao = time.perf_counter() - inicio
+            if isinstance(item, list):
+                medicao.consultas.append((consulta, duracao))
+            else:
+                pendente += duracao
+            yield item
+    finally:
+        gerador.close()
+        if pendente:
+            medicao.consultas.append((consulta, pendente))
+
+
+class BackendMedido:
+    def __init__(self, backend, repositorios=REPOSITORIOS):
+        self.backend = backend
+        self.nome = backend.nome
+        for nome in repositorios:
+            setattr(self, nome, _RepositorioMedido(nome, getattr(backend, nome)))
+
+    def fechar(self):
+        self.backend.fechar()
+
+
+def medir_backend(backend):
+    return BackendMedido(backend) if METRICAS_ATIVAS else backend
+
+
+# --- HISTOGRAMAS (FORMATO DE TEXTO DO PROMETHEUS) ---
+class Histograma:
+    def __init__(self, nome, ajuda, rotulos, baldes):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = rotulos
+        self.baldes = baldes
+        self._series = {}
+        self._trava = threading.Lock()
+
+    def observar(self, valores_rotulos, valor):
+        indice = bisect_left(self.baldes, valor)
+        with self._trava:
+            serie = self._series.get(valores_rotulos)
+            if serie is None:
+                serie = self._series[valores_rotulos] = [[0] * (len(self.baldes) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        with self._trava:
+            series = [(rotulos, list(contagens), soma) for rotulos, (contagens, soma) in sorted(self._series.items())]
+        for valores_rotulos, contagens, soma in series:
+            rotulos = ",".join(f'{nome}="{_escapar(valor)}"' for nome, valor in zip(self.rotulos, valores_rotulos))
+            acumulado = 0
+            for limite, contagem in zip((*self.baldes, "+Inf"), contagens):
+                acumulado += contagem
+                linhas.append(f'{self.nome}_bucket{{{rotulos},le="{limite}"}} {acumulado}')
+            linhas.append(f"{self.nome}_sum{{{rotulos}}} {soma:.6f}")
+            linhas.append(f"{self.nome}_count{{{rotulos}}} {acumulado}")
+        return linhas
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+duracao_requisicao = Histograma("erp_requisicao_segundos", "Tempo total da requisição por rota.",
+                                ("rota", "metodo", "status"), BALDES_SEGUNDOS)
+duracao_banco = Histograma("erp_requisicao_banco_segundos", "Tempo gasto em consultas ao banco por requisição.",
+                           ("rota",), BALDES_SEGUNDOS)
+consultas_requisicao = Histograma("erp_requisicao_consultas", "Consultas ao banco por requisição.",
+                                  ("rota",), BALDES_CONSULTAS)
+duracao_render = Histograma("erp_requisicao_render_segundos", "Tempo de renderização de templates por requisição.",
+                            ("rota",), BALDES_SEGUNDOS)
+duracao_consulta = Histograma("erp_consulta_segundos", "Duração de cada consulta, por método do repositório.",
+                              ("consulta",), BALDES_SEGUNDOS)
+duracao_trecho = Histograma("erp_trecho_segundos", "Duração dos trechos medidos explicitamente (ex.: bcrypt).",
+                            ("trecho",), BALDES_SEGUNDOS)
+HISTOGRAMAS = (duracao_requisicao, duracao_banco, consultas_requisicao, duracao_render, duracao_consulta, duracao_trecho)
+
+
+def exportar_prometheus():
+    linhas = []
+    for histograma in HISTOGRAMAS:
+        linhas.extend(histograma.exportar())
+    return "\n".join(linhas) + "\n"
+
+
+# --- MIDDLEWARE ---
+def _inicio_render(sender, template, context, **extra):
+    medicao = _atual()
+    if medicao is not None:
+        g.setdefault('_renders', []).append(time.perf_counter())
+
+
+def _fim_render(sender, template, context, **extra):
+    medicao = _atual()
+    pilha = g.get('_renders') if medicao is not None else None
+    if pilha:
+        medicao.trechos.append(("render", time.perf_counter() - pilha.pop()))
+
+
+def _antes():
+    g._medicao = _Medicao()
+
+
+def _depois(resposta):
+    medicao = g.pop('_medicao', None)
+    if medicao is None:
+        return resposta
+    total = time.perf_counter() - medicao.inicio
+    rota = request.endpoint or "desconhecida"
+
+    por_consulta = {}
+    for consulta, duracao in medicao.consultas:
+        quantidade, soma = por_consulta.get(consulta, (0, 0.0))
+        por_consulta[consulta] = (quantidade + 1, soma + duracao)
+        duracao_consulta.observar((consulta,), duracao)
+    tempo_banco = sum(duracao for _, duracao in medicao.consultas)
+    por_trecho = {}
+    for trecho, duracao in medicao.trechos:
+        por_trecho[trecho] = por_trecho.get(trecho, 0.0) + duracao
+        if trecho != "render":
+            duracao_trecho.observar((trecho,), duracao)
+
+    duracao_requisicao.observar((rota, request.method, str(resposta.status_code)), total)
+    duracao_banco.observar((rota,), tempo_banco)
+    consultas_requisicao.observar((rota,), len(medicao.consultas))
+    duracao_render.observar((rota,), por_trecho.get("render", 0.0))
+
+    entradas = [f'db;dur={tempo_banco * 1000:.1f};desc="{len(medicao.consultas)} consultas"']
+    mais_lentas = sorted(por_consulta.items(), key=lambda item: item[1][1], reverse=True)
+    for consulta, (quantidade, soma) in mais_lentas[:SERVER_TIMING_MAX_CONSULTAS]:
+        entradas.append(f'db-{consulta};dur={soma * 1000:.1f};desc="{quantidade}x"')
+    entradas += [f"{trecho};dur={duracao * 1000:.1f}" for trecho, duracao in por_trecho.items()]
+    entradas.append(f"total;dur={total * 1000:.1f}")
+    resposta.headers.add('Server-Timing', ", ".join(entradas))
+
+    if total * 1000 >= LENTO_MS:
+        detalhes = ", ".join(f"{consulta} {quantidade}x {soma * 1000:.1f}ms" for consulta, (quantidade, soma) in mais_lentas)
+        logger.warning("Requisição lenta: %s %s (%s) %.1fms; banco %.1fms em %d consultas [%s]; %s",
+                       request.method, request.path, rota, total * 1000, tempo_banco * 1000, len(medicao.consultas),
+                       detalhes, ", ".join(f"{trecho} {duracao * 1000:.1f}ms" for trecho, duracao in por_trecho.items()))
+    return resposta
+
+
+def instalar(app):
+    if not METRICAS_ATIVAS:
+        return
+    app.before_request(_antes)
+    app.after_request(_depois)
+    before_render_template.connect(_inicio_render, app)
+    template_rendered.connect(_fim_render, app)
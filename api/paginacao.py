@@ -0,0 +1,47 @@
+import base64
+import json
+import os
+
+from flask import request, url_for
+
+# --- PAGINAÇÃO POR CURSOR (KEYSET EM nome, id) ---
+# Em vez de OFFSET, cada página começa logo após o último (nome, id) da anterior,
+# então o custo por requisição não cresce com o tamanho da tabela. As consultas
+# ficam nos repositórios (dados/); aqui só o cursor opaco usado nas URLs.
+PAGINA_TAMANHO_PADRAO = int(os.getenv("PAGINA_TAMANHO", 50))
+PAGINA_TAMANHO_MAXIMO = int(os.getenv("PAGINA_TAMANHO_MAXIMO", 200))
+
+
+def tamanho_pagina(valor=None):
+    try:
+        tamanho = int(valor) if valor else PAGINA_TAMANHO_PADRAO
+    except (TypeError, ValueError):
+        tamanho = PAGINA_TAMANHO_PADRAO
+    return max(1, min(tamanho, PAGINA_TAMANHO_MAXIMO))
+
+
+def codificar_cursor(nome, id_registro):
+    bruto = json.dumps([nome, id_registro], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(bruto).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    # Cursor inválido ou adulterado volta para a primeira página
+    if not cursor:
+        return None
+    try:
+        preenchido = cursor + '=' * (-len(cursor) % 4)
+        nome, id_registro = json.loads(base64.urlsafe_b64decode(preenchido.encode('ascii')))
+        return str(nome), int(id_registro)
+    except (ValueError, TypeError):
+        return None
+
+
+def url_pagina(cursor=None):
+    # Mantém busca e tamanho de página ao navegar entre as páginas
+    args = request.args.to_dict()
+    args.pop('cursor', None)
+    if cursor:
+        args['cursor'] = cursor
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
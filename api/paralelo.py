@@ -0,0 +1,65 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+# --- CONSULTAS INDEPENDENTES EM PARALELO ---
+# Uma rota que precisa de várias leituras independentes dispara todas juntas em um
+# pool de threads compartilhado e espera a mais lenta, em vez de somar as latências.
+# Cada tarefa roda em uma cópia do contexto da requisição (contextvars), então
+# request, g e a medição de consultas do metricas.py continuam valendo no pool.
+PARALELO_WORKERS = int(os.getenv("PARALELO_WORKERS", 8))
+PARALELO_TIMEOUT = float(os.getenv("PARALELO_TIMEOUT", 10))
+
+
+class ConsultaExpirada(TimeoutError):
+    def __init__(self, pendentes):
+        super().__init__(f"Consultas sem resposta dentro do prazo: {', '.join(pendentes)}.")
+        self.pendentes = pendentes
+
+
+def criar_pool(nome, workers):
+    # Pool à parte para trabalhos longos (relatórios), que não podem tomar as threads das leituras das rotas
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix=nome)
+
+
+_executor = criar_pool("consulta", PARALELO_WORKERS)
+_no_pool = threading.local()
+
+
+def _rodar(funcao):
+    _no_pool.ativo = True
+    try:
+        return funcao()
+    finally:
+        _no_pool.ativo = False
+
+
+def em_paralelo(tarefas, timeout=PARALELO_TIMEOUT, pool=None):
+    # tarefas: {nome: função sem argumentos}; devolve {nome: resultado}. A primeira falha
+    # cancela as tarefas que ainda não começaram e é repassada depois que as já iniciadas
+    # terminam. No prazo estourado, as pendentes são canceladas e sobe ConsultaExpirada.
+    # timeout=None espera tudo terminar (escritas que podem precisar ser desfeitas depois).
+    if len(tarefas) <= 1 or getattr(_no_pool, "ativo", False):
+        # Uma tarefa só não compensa a troca de thread; dentro do pool, esperar o próprio pool travaria
+        return {nome: funcao() for nome, funcao in tarefas.items()}
+
+    pool = pool or _executor
+    futuros = {nome: pool.submit(contextvars.copy_context().run, _rodar, funcao) for nome, funcao in tarefas.items()}
+    prontos, pendentes = wait(futuros.values(), timeout=timeout, return_when=FIRST_EXCEPTION)
+    falha = next((futuro for futuro in prontos if futuro.exception() is not None), None)
+    if pendentes:
+        for futuro in pendentes:
+            futuro.cancel()
+        if falha is None:
+            raise ConsultaExpirada([nome for nome, futuro in futuros.items() if futuro in pendentes])
+        # Uma falhou antes do prazo: as que já estão rodando não podem ser interrompidas, só aguardadas
+        wait([futuro for futuro in pendentes if not futuro.cancelled()], timeout=timeout)
+    if falha is not None:
+        raise falha.exception()
+    return {nome: futuro.result() for nome, futuro in futuros.items()}
+
+
+def estatisticas():
+    return {"workers": PARALELO_WORKERS, "timeout": PARALELO_TIMEOUT,
+            "fila": _executor._work_queue.qsize()}
@@ -0,0 +1,256 @@
+import datetime
+import math
+import os
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+from cache import CacheTTL
+from exportacao import FiltroInvalido, intervalo_datas
+from paralelo import PARALELO_TIMEOUT, criar_pool, em_paralelo
+
+# --- RELATÓRIOS DE VENDAS (AGREGAÇÃO COLUNAR) ---
+# As vendas do período chegam em lotes, com os itens embutidos (keyset em data, id), e
+# cada lote vira colunas NumPy: produto, vendedor, dia, quantidade e receita. Os totais
+# por produto, por vendedor e por dia saem de um group-by vetorizado (np.unique +
+# np.bincount) por lote, e os parciais dos lotes são somados da mesma forma no fim.
+# O período é dividido em meses do calendário (UTC, como data_venda no banco). Um mês
+# inteiro já encerrado não muda mais: seu agregado fica em cache no processo e nunca é
+# recalculado. Só os trechos em aberto (mês atual, pedaços de mês) vão ao banco de novo.
+# Os trechos rodam em um pool próprio e pequeno: um período longo espera na fila dele,
+# sem ocupar as threads que as outras rotas usam para suas consultas. Um mês encerrado
+# que já está sendo calculado (por outro relatório, ou por um que estourou o prazo e
+# seguiu rodando) não vai ao banco de novo: quem pede depois espera o mesmo cálculo.
+RELATORIOS_LOTE = int(os.getenv("RELATORIOS_LOTE", 2000))
+RELATORIOS_DIAS_PADRAO = int(os.getenv("RELATORIOS_DIAS_PADRAO", 30))
+RELATORIOS_MAXIMO_DIAS = int(os.getenv("RELATORIOS_MAXIMO_DIAS", 731))
+RELATORIOS_WORKERS = int(os.getenv("RELATORIOS_WORKERS", 2))
+# Prazo do relatório inteiro: o período mais longo aceito, um trecho (mês) por vez em cada thread
+RELATORIOS_TIMEOUT = float(os.getenv("RELATORIOS_TIMEOUT", PARALELO_TIMEOUT * math.ceil(
+    (RELATORIOS_MAXIMO_DIAS // 28 + 2) / RELATORIOS_WORKERS)))
+# Vendas em andamento na virada do mês (itens gravados depois da venda) ainda caem no mês anterior
+RELATORIOS_CARENCIA_MINUTOS = int(os.getenv("RELATORIOS_CARENCIA_MINUTOS", 60))
+DIMENSOES = ("produto", "vendedor", "dia")
+MEDIDAS = ("quantidade", "receita", "vendas")
+ORDENS = ("receita", "quantidade", "vendas")
+# Dimensão -> (repositório, coluna de id) de onde vem o nome exibido
+NOMES = {"produto": ("produtos", "id_produto"), "vendedor": ("usuarios", "id_usuario")}
+COLUNAS_CHAVE = {"produto": "id_produto", "vendedor": "id_usuario", "dia": "dia"}
+TIPOS_CHAVE = {"produto": np.int64, "vendedor": np.int64, "dia": "datetime64[D]"}
+TIPOS_MEDIDA = {"quantidade": np.int64, "receita": np.float64, "vendas": np.int64}
+
+meses_encerrados = CacheTTL("relatorios", ttl=None, tamanho_maximo=int(os.getenv("RELATORIOS_CACHE_MESES", 120)))
+_pool = criar_pool("relatorio", RELATORIOS_WORKERS)
+# Mês encerrado -> Future do cálculo em andamento
+_em_andamento = {}
+_trava = threading.Lock()
+
+
+class RelatorioInvalido(FiltroInvalido):
+    pass
+
+
+def _agrupar(chaves, medidas):
+    # Posição de cada linha no vetor de chaves únicas (ordenado) e a soma das medidas por posição
+    unicas, posicoes = np.unique(chaves, return_inverse=True)
+    posicoes = posicoes.ravel()
+    return unicas, {nome: np.bincount(posicoes, weights=valores, minlength=len(unicas)).astype(TIPOS_MEDIDA[nome])
+                    for nome, valores in medidas.items()}
+
+
+class Agregado:
+    def __init__(self, dimensoes):
+        # {dimensão: (chaves únicas, {medida: valores na ordem das chaves})}
+        self.dimensoes = dimensoes
+
+    @classmethod
+    def vazio(cls):
+        return cls({dimensao: (np.array([], dtype=TIPOS_CHAVE[dimensao]),
+                               {medida: np.array([], dtype=TIPOS_MEDIDA[medida]) for medida in MEDIDAS})
+                    for dimensao in DIMENSOES})
+
+    @classmethod
+    def do_lote(cls, lote):
+        # Venda sem itens é uma venda ainda sendo gravada (ou desfeita): fica de fora
+        vendas = [venda for venda in lote if venda.get('tb_venda_item')]
+        if not vendas:
+            return cls.vazio()
+        total = len(vendas)
+        itens = [item for venda in vendas for item in venda['tb_venda_item']]
+        produto = np.fromiter((item['id_produto'] for item in itens), np.int64, len(itens))
+        quantidade = np.fromiter((item['quantidade'] for item in itens), np.int64, len(itens))
+        receita = quantidade * np.fromiter((float(item['preco_unitario']) for item in itens), np.float64, len(itens))
+
+        # Totais de cada venda: vendedor e dia são da venda, não do item
+        venda_do_item = np.repeat(np.arange(total), np.fromiter((len(venda['tb_venda_item']) for venda in vendas), np.int64, total))
+        por_venda = {"quantidade": np.bincount(venda_do_item, weights=quantidade, minlength=total),
+                     "receita": np.bincount(venda_do_item, weights=receita, minlength=total),
+                     "vendas": np.ones(total, np.int64)}
+        vendedor = np.fromiter((venda['id_usuario'] or 0 for venda in vendas), np.int64, total)
+        dia = np.array([str(venda['data_venda'])[:10] for venda in vendas], dtype='datetime64[D]')
+        # Os itens de uma venda já vêm consolidados por produto: cada linha é uma venda do produto
+        return cls({"produto": _agrupar(produto, {"quantidade": quantidade, "receita": receita,
+                                                  "vendas": np.ones(len(itens), np.int64)}),
+                    "vendedor": _agrupar(vendedor, por_venda),
+                    "dia": _agrupar(dia, por_venda)})
+
+    @classmethod
+    def somar(cls, agregados):
+        agregados = list(agregados)
+        if not agregados:
+            return cls.vazio()
+        if len(agregados) == 1:
+            return agregados[0]
+        dimensoes = {}
+        for dimensao in DIMENSOES:
+            partes = [agregado.dimensoes[dimensao] for agregado in agregados]
+            dimensoes[dimensao] = _agrupar(np.concatenate([chaves for chaves, _ in partes]),
+                                           {medida: np.concatenate([medidas[medida] for _, medidas in partes]) for medida in MEDIDAS})
+        return cls(dimensoes)
+
+
+# --- PERÍODOS ---
+def periodo(inicio, fim, hoje=None):
+    # Datas do formulário (fim inclusivo); sem elas, os últimos RELATORIOS_DIAS_PADRAO dias.
+    # Devolve (inicio, fim) como datas, com fim exclusivo
+    fim = fim or (hoje or datetime.datetime.now(datetime.timezone.utc).date()).isoformat()
+    if not inicio:
+        _, fim_exclusivo = intervalo_datas(None, fim)
+        inicio = (datetime.date.fromisoformat(fim_exclusivo) - datetime.timedelta(days=RELATORIOS_DIAS_PADRAO)).isoformat()
+    inicio, fim = intervalo_datas(inicio, fim)
+    inicio, fim = datetime.date.fromisoformat(inicio), datetime.date.fromisoformat(fim)
+    if (fim - inicio).days > RELATORIOS_MAXIMO_DIAS:
+        raise RelatorioInvalido(f"Período longo demais: no máximo {RELATORIOS_MAXIMO_DIAS} dias por relatório.")
+    return inicio, fim
+
+
+def _proximo_mes(dia):
+    return (dia.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+
+
+def trechos(inicio, fim, agora):
+    # [inicio, fim) em trechos de no máximo um mês: (inicio, fim, encerrado). Trechos em
+    # aberto vizinhos viram um só, para ir ao banco uma vez
+    limite = agora - datetime.timedelta(minutes=RELATORIOS_CARENCIA_MINUTOS)
+    resultado = []
+    atual = inicio
+    while atual < fim:
+        proximo = _proximo_mes(atual)
+        fim_trecho = min(proximo, fim)
+        encerrado = (atual.day == 1 and fim_trecho == proximo
+                     and datetime.datetime.combine(proximo, datetime.time(), datetime.timezone.utc) <= limite)
+        if resultado and not encerrado and not resultado[-1][2]:
+            resultado[-1] = (resultado[-1][0], fim_trecho, False)
+        else:
+            resultado.append((atual, fim_trecho, encerrado))
+        atual = fim_trecho
+    return resultado
+
+
+def _calcular(db, inicio, fim):
+    return Agregado.somar(Agregado.do_lote(lote)
+                          for lote in db.vendas.lotes_com_itens(inicio.isoformat(), fim.isoformat(), RELATORIOS_LOTE))
+
+
+def _mes_encerrado(db, inicio, fim):
+    chave = inicio.isoformat()
+    with _trava:
+        futuro = _em_andamento.get(chave)
+        calcular = futuro is None
+        if calcular:
+            futuro = _em_andamento[chave] = Future()
+    if not calcular:
+        return futuro.result()
+    try:
+        futuro.set_result(meses_encerrados.obter(chave, lambda: _calcular(db, inicio, fim)))
+    except Exception as e:
+        futuro.set_exception(e)
+    finally:
+        with _trava:
+            del _em_andamento[chave]
+    return futuro.result()
+
+
+def agregar_vendas(db, inicio, fim, agora=None):
+    # Os trechos são independentes: os que não estão em cache são lidos em paralelo
+    agora = agora or datetime.datetime.now(datetime.timezone.utc)
+    tarefas = {}
+    for inicio_trecho, fim_trecho, encerrado in trechos(inicio, fim, agora):
+        if encerrado:
+            tarefa = lambda i=inicio_trecho, f=fim_trecho: _mes_encerrado(db, i, f)
+        else:
+            tarefa = lambda i=inicio_trecho, f=fim_trecho: _calcular(db, i, f)
+        tarefas[f"{inicio_trecho.isoformat()}/{fim_trecho.isoformat()}"] = tarefa
+    return Agregado.somar(em_paralelo(tarefas, timeout=RELATORIOS_TIMEOUT, pool=_pool).values())
+
+
+# --- SAÍDA (PÁGINAS E API) ---
+def totais(agregado):
+    _, medidas = agregado.dimensoes["dia"]
+    vendas, receita = int(medidas["vendas"].sum()), float(medidas["receita"].sum())
+    return {"vendas": vendas, "quantidade": int(medidas["quantidade"].sum()), "receita": round(receita, 2),
+            "ticket_medio": round(receita / vendas, 2) if vendas else 0.0,
+            "produtos": len(agregado.dimensoes["produto"][0])}
+
+
+def _linhas(dimensao, chaves, medidas, posicoes):
+    coluna = COLUNAS_CHAVE[dimensao]
+    chaves = chaves[posicoes].astype(str) if dimensao == "dia" else chaves[posicoes].tolist()
+    quantidades, receitas, vendas = (medidas[medida][posicoes].tolist() for medida in MEDIDAS)
+    return [{coluna: chave, "quantidade": quantidade, "receita": round(receita, 2), "vendas": venda}
+            for chave, quantidade, receita, venda in zip(chaves, quantidades, receitas, vendas)]
+
+
+def ranking(agregado, dimensao, ordem="receita", limite=None):
+    if dimensao not in NOMES:
+        raise RelatorioInvalido(f"Dimensão inválida para ranking: {dimensao}.")
+    if ordem not in ORDENS:
+        raise RelatorioInvalido(f"Ordem inválida: {ordem}. Use uma de: {', '.join(ORDENS)}.")
+    chaves, medidas = agregado.dimensoes[dimensao]
+    valores = medidas[ordem]
+    if limite and limite < len(valores):
+        # Só os limite maiores são separados (O(n)) e ordenados
+        posicoes = np.argpartition(-valores, limite - 1)[:limite]
+    else:
+        posicoes = np.arange(len(valores))
+    # Maior valor primeiro; empate pela chave, para a ordem não variar entre requisições
+    posicoes = posicoes[np.lexsort((chaves[posicoes], -valores[posicoes]))]
+    return _linhas(dimensao, chaves, medidas, posicoes)
+
+
+def serie_diaria(agregado, inicio, fim):
+    # Um ponto por dia do período, com zero nos dias sem venda
+    dias = np.arange(np.datetime64(inicio, 'D'), np.datetime64(fim, 'D'))
+    chaves, medidas = agregado.dimensoes["dia"]
+    dentro = (chaves >= dias[0]) & (chaves <= dias[-1]) if len(dias) else np.zeros(len(chaves), bool)
+    posicoes = (chaves[dentro] - dias[0]).astype(np.int64) if len(dias) else np.array([], np.int64)
+    serie = {}
+    for medida in MEDIDAS:
+        serie[medida] = np.zeros(len(dias), TIPOS_MEDIDA[medida])
+        serie[medida][posicoes] = medidas[medida][dentro]
+    return _linhas("dia", dias, serie, np.arange(len(dias)))
+
+
+def nomear(db, tabelas):
+    # tabelas: {dimensão: linhas}; o nome de cada produto ou vendedor entra como "nome"
+    tarefas = {}
+    for dimensao, linhas in tabelas.items():
+        repositorio, coluna = NOMES[dimensao]
+        ids = [linha[coluna] for linha in linhas if linha[coluna]]
+        if ids:
+            tarefas[dimensao] = lambda r=repositorio, c=coluna, i=ids: getattr(db, r).por_ids(i, f"{c}, nome")
+    encontrados = em_paralelo(tarefas)
+    for dimensao, linhas in tabelas.items():
+        coluna = NOMES[dimensao][1]
+        nomes = {registro[coluna]: registro['nome'] for registro in encontrados.get(dimensao, [])}
+        for linha in linhas:
+            linha['nome'] = nomes.get(linha[coluna])
+    return tabelas
+
+
+def estatisticas():
+    return {"meses_encerrados": meses_encerrados.estatisticas(), "lote": RELATORIOS_LOTE,
+            "carencia_minutos": RELATORIOS_CARENCIA_MINUTOS, "maximo_dias": RELATORIOS_MAXIMO_DIAS,
+            "workers": RELATORIOS_WORKERS, "timeout": RELATORIOS_TIMEOUT, "fila": _pool._work_queue.qsize(),
+            "meses_em_andamento": len(_em_andamento)}
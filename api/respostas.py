@@ -0,0 +1,246 @@
+import datetime
+import gzip
+import hashlib
+import logging
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+from flask.globals import request_ctx
+
+try:
+    import brotli
+except ImportError:  # compressão brotli é opcional; sem o pacote, só gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# --- CACHE HTTP: GET CONDICIONAL, ESTÁTICOS COM IMPRESSÃO DIGITAL E COMPRESSÃO ---
+# Listagens: o ETag sai das versões das tabelas exibidas (tb_versao, mantida por gatilhos
+# no banco), do usuário, da URL e da versão do app. Se o navegador já tem a página, a
+# resposta é 304 depois de uma única consulta pequena, sem buscar nem renderizar nada.
+# Estáticos: url_for('static') ganha ?v=<hash do arquivo> e, com o hash certo, o arquivo
+# vai com cache de um ano (immutable). Respostas de texto saem com gzip (ou brotli).
+RESPOSTAS_COMPRESSAO = os.getenv("RESPOSTAS_COMPRESSAO", "1") != "0"
+COMPRESSAO_MINIMA_BYTES = 1024
+COMPRESSAO_NIVEL = 6
+ESTATICOS_MAX_AGE = 365 * 24 * 3600
+TIPOS_COMPRIMIVEIS = {"text/html", "text/css", "text/plain", "text/csv", "text/javascript", "application/javascript",
+                      "application/json", "application/x-ndjson", "image/svg+xml"}
+COMPRIMIDOS_MAXIMO = 64
+
+
+def versao_do_app(app):
+    # Muda a cada deploy que altere templates ou estáticos e é igual em todos os workers
+    return os.getenv("VERSAO_APP") or _hash_pastas(os.path.join(app.root_path, app.template_folder), app.static_folder)
+
+
+def _hash_pastas(*pastas):
+    resumo = hashlib.sha1()
+    for pasta in pastas:
+        for raiz, diretorios, arquivos in os.walk(pasta):
+            diretorios.sort()
+            for nome in sorted(arquivos):
+                caminho = os.path.join(raiz, nome)
+                resumo.update(os.path.relpath(caminho, pasta).encode('utf-8'))
+                with open(caminho, 'rb') as arquivo:
+                    resumo.update(arquivo.read())
+    return resumo.hexdigest()[:12]
+
+
+def _data_http(valor):
+    # Supabase devolve timestamptz com fuso; o SQLite, texto ISO em UTC sem fuso
+    try:
+        data = datetime.datetime.fromisoformat(str(valor).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return data if data.tzinfo else data.replace(tzinfo=datetime.timezone.utc)
+
+
+# --- GET CONDICIONAL DAS LISTAGENS ---
+def _sem_cache(resposta):
+    resposta.headers['Cache-Control'] = 'no-store'
+    return resposta
+
+
+def _mensagens_pendentes():
+    # Página com aviso (flash) é única: não pode ser reaproveitada depois
+    return bool(session.get('_flashes') or getattr(request_ctx, 'flashes', None))
+
+
+def condicional(obter_versoes, *tabelas, extra=None):
+    # extra: função sem argumentos cujo valor também entra no ETag (estado em memória que a view usa)
+    def decorador(view):
+        @wraps(view)
+        def view_condicional(*args, **kwargs):
+            if request.method != 'GET' or _mensagens_pendentes():
+                return _sem_cache(make_response(view(*args, **kwargs)))
+            try:
+                versoes = sorted((linha['tabela'], linha['versao'], str(linha['alterado_em']))
+                                 for linha in obter_versoes(tabelas))
+                marcador = extra() if extra else None
+            except Exception as e:
+                logger.warning("Falha ao montar o ETag das tabelas %s: %s", ", ".join(tabelas), e)
+                return _sem_cache(make_response(view(*args, **kwargs)))
+
+            # As versões são lidas antes dos dados: uma escrita no meio do caminho só faz a
+            # próxima requisição renderizar de novo, nunca servir página velha com ETag novo.
+            # Caches em memória usados pela view entram na mesma conta (ver versao_lida)
+            g.versoes_lidas = {tabela: versao for tabela, versao, _ in versoes}
+            chave = repr((current_app.config['VERSAO_APP'], request.full_path, session.get('id_usuario'), session.get('is_admin'), versoes, marcador))
+            etag = hashlib.sha1(chave.encode('utf-8')).hexdigest()[:32]
+            if request.if_none_match.contains_weak(etag):
+                resposta = make_response('', 304)
+            else:
+                resposta = make_response(view(*args, **kwargs))
+                if resposta.status_code != 200 or _mensagens_pendentes():
+                    return _sem_cache(resposta)
+            resposta.set_etag(etag, weak=True)
+            alteracoes = [data for data in (_data_http(alterado_em) for _, _, alterado_em in versoes) if data]
+            if alteracoes:
+                resposta.last_modified = max(alteracoes)
+            # Guarda a página, mas confirma com o servidor a cada navegação
+            resposta.headers['Cache-Control'] = 'private, no-cache'
+            return resposta
+        return view_condicional
+    return decorador
+
+
+def versao_lida(tabela):
+    # Versão da tabela que entrou no ETag desta requisição (None fora de uma view condicional)
+    return g.get('versoes_lidas', {}).get(tabela)
+
+
+# --- ESTÁTICOS COM IMPRESSÃO DIGITAL ---
+class ImpressoesEstaticos:
+    def __init__(self, pasta):
+        self.pasta = pasta
+        self._impressoes = {}  # arquivo -> (mtime, hash)
+        self._trava = threading.Lock()
+
+    def obter(self, arquivo):
+        caminho = os.path.join(self.pasta, arquivo)
+        try:
+            mtime = os.path.getmtime(caminho)
+        except OSError:
+            return None
+        with self._trava:
+            atual = self._impressoes.get(arquivo)
+            if atual and atual[0] == mtime:
+                return atual[1]
+        with open(caminho, 'rb') as conteudo:
+            impressao = hashlib.sha1(conteudo.read()).hexdigest()[:12]
+        with self._trava:
+            self._impressoes[arquivo] = (mtime, impressao)
+        return impressao
+
+
+# --- COMPRESSÃO ---
+def _codificacao_aceita():
+    if brotli is not None and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def _comprimir(dados, codificacao):
+    if codificacao == 'br':
+        return brotli.compress(dados, quality=5)
+    return gzip.compress(dados, compresslevel=COMPRESSAO_NIVEL, mtime=0)
+
+
+def _gzip_em_stream(partes):
+    # Exportações continuam em streaming: cada pedaço sai comprimido assim que é gerado
+    compressor = zlib.compressobj(COMPRESSAO_NIVEL, zlib.DEFLATED, 31)
+    for parte in partes:
+        if parte:
+            saida = compressor.compress(parte) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if saida:
+                yield saida
+    yield compressor.flush()
+
+
+class Compressao:
+    def __init__(self):
+        self._comprimidos = OrderedDict()  # (caminho, ETag, codificação) -> bytes
+        self._trava = threading.Lock()
+
+    def _estatico(self, resposta, codificacao):
+        # O arquivo é comprimido uma vez por versão (ETag) e servido da memória depois
+        etag, _ = resposta.get_etag()
+        chave = (request.path, etag, codificacao)
+        with self._trava:
+            dados = self._comprimidos.get(chave)
+        resposta.direct_passthrough = False
+        if dados is None:
+            dados = _comprimir(resposta.get_data(), codificacao)
+            with self._trava:
+                self._comprimidos[chave] = dados
+                while len(self._comprimidos) > COMPRIMIDOS_MAXIMO:
+                    self._comprimidos.popitem(last=False)
+        elif hasattr(resposta.response, 'close'):
+            resposta.response.close()  # arquivo aberto pelo send_file, que não será lido
+        resposta.set_data(dados)
+
+    def aplicar(self, resposta):
+        if (resposta.status_code != 200 or request.method == 'HEAD' or 'Content-Encoding' in resposta.headers
+                or resposta.mimetype not in TIPOS_COMPRIMIVEIS):
+            return resposta
+        resposta.vary.add('Accept-Encoding')
+        codificacao = _codificacao_aceita()
+        if codificacao is None:
+            return resposta
+
+        if resposta.direct_passthrough and request.endpoint == 'static':
+            if (resposta.content_length or 0) < COMPRESSAO_MINIMA_BYTES:
+                return resposta
+            self._estatico(resposta, codificacao)
+        elif resposta.is_streamed:
+            if not request.accept_encodings['gzip']:
+                return resposta
+            codificacao = 'gzip'
+            resposta.response = _gzip_em_stream(resposta.iter_encoded())
+            resposta.headers.pop('Content-Length', None)
+        else:
+            dados = resposta.get_data()
+            if len(dados) < COMPRESSAO_MINIMA_BYTES:
+                return resposta
+            resposta.set_data(_comprimir(dados, codificacao))
+
+        resposta.headers['Content-Encoding'] = codificacao
+        # O corpo comprimido é outra representação; ETag forte deixaria de valer
+        etag, fraca = resposta.get_etag()
+        if etag and not fraca:
+            resposta.set_etag(etag, weak=True)
+        return resposta
+
+
+# --- INSTALAÇÃO NO APP ---
+def instalar(app):
+    if not app.config.get('VERSAO_APP'):
+        app.config['VERSAO_APP'] = versao_do_app(app)
+    impressoes = ImpressoesEstaticos(app.static_folder)
+    compressao = Compressao()
+
+    @app.url_defaults
+    def impressao_estatico(endpoint, valores):
+        if endpoint == 'static' and 'filename' in valores and 'v' not in valores:
+            impressao = impressoes.obter(valores['filename'])
+            if impressao:
+                valores['v'] = impressao
+
+    @app.after_request
+    def cabecalhos_de_cache(resposta):
+        if request.endpoint == 'static' and resposta.status_code in (200, 304):
+            filename = (request.view_args or {}).get('filename')
+            if filename and request.args.get('v') and request.args.get('v') == impressoes.obter(filename):
+                resposta.headers['Cache-Control'] = f'public, max-age={ESTATICOS_MAX_AGE}, immutable'
+        if RESPOSTAS_COMPRESSAO:
+            resposta = compressao.aplicar(resposta)
+        return resposta
+
+    return impressoes
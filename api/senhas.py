@@ -0,0 +1,96 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import bcrypt
+
+import metricas
+
+logger = logging.getLogger(__name__)
+
+# --- HASH DE SENHAS EM POOL LIMITADO ---
+# bcrypt leva centenas de milissegundos de CPU por chamada. As chamadas rodam em um
+# pool com poucas threads (o bcrypt libera o GIL) e uma fila curta: uma rajada de
+# logins espera a vez ou é recusada na hora, em vez de ocupar todos os workers e
+# travar as outras rotas. O custo vem de BCRYPT_CUSTO; hashes com custo diferente
+# são refeitos em segundo plano no próximo login bem-sucedido.
+BCRYPT_CUSTO = int(os.getenv("BCRYPT_CUSTO", 12))
+SENHAS_WORKERS = int(os.getenv("SENHAS_WORKERS", max(1, min(4, os.cpu_count() or 1))))
+SENHAS_FILA = int(os.getenv("SENHAS_FILA", 16))
+SENHAS_TIMEOUT = float(os.getenv("SENHAS_TIMEOUT", 10))
+
+
+class SenhasOcupadas(Exception):
+    def __init__(self):
+        super().__init__("Servidor ocupado verificando senhas; tente novamente em instantes.")
+
+
+_executor = ThreadPoolExecutor(max_workers=SENHAS_WORKERS, thread_name_prefix="bcrypt")
+# Vagas = em execução + na fila; sem vaga a chamada falha na hora
+_vagas = threading.BoundedSemaphore(SENHAS_WORKERS + SENHAS_FILA)
+
+
+def _enviar(funcao, *args):
+    if not _vagas.acquire(blocking=False):
+        raise SenhasOcupadas()
+    try:
+        futuro = _executor.submit(funcao, *args)
+    except BaseException:
+        _vagas.release()
+        raise
+    futuro.add_done_callback(lambda _: _vagas.release())
+    return futuro
+
+
+def _executar(funcao, *args):
+    with metricas.medir("bcrypt"):
+        try:
+            return _enviar(funcao, *args).result(timeout=SENHAS_TIMEOUT)
+        except TimeoutError:
+            raise SenhasOcupadas()
+
+
+def _gerar(senha):
+    return bcrypt.hashpw(senha.encode('utf-8'), bcrypt.gensalt(BCRYPT_CUSTO)).decode('utf-8')
+
+
+def _verificar(senha, senha_hash):
+    return bcrypt.checkpw(senha.encode('utf-8'), senha_hash.encode('utf-8'))
+
+
+def custo(senha_hash):
+    # Formato $2b$12$...: o custo é o segundo campo
+    try:
+        return int(senha_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def gerar_hash(senha):
+    return _executar(_gerar, senha)
+
+
+def verificar(senha, senha_hash):
+    return _executar(_verificar, senha, senha_hash)
+
+
+def atualizar_hash_se_preciso(senha, senha_hash, salvar):
+    # Chamado após um login válido; roda em segundo plano e desiste se o pool estiver cheio
+    if custo(senha_hash) == BCRYPT_CUSTO:
+        return
+
+    def refazer():
+        try:
+            salvar(_gerar(senha))
+        except Exception as e:
+            logger.warning("Falha ao atualizar hash de senha: %s", e)
+    try:
+        _enviar(refazer)
+    except SenhasOcupadas:
+        pass
+
+
+def estatisticas():
+    return {"workers": SENHAS_WORKERS, "fila": SENHAS_FILA, "custo": BCRYPT_CUSTO,
+            "vagas_livres": _vagas._value}
@@ -0,0 +1,64 @@
+-- Baixa (ou devolve, com quantidade negativa) o estoque de vários produtos
+-- em uma única chamada e em uma única transação. Se qualquer produto não tiver
+-- saldo suficiente, nada é alterado.
+--
+-- Uso pelo app: supabase.rpc("ajustar_estoque", {"itens": [{"id_produto": 1, "quantidade": 3}, ...]})
+create or replace function ajustar_estoque(itens jsonb)
+returns table (id_produto bigint, estoque integer)
+language plpgsql
+as $$
+#variable_conflict use_column
+declare
+    item record;
+begin
+    -- Ordem fixa por id evita deadlock entre vendas simultâneas
+    for item in
+        select x.id_produto, sum(x.quantidade)::integer as quantidade
+          from jsonb_to_recordset(itens) as x(id_produto bigint, quantidade integer)
+         group by x.id_produto
+         order by x.id_produto
+    loop
+        update tb_produto p
+           set estoque = p.estoque - item.quantidade
+         where p.id_produto = item.id_produto
+           and p.estoque >= item.quantidade
+        returning p.id_produto, p.estoque into id_produto, estoque;
+
+        if not found then
+            raise exception 'Estoque insuficiente para o produto %', item.id_produto
+                using errcode = 'P0001';
+        end if;
+        return next;
+    end loop;
+end;
+$$;
+
+-- Desfaz um ajustar_estoque (com os mesmos itens) sem exigir saldo: é a compensação
+-- de uma gravação que falhou depois do ajuste, quando o saldo já pode ter mudado.
+--
+-- Uso pelo app: supabase.rpc("desfazer_ajuste_estoque", {"itens": [{"id_produto": 1, "quantidade": 3}, ...]})
+create or replace function desfazer_ajuste_estoque(itens jsonb)
+returns table (id_produto bigint, estoque integer)
+language plpgsql
+as $$
+#variable_conflict use_column
+declare
+    item record;
+begin
+    for item in
+        select x.id_produto, sum(x.quantidade)::integer as quantidade
+          from jsonb_to_recordset(itens) as x(id_produto bigint, quantidade integer)
+         group by x.id_produto
+         order by x.id_produto
+    loop
+        update tb_produto p
+           set estoque = p.estoque + item.quantidade
+         where p.id_produto = item.id_produto
+        returning p.id_produto, p.estoque into id_produto, estoque;
+
+        if found then
+            return next;
+        end if;
+    end loop;
+end;
+$$;
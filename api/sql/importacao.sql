@@ -0,0 +1,4 @@
+-- A importação de clientes grava com upsert resolvendo conflitos pelo CPF
+-- (on_conflict=cpf no PostgREST), o que exige uma restrição única na coluna.
+-- CPFs repetidos já existentes precisam ser corrigidos antes de rodar isto.
+create unique index if not exists tb_cliente_cpf_key on tb_cliente (cpf);
@@ -0,0 +1,18 @@
+-- Índices compostos da paginação por keyset: cada listagem ordena por (coluna, id) e
+-- retoma depois da última linha da página anterior, o que só é barato com um índice
+-- na mesma ordem. Os mesmos índices existem em dados/schema_sqlite.sql.
+create index if not exists ix_usuario_nome on tb_usuario (nome, id_usuario);
+create index if not exists ix_produto_nome on tb_produto (nome, id_produto);
+create index if not exists ix_cliente_nome on tb_cliente (nome, id_cliente);
+create index if not exists ix_venda_data on tb_venda (data_venda, id_venda);
+create index if not exists ix_estoque_mov_data on tb_estoque_mov (criado_em, id_mov);
+create index if not exists ix_inventario_data on tb_inventario (criado_em, id_inventario);
+
+-- Itens embutidos nas vendas (tb_venda_item(...)) e movimentos de um produto
+create index if not exists ix_venda_item_venda on tb_venda_item (id_venda);
+create index if not exists ix_venda_item_produto on tb_venda_item (id_produto);
+create index if not exists ix_estoque_mov_produto on tb_estoque_mov (id_produto);
+
+-- Candidatos dos alertas do painel (estoque baixo ou validade próxima)
+create index if not exists ix_produto_estoque on tb_produto (estoque);
+create index if not exists ix_produto_validade on tb_produto (validade);
@@ -0,0 +1,15 @@
+-- Cabeçalho de cada inventário (contagem física em lote). Os movimentos de ajuste
+-- gerados por ele ficam em tb_estoque_mov com o id_inventario preenchido (e o motivo
+-- 'Inventário #<id_inventario>', para leitura no histórico).
+create table if not exists tb_inventario (
+    id_inventario   bigint generated by default as identity primary key,
+    id_usuario      bigint references tb_usuario (id_usuario),
+    observacao      text,
+    itens_contados  integer not null default 0,
+    itens_ajustados integer not null default 0,
+    criado_em       timestamptz not null default now()
+);
+create index if not exists ix_inventario_data on tb_inventario (criado_em, id_inventario);
+
+alter table tb_estoque_mov add column if not exists id_inventario bigint references tb_inventario (id_inventario);
+create index if not exists ix_estoque_mov_inventario on tb_estoque_mov (id_inventario);
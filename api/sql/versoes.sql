@@ -0,0 +1,50 @@
+-- Marcador de versão por tabela, usado pelo GET condicional das listagens (ETag).
+-- Cada insert/update/delete incrementa a versão da tabela alterada; as telas leem
+-- só esta tabela (poucas linhas) para saber se o que o navegador já tem mudou.
+create table if not exists tb_versao (
+    tabela     text primary key,
+    versao     bigint not null default 0,
+    alterado_em timestamptz not null default now()
+);
+
+create or replace function incrementar_versao()
+returns trigger
+language plpgsql
+as $$
+begin
+    insert into tb_versao (tabela, versao, alterado_em)
+    values (tg_table_name, 1, now())
+    on conflict (tabela) do update
+        set versao = tb_versao.versao + 1, alterado_em = now();
+    return null;
+end;
+$$;
+
+-- Gatilho por comando (não por linha): um insert em lote incrementa uma vez só
+do $$
+declare
+    nome text;
+begin
+    foreach nome in array array['tb_usuario', 'tb_produto', 'tb_cliente', 'tb_venda', 'tb_estoque_mov', 'tb_inventario']
+    loop
+        execute format('drop trigger if exists tg_versao on %I', nome);
+        execute format('create trigger tg_versao after insert or update or delete on %I '
+                       'for each statement execute function incrementar_versao()', nome);
+        execute format('insert into tb_versao (tabela) values (%L) on conflict do nothing', nome);
+    end loop;
+end;
+$$;
+
+-- Contadores avulsos na mesma tabela: geração dos caches em memória de cada worker
+-- (índice de busca, alertas do painel). Um worker incrementa ao gravar; os outros
+-- leem o valor e recarregam a cópia local quando ele muda.
+create or replace function incrementar_geracao(nome text)
+returns bigint
+language sql
+as $$
+    insert into tb_versao (tabela, versao, alterado_em)
+    values (nome, 1, now())
+    on conflict (tabela) do update
+        set versao = tb_versao.versao + 1, alterado_em = now()
+    returning versao;
+$$;
@@ -0,0 +1,76 @@
+from dados import SaldoInsuficiente
+from paralelo import em_paralelo
+
+# --- REGISTRO DE VENDA EM LOTE ---
+# O custo de uma venda não depende do número de itens: uma consulta de estoque,
+# uma baixa condicional em lote (ajustar_estoque; no Supabase, sql/ajustar_estoque.sql)
+# e três inserts em lote, os dois últimos (itens e movimentos) em paralelo.
+
+
+class VendaInvalida(Exception):
+    pass
+
+
+def consolidar_itens(produtos, quantidades):
+    # Junta linhas repetidas do mesmo produto em uma só
+    if not produtos or len(produtos) != len(quantidades):
+        raise VendaInvalida("Selecione ao menos um produto com sua quantidade.")
+    itens = {}
+    for id_produto, quantidade in zip(produtos, quantidades):
+        try:
+            id_produto, quantidade = int(id_produto), int(quantidade)
+        except (TypeError, ValueError):
+            raise VendaInvalida("Produto ou quantidade inválidos.")
+        if quantidade <= 0:
+            raise VendaInvalida("A quantidade de cada produto deve ser maior que zero.")
+        itens[id_produto] = itens.get(id_produto, 0) + quantidade
+    return itens
+
+
+def registrar_venda(db, id_usuario, itens, id_cliente=None):
+    produtos = db.produtos.por_ids(list(itens), "id_produto, nome, preco, estoque")
+    por_id = {produto['id_produto']: produto for produto in produtos}
+
+    for id_produto, quantidade in itens.items():
+        produto = por_id.get(id_produto)
+        if not produto:
+            raise VendaInvalida(f"Venda não realizada. Produto {id_produto} não encontrado.")
+        if produto['estoque'] < quantidade:
+            raise VendaInvalida(f"Venda não realizada. Estoque de '{produto['nome']}' insuficiente.")
+
+    # A baixa é condicional no banco; se outra venda consumiu o saldo nesse meio tempo, nada é alterado
+    baixa = [{"id_produto": id_produto, "quantidade": quantidade} for id_produto, quantidade in sorted(itens.items())]
+    try:
+        saldos = db.produtos.ajustar_estoque(baixa)
+    except SaldoInsuficiente:
+        raise VendaInvalida("Venda não realizada. O estoque foi alterado durante a venda; tente novamente.")
+
+    id_venda, movimentos = None, []
+
+    def inserir_movimentos():
+        movimentos.extend(db.movimentos.inserir([
+            {"id_produto": i, "tipo_mov": "SAIDA", "quantidade": q, "motivo": f"Venda #{id_venda}"}
+            for i, q in itens.items()
+        ]) or [])
+
+    try:
+        valor_total = round(sum(float(por_id[i]['preco']) * q for i, q in itens.items()), 2)
+        venda = db.vendas.inserir({"id_usuario": id_usuario, "id_cliente": id_cliente, "valor_total": valor_total})
+        id_venda = venda['id_venda']
+        # Sem prazo: se uma falhar, o desfazer abaixo só pode rodar depois que a outra terminar
+        em_paralelo({
+            "itens": lambda: db.vendas.inserir_itens([
+                {"id_venda": id_venda, "id_produto": i, "quantidade": q, "preco_unitario": por_id[i]['preco']}
+                for i, q in itens.items()
+            ]),
+            "movimentos": inserir_movimentos,
+        }, timeout=None)
+        return venda, {linha['id_produto']: linha['estoque'] for linha in saldos or []}
+    except Exception:
+        # Desfaz o que foi gravado para não deixar estoque baixado sem venda
+        for movimento in movimentos:
+            db.movimentos.excluir(movimento['id_mov'])
+        if id_venda is not None:
+            db.vendas.excluir(id_venda)
+        db.produtos.ajustar_estoque([{"id_produto": item["id_produto"], "quantidade": -item["quantidade"]} for item in baixa])
+        raise